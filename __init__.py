@@ -1,5 +1,12 @@
-from agents import PlannerAgent, ToolExecutor
+from agents import AsyncPlannerAgent, AsyncToolExecutor, PlannerAgent, ToolExecutor
 from prompts import build_system_prompt
 from services import load_plugins
 
-__all__ = ["PlannerAgent", "ToolExecutor", "build_system_prompt", "load_plugins"]
+__all__ = [
+    "AsyncPlannerAgent",
+    "AsyncToolExecutor",
+    "PlannerAgent",
+    "ToolExecutor",
+    "build_system_prompt",
+    "load_plugins",
+]
@@ -1,4 +1,6 @@
+from agents.async_planner import AsyncPlannerAgent
+from agents.async_tool_executor import AsyncToolExecutor
 from agents.planner import PlannerAgent
 from agents.tool_executor import ToolExecutor
 
-__all__ = ["PlannerAgent", "ToolExecutor"]
+__all__ = ["AsyncPlannerAgent", "AsyncToolExecutor", "PlannerAgent", "ToolExecutor"]
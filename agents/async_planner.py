@@ -0,0 +1,158 @@
+import asyncio
+import logging
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from openai import AsyncOpenAI
+
+from agents.async_tool_executor import AsyncToolExecutor
+from agents.context_compactor import ContextCompactor
+from agents.planner import PlannerAgent
+from agents.step_graph import PlanStep
+from prompts import ToolIndex
+from services.artifact_store import ArtifactStore
+from services.cache import TieredCache
+from services.metrics import ERRORS, STAGE_SECONDS, record_usage, time_stage
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncPlannerAgent(PlannerAgent):
+    """Asyncio flavour of PlannerAgent so one process can multiplex many in-flight requests."""
+
+    def __init__(
+        self,
+        client: AsyncOpenAI,
+        executor: AsyncToolExecutor,
+        tool_specs: List[Dict[str, Any]],
+        planner_model: str,
+        planner_temperature: float,
+        max_steps: int,
+        temp_dir: Path,
+        context_file: Optional[Path] = None,
+        max_parallel_steps: int = 1,
+        plan_cache: Optional[TieredCache] = None,
+        batch_executor_calls: bool = False,
+        artifact_store: Optional[ArtifactStore] = None,
+        context_compactor: Optional[ContextCompactor] = None,
+        tool_index: Optional[ToolIndex] = None,
+        planner_top_k: int = 0,
+    ) -> None:
+        super().__init__(
+            client=client,  # type: ignore[arg-type]
+            executor=executor,
+            tool_specs=tool_specs,
+            planner_model=planner_model,
+            planner_temperature=planner_temperature,
+            max_steps=max_steps,
+            temp_dir=temp_dir,
+            context_file=context_file,
+            max_parallel_steps=max_parallel_steps,
+            plan_cache=plan_cache,
+            batch_executor_calls=batch_executor_calls,
+            artifact_store=artifact_store,
+            context_compactor=context_compactor,
+            tool_index=tool_index,
+            planner_top_k=planner_top_k,
+        )
+        self._request_lock = asyncio.Lock()
+
+    async def handle_request(self, user_request: str) -> str:  # type: ignore[override]
+        # Requests within one agent share context history, so they are serialized;
+        # independent agents (one per session) run fully concurrently.
+        async with self._request_lock:
+            return await self._handle_request(user_request)
+
+    async def _handle_request(self, user_request: str) -> str:
+        started = time.perf_counter()
+        logger.info("Planner received request: %s", user_request)
+        # Context log reads/appends, plan cache lookups and artifact spills touch the disk,
+        # so they run on worker threads instead of stalling every request on the loop.
+        await asyncio.to_thread(self._maybe_refresh_context_history)
+        created_handles: List[str] = []
+        final_response = ""
+        step_results: List[Dict[str, Any]] = []
+        steps: List[str] = []
+        try:
+            plan = await self._plan_steps(user_request)
+            steps = [planned.description for planned in plan]
+
+            batched_calls = await self._resolve_batched_calls(user_request, plan)
+
+            async def run_step(planned: PlanStep, dependencies: Dict[int, Dict[str, Any]]) -> Dict[str, Any]:
+                direct_call = self._direct_tool_call(planned, dependencies, batched_calls)
+                if direct_call is not None:
+                    result_text, value = await self.executor.call_tool(*direct_call)
+                else:
+                    instruction = self._prepare_step(user_request, planned, len(plan), dependencies)
+                    result_text, value = await self.executor.execute_step(instruction, planned.description)
+                return await asyncio.to_thread(
+                    self._record_step_result, planned, result_text, value, created_handles
+                )
+
+            step_results = await self.step_runner.run_async(plan, run_step)
+
+            final_response = await self._build_final_response(user_request, steps, step_results)
+        except Exception as exc:
+            logger.exception("Planner encountered an error while handling request.")
+            ERRORS.inc(stage="request")
+            final_response = f"Planner error: {exc}"
+        finally:
+            await asyncio.to_thread(
+                self._finish_request, user_request, steps, step_results, final_response, created_handles
+            )
+            STAGE_SECONDS.observe(time.perf_counter() - started, stage="request")
+
+        return final_response
+
+    async def _resolve_batched_calls(  # type: ignore[override]
+        self, user_request: str, plan: List[PlanStep]
+    ) -> Dict[int, Tuple[str, Dict[str, Any]]]:
+        candidates = self._batch_candidates(plan)
+        if not candidates:
+            return {}
+
+        calls = await self.executor.resolve_batch(
+            self._build_batch_instruction(user_request, candidates),
+            [planned.description for planned in candidates],
+        )
+        return self._accept_batched_calls(calls, candidates)
+
+    async def _plan_steps(self, user_request: str) -> List[PlanStep]:  # type: ignore[override]
+        cached = None
+        if self.plan_cache is not None:
+            cached = await asyncio.to_thread(self._get_cached_plan, user_request)
+        if cached:
+            return cached
+
+        messages = self._build_plan_messages(user_request)
+        with time_stage("planner"):
+            response = await self.client.chat.completions.create(
+                model=self.planner_model,
+                messages=messages,
+                temperature=self.planner_temperature,
+            )
+        record_usage("planner", response)
+
+        content = response.choices[0].message.content.strip()
+        logger.debug("Planner plan response: %s", content)
+
+        return await asyncio.to_thread(self._finalize_plan, content, user_request)
+
+    async def _build_final_response(  # type: ignore[override]
+        self,
+        user_request: str,
+        steps: List[str],
+        results: List[Dict[str, Any]],
+    ) -> str:
+        messages = self._build_summary_messages(user_request, steps, results)
+        with time_stage("summary"):
+            response = await self.client.chat.completions.create(
+                model=self.planner_model,
+                messages=messages,
+                temperature=self.planner_temperature,
+            )
+        record_usage("summary", response)
+
+        return response.choices[0].message.content.strip()
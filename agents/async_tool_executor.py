@@ -0,0 +1,138 @@
+import asyncio
+import contextlib
+import functools
+import inspect
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, ContextManager, Dict, Optional, Sequence, Tuple
+
+from openai import AsyncOpenAI
+
+from agents.tool_executor import ToolExecutor
+from prompts import ToolIndex
+from services.artifact_store import ArtifactStore
+from services.cache import TieredCache
+from services.metrics import record_usage, time_stage, time_tool
+from services.sessions import SessionContext
+from services.tool_scheduler import ToolScheduler
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncToolExecutor(ToolExecutor):
+    """Asyncio flavour of ToolExecutor; blocking plugins are offloaded to a bounded thread pool."""
+
+    def __init__(
+        self,
+        client: AsyncOpenAI,
+        tools: Dict[str, Callable],
+        system_prompt: str,
+        model: str,
+        temperature: float,
+        max_tool_workers: int = 8,
+        tool_pool: Optional[ThreadPoolExecutor] = None,
+        artifact_store: Optional[ArtifactStore] = None,
+        session: Optional[SessionContext] = None,
+        response_cache: Optional[TieredCache] = None,
+        tool_index: Optional[ToolIndex] = None,
+        tool_top_k: int = 8,
+        tool_format: str = "json",
+        scheduler: Optional[ToolScheduler] = None,
+    ) -> None:
+        super().__init__(
+            client=client,  # type: ignore[arg-type]
+            tools=tools,
+            system_prompt=system_prompt,
+            model=model,
+            temperature=temperature,
+            artifact_store=artifact_store,
+            session=session,
+            response_cache=response_cache,
+            tool_index=tool_index,
+            tool_top_k=tool_top_k,
+            tool_format=tool_format,
+            scheduler=scheduler,
+        )
+        self.tool_pool = tool_pool or ThreadPoolExecutor(
+            max_workers=max(1, max_tool_workers), thread_name_prefix="pipegent-tool"
+        )
+
+    async def execute(self, instruction: str) -> str:  # type: ignore[override]
+        return (await self.execute_step(instruction))[0]
+
+    async def execute_step(  # type: ignore[override]
+        self, instruction: str, tool_query: Optional[str] = None
+    ) -> Tuple[str, Any]:
+        content = await self._complete(instruction, tool_queries=[tool_query] if tool_query else ())
+
+        tool_call = self._parse_tool_call(content)
+        if tool_call is None:
+            return content, content
+
+        tool_name, args = tool_call
+        return await self.call_tool(tool_name, args)
+
+    async def resolve_batch(  # type: ignore[override]
+        self, instruction: str, tool_queries: Sequence[str] = ()
+    ) -> Dict[int, Tuple[str, Dict[str, Any]]]:
+        content = await self._complete(instruction, stage="executor_batch", tool_queries=tool_queries)
+        return self._parse_batch_calls(content)
+
+    async def call_tool(  # type: ignore[override]
+        self, tool_name: str, args: Dict[str, Any]
+    ) -> Tuple[str, Any]:
+        toolset = self.toolset
+        if tool_name not in toolset.tools:
+            message = f"Unknown tool: {tool_name}"
+            return message, message
+
+        try:
+            resolved_args = self._prepare_args(toolset, tool_name, args)
+            # Queued calls wait on the event loop, so they hold no thread in tool_pool.
+            slot = await self._tool_slot_async(tool_name, resolved_args)
+            with slot, time_tool(tool_name):
+                result = await self._invoke_tool(toolset.tools[tool_name], resolved_args)
+        except Exception as exc:
+            return self._tool_failure(tool_name, exc)
+        return self._format_result(tool_name, result), result
+
+    async def _tool_slot_async(self, tool_name: str, args: Dict[str, Any]) -> ContextManager[Any]:
+        if self.scheduler is None:
+            return contextlib.nullcontext()
+        session_key = self.session.session_id if self.session is not None else ""
+        return await self.scheduler.acquire_async(tool_name, args, session_key) or contextlib.nullcontext()
+
+    async def _complete(  # type: ignore[override]
+        self, instruction: str, stage: str = "executor", tool_queries: Sequence[str] = ()
+    ) -> str:
+        messages = self._build_messages(instruction, tool_queries)
+        cache_key = self._response_cache_key(messages)
+        cached = None
+        if cache_key is not None and self.response_cache is not None:
+            # The tiered cache may read SQLite, which must not block the event loop.
+            cached = await asyncio.to_thread(self._get_cached_response, cache_key)
+        if cached is not None:
+            return cached
+
+        with time_stage(stage):
+            response = await self.client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                temperature=self.temperature,
+            )
+        record_usage(stage, response)
+
+        content = response.choices[0].message.content.strip()
+        logger.debug("Executor response: %s", content)
+        if cache_key is not None and self.response_cache is not None:
+            await asyncio.to_thread(self._store_cached_response, cache_key, content)
+        return content
+
+    async def _invoke_tool(self, func: Callable[..., Any], args: Dict[str, Any]) -> Any:
+        if inspect.iscoroutinefunction(func):
+            return await func(**args)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.tool_pool, functools.partial(func, **args))
+
+    def close(self) -> None:
+        self.tool_pool.shutdown(wait=False)
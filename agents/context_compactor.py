@@ -0,0 +1,192 @@
+import json
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+
+from openai import OpenAI
+
+from services.metrics import CONTEXT_TOKENS_SAVED
+from services.tokens import estimate_message_tokens, estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+Message = Dict[str, str]
+# Receives the previous summary (may be empty) and the turns to fold; returns the new summary.
+Summarizer = Callable[[str, List[Message]], str]
+
+SUMMARY_PREFIX = "Summary of earlier interactions:\n"
+
+
+@dataclass
+class CompactionStats:
+    compactions: int = 0
+    folded_turns: int = 0
+    last_history_tokens: int = 0
+    last_tokens_saved: int = 0
+    total_tokens_saved: int = 0
+
+
+class ContextCompactor:
+    """Keeps planner history under a token budget.
+
+    The most recent ``keep_turns`` request/response pairs stay verbatim; older ones are
+    folded into a single running summary message. The fold is done locally right away;
+    if a ``summarizer`` (e.g. a cheap model) is configured it refines the summary in a
+    background thread and the result is swapped in on the next compaction pass.
+    """
+
+    def __init__(
+        self,
+        max_tokens: int = 3000,
+        keep_turns: int = 3,
+        summarizer: Optional[Summarizer] = None,
+        model: str = "gpt-4o-mini",
+    ) -> None:
+        self.max_tokens = max(1, max_tokens)
+        self.keep_turns = max(0, keep_turns)
+        self.summarizer = summarizer
+        self.model = model
+        self.stats = CompactionStats()
+        # Tokens the history would occupy had nothing ever been folded.
+        self._uncompacted_tokens = 0
+        self._lock = threading.Lock()
+        self._pending: Optional[Tuple[str, str]] = None
+        self._worker: Optional[threading.Thread] = None
+
+    def record_turn(self, turn: List[Message]) -> None:
+        self._uncompacted_tokens += estimate_message_tokens(turn, self.model)
+
+    def reset(self, history: List[Message]) -> None:
+        self._uncompacted_tokens = estimate_message_tokens(history, self.model)
+
+    def measure(self, history: List[Message]) -> int:
+        """Record how many tokens the current history saves versus the uncompacted one."""
+        tokens = estimate_message_tokens(history, self.model)
+        saved = max(0, self._uncompacted_tokens - tokens)
+        self.stats.last_history_tokens = tokens
+        self.stats.last_tokens_saved = saved
+        self.stats.total_tokens_saved += saved
+        CONTEXT_TOKENS_SAVED.inc(saved)
+        return saved
+
+    def compact(self, history: List[Message]) -> List[Message]:
+        history = self._apply_pending_summary(history)
+        if estimate_message_tokens(history, self.model) <= self.max_tokens:
+            return history
+
+        summary, turns = self._split(history)
+        keep = 2 * self.keep_turns
+        older, recent = (turns[:-keep], turns[-keep:]) if keep else (turns, [])
+        if not older:
+            logger.debug("Context over budget but only %s recent turns remain.", len(turns) // 2)
+            return history
+
+        local_summary = self._local_summary(summary, older, recent)
+        compacted = [{"role": "system", "content": SUMMARY_PREFIX + local_summary}] + recent
+        self.stats.compactions += 1
+        self.stats.folded_turns += len(older) // 2
+        logger.info(
+            "Compacted planner context: folded %s turns, %s -> %s tokens.",
+            len(older) // 2,
+            estimate_message_tokens(history, self.model),
+            estimate_message_tokens(compacted, self.model),
+        )
+
+        if self.summarizer is not None:
+            self._summarize_in_background(summary, older, compacted[0]["content"])
+        return compacted
+
+    @staticmethod
+    def _split(history: List[Message]) -> Tuple[str, List[Message]]:
+        if history and history[0].get("content", "").startswith(SUMMARY_PREFIX):
+            return history[0]["content"][len(SUMMARY_PREFIX):], history[1:]
+        return "", history
+
+    def _local_summary(self, summary: str, older: List[Message], recent: List[Message]) -> str:
+        lines = [line for line in summary.splitlines() if line.strip()]
+        for index in range(0, len(older) - 1, 2):
+            lines.append(_summarize_turn(older[index], older[index + 1]))
+
+        # The summary may use whatever budget the verbatim turns leave (at least a quarter).
+        budget = max(
+            self.max_tokens // 4,
+            self.max_tokens - estimate_message_tokens(recent, self.model),
+        )
+        while len(lines) > 1 and estimate_tokens("\n".join(lines), self.model) > budget:
+            lines.pop(0)
+        return "\n".join(lines)
+
+    def _apply_pending_summary(self, history: List[Message]) -> List[Message]:
+        with self._lock:
+            pending = self._pending
+            self._pending = None
+        if pending is None or not history:
+            return history
+
+        placeholder, refined = pending
+        if history[0].get("content") != placeholder:
+            return history
+        logger.debug("Applying model-generated context summary.")
+        return [{"role": "system", "content": SUMMARY_PREFIX + refined}] + history[1:]
+
+    def _summarize_in_background(self, summary: str, older: List[Message], placeholder: str) -> None:
+        if self._worker is not None and self._worker.is_alive():
+            return
+
+        def run() -> None:
+            try:
+                refined = self.summarizer(summary, older).strip()  # type: ignore[misc]
+            except Exception:
+                logger.exception("Background context summarization failed.")
+                return
+            if refined:
+                with self._lock:
+                    self._pending = (placeholder, refined)
+
+        self._worker = threading.Thread(target=run, name="pipegent-context-summary", daemon=True)
+        self._worker.start()
+
+
+def _summarize_turn(request_message: Message, response_message: Message) -> str:
+    request = request_message.get("content", "").replace("Previous request:\n", "", 1)
+    response = response_message.get("content", "").replace("Completed prior interaction:\n", "", 1)
+    try:
+        payload = json.loads(response)
+        response = str(payload.get("final_response", response))
+    except (json.JSONDecodeError, AttributeError):
+        pass
+    return f"- {_clip(request, 200)} => {_clip(response, 300)}"
+
+
+def _clip(text: str, limit: int) -> str:
+    text = " ".join(text.split())
+    return text if len(text) <= limit else text[: limit - 3] + "..."
+
+
+def build_model_summarizer(client: OpenAI, model: str, temperature: float = 0.0) -> Summarizer:
+    """Summarizer backed by a (cheap) chat model, meant to run off the request path."""
+
+    def summarize(previous_summary: str, turns: List[Message]) -> str:
+        transcript = "\n\n".join(f"{turn['role']}: {turn['content']}" for turn in turns)
+        response = client.chat.completions.create(
+            model=model,
+            temperature=temperature,
+            messages=[
+                {
+                    "role": "system",
+                    "content": (
+                        "Condense an agent's past interactions into terse bullet points. Keep user "
+                        "goals, concrete results (numbers, names, file paths) and open follow-ups; "
+                        "drop tool-call mechanics. Return only the bullet list."
+                    ),
+                },
+                {
+                    "role": "user",
+                    "content": f"Existing summary:\n{previous_summary or '(none)'}\n\nNew interactions:\n{transcript}",
+                },
+            ],
+        )
+        return response.choices[0].message.content
+
+    return summarize
@@ -0,0 +1,80 @@
+import re
+from typing import Any, Mapping, Set
+
+# "$step2.result", "$step2.result.entries[0].title", ...
+REFERENCE_PATTERN = re.compile(r"\$step(\d+)\.result((?:\.[A-Za-z_][\w-]*|\[\d+\])*)")
+_PATH_TOKEN = re.compile(r"\.([A-Za-z_][\w-]*)|\[(\d+)\]")
+
+
+class UnresolvedReferenceError(ValueError):
+    pass
+
+
+def referenced_steps(value: Any) -> Set[int]:
+    if isinstance(value, str):
+        return {int(match.group(1)) for match in REFERENCE_PATTERN.finditer(value)}
+    if isinstance(value, dict):
+        found: Set[int] = set()
+        for item in value.values():
+            found |= referenced_steps(item)
+        return found
+    if isinstance(value, list):
+        found = set()
+        for item in value:
+            found |= referenced_steps(item)
+        return found
+    return set()
+
+
+def renumber_references(value: Any, mapping: Mapping[int, int]) -> Any:
+    """Rewrite step numbers inside references; raises if a referenced step is not mapped."""
+    if isinstance(value, str):
+        def substitute(match: "re.Match[str]") -> str:
+            original = int(match.group(1))
+            if original not in mapping:
+                raise UnresolvedReferenceError(f"Reference to unknown step {original}")
+            return f"$step{mapping[original]}.result{match.group(2)}"
+
+        return REFERENCE_PATTERN.sub(substitute, value)
+    if isinstance(value, dict):
+        return {key: renumber_references(item, mapping) for key, item in value.items()}
+    if isinstance(value, list):
+        return [renumber_references(item, mapping) for item in value]
+    return value
+
+
+def resolve_references(value: Any, results: Mapping[int, Any]) -> Any:
+    """Replace step references with prior results.
+
+    A string that is exactly one reference takes the referenced value with its
+    original type; references embedded in longer strings are interpolated as text.
+    """
+    if isinstance(value, str):
+        match = REFERENCE_PATTERN.fullmatch(value.strip())
+        if match:
+            return _lookup(match, results)
+        return REFERENCE_PATTERN.sub(lambda inner: str(_lookup(inner, results)), value)
+    if isinstance(value, dict):
+        return {key: resolve_references(item, results) for key, item in value.items()}
+    if isinstance(value, list):
+        return [resolve_references(item, results) for item in value]
+    return value
+
+
+def _lookup(match: "re.Match[str]", results: Mapping[int, Any]) -> Any:
+    step_number = int(match.group(1))
+    if step_number not in results:
+        raise UnresolvedReferenceError(f"Step {step_number} has no result yet")
+
+    current = results[step_number]
+    for key, index in _PATH_TOKEN.findall(match.group(2)):
+        try:
+            if key:
+                current = current[key]
+            else:
+                current = current[int(index)]
+        except (KeyError, IndexError, TypeError) as exc:
+            raise UnresolvedReferenceError(
+                f"Cannot resolve '{match.group(0)}': missing '{key or index}'"
+            ) from exc
+    return current
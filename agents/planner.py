@@ -1,22 +1,54 @@
+import hashlib
 import json
 import logging
-import secrets
+import re
+import time
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 from openai import OpenAI
 
-from agents.tool_executor import ToolExecutor
+from agents.context_compactor import ContextCompactor
+from agents.dataflow import (
+    UnresolvedReferenceError,
+    referenced_steps,
+    renumber_references,
+    resolve_references,
+)
+from agents.step_graph import PlanStep, StepGraphRunner
+from agents.tool_executor import ALWAYS_OFFERED_TOOLS, ToolExecutor
+from prompts import ToolIndex
+from services.artifact_store import ArtifactStore
+from services.cache import TieredCache
+from services.context_log import ContextLog
+from services.metrics import ERRORS, STAGE_SECONDS, record_usage, time_stage
+from services.plugin_loader import fingerprint_tool_specs
 
 logger = logging.getLogger(__name__)
 
+# Requests with one of these words may refer back to earlier turns ("double it", "do that again").
+_BACK_REFERENCE = re.compile(
+    r"\b(it|its|that|this|these|those|them|they|again|same|previous|previously|last|above|"
+    r"earlier|before|result|results|answer|instead|another)\b"
+)
+# Whole words only: "hi" must not match "third" or "this".
+_FILLER_STEP = re.compile(
+    r"\b(greet\w*|hello|hi|thank\w*|assist you today|offer further assistance|wait for|check in)\b"
+)
+# Quoted literals are tool input ("reverse 'hello world'"), not what the step does.
+_QUOTED_TEXT = re.compile(r"(?<!\w)'[^']*'(?!\w)|\"[^\"]*\"")
+# Only the latest turn(s) are keyed, so follow-ups still share plans across sessions.
+PLAN_CACHE_CONTEXT_MESSAGES = 2
+
 
 class PlannerAgent:
     PLAN_SYSTEM_PROMPT = (
         "You are Pipegent's planning LLM. Break user goals into an ordered list of "
         "concrete steps that a separate execution agent can follow. Produce strictly "
-        "valid JSON that looks like {{\"steps\": [\"step description\", ...]}} and return "
-        "only as many steps as are truly required (between 1 and {max_steps}). Skip filler "
+        "valid JSON that looks like {{\"steps\": [{{\"step\": \"step description\", \"depends_on\": "
+        "[numbers of earlier steps whose outputs this step uses]}}, ...]}} and return "
+        "only as many steps as are truly required (between 1 and {max_steps}). Use an empty "
+        "depends_on list for steps that need no earlier output so they can run in parallel. Skip filler "
         "actions like greetings, generic follow-up questions, or waiting unless the user "
         "explicitly requests them. Each step must correspond to exactly one tool invocation "
         "or simple action - never describe loops or say 'repeat'; instead enumerate every "
@@ -25,7 +57,13 @@ class PlannerAgent:
         "state rolls=1 unless the user explicitly asks for a different value. Remember that the "
         "calculator tool accepts only two inputs; summing more than two numbers requires multiple "
         "calculator steps (each adding two values or partial totals). Refer to prior results by step "
-        "number (e.g., 'use the value from step 1') instead of inventing variable names."
+        "number (e.g., 'use the value from step 1') instead of inventing variable names. When you "
+        "already know every argument of a step, also include \"tool\" and \"args\" with the exact tool "
+        "call; inside args you may reference earlier outputs with \"$stepN.result\" (or a path into a "
+        "structured result such as \"$step2.result.entries[0].link\"), for example "
+        "{{\"step\": \"simple_calculator: add step 1 and step 2\", \"depends_on\": [1, 2], "
+        "\"tool\": \"simple_calculator\", \"args\": {{\"a\": \"$step1.result\", \"b\": "
+        "\"$step2.result\", \"operation\": \"add\"}}}}. Omit tool/args when a step needs interpretation."
     )
     SUMMARY_SYSTEM_PROMPT = (
         "You are Pipegent's planning LLM. Given the original request and the outputs "
@@ -43,60 +81,310 @@ class PlannerAgent:
         max_steps: int,
         temp_dir: Path,
         context_file: Optional[Path] = None,
+        max_parallel_steps: int = 1,
+        plan_cache: Optional[TieredCache] = None,
+        batch_executor_calls: bool = False,
+        artifact_store: Optional[ArtifactStore] = None,
+        context_compactor: Optional[ContextCompactor] = None,
+        tool_index: Optional[ToolIndex] = None,
+        planner_top_k: int = 0,
     ) -> None:
         self.client = client
         self.executor = executor
         self.tool_specs = tool_specs
+        self.tools_fingerprint = fingerprint_tool_specs(tool_specs)
+        self.plan_cache = plan_cache
         self.planner_model = planner_model
         self.planner_temperature = planner_temperature
         self.max_steps = max(1, max_steps)
         self.temp_dir = temp_dir
+        self.artifacts = (
+            artifact_store if artifact_store is not None else ArtifactStore(temp_dir / "artifacts")
+        )
+        self.step_runner = StepGraphRunner(max_workers=max_parallel_steps)
+        self.batch_executor_calls = batch_executor_calls
         self.context_file = context_file
+        self.context_log = ContextLog(context_file) if context_file else None
+        self.context_compactor = context_compactor
+        self.tool_index = tool_index
+        self.planner_top_k = max(0, planner_top_k)
         self.context_history: List[Dict[str, str]] = []
-        self._context_file_mtime: Optional[float] = None
         self._load_context_history()
 
+    def update_tools(
+        self,
+        tools: Dict[str, Callable],
+        tool_specs: List[Dict[str, Any]],
+        system_prompt: str,
+        tool_index: Optional[ToolIndex] = None,
+    ) -> None:
+        """Switch this agent (and its executor) to a reloaded plugin set."""
+        self.executor.update_tools(tools, system_prompt, tool_index)
+        self.tool_specs = tool_specs
+        self.tools_fingerprint = fingerprint_tool_specs(tool_specs)
+        self.tool_index = tool_index
+
     def handle_request(self, user_request: str) -> str:
+        started = time.perf_counter()
         logger.info("Planner received request: %s", user_request)
         self._maybe_refresh_context_history()
-        created_files: List[Path] = []
+        created_handles: List[str] = []
         final_response = ""
         step_results: List[Dict[str, Any]] = []
         steps: List[str] = []
         try:
-            steps = self._plan_steps(user_request)
+            plan = self._plan_steps(user_request)
+            steps = [planned.description for planned in plan]
 
-            for index, step in enumerate(steps, start=1):
-                logger.info("Executing plan step %s/%s: %s", index, len(steps), step)
-                instruction = self._build_executor_instruction(
-                    user_request, step, index, step_results
-                )
-                result_text = self.executor.execute(instruction)
-                file_path = self._write_temp_file(result_text)
-                created_files.append(file_path)
-                step_results.append(
-                    {
-                        "step": step,
-                        "result": result_text,
-                        "file_path": str(file_path),
-                    }
-                )
+            batched_calls = self._resolve_batched_calls(user_request, plan)
+
+            def run_step(planned: PlanStep, dependencies: Dict[int, Dict[str, Any]]) -> Dict[str, Any]:
+                direct_call = self._direct_tool_call(planned, dependencies, batched_calls)
+                if direct_call is not None:
+                    result_text, value = self.executor.call_tool(*direct_call)
+                else:
+                    instruction = self._prepare_step(user_request, planned, len(plan), dependencies)
+                    result_text, value = self.executor.execute_step(instruction, planned.description)
+                return self._record_step_result(planned, result_text, value, created_handles)
+
+            step_results = self.step_runner.run(plan, run_step)
 
             final_response = self._build_final_response(user_request, steps, step_results)
         except Exception as exc:
             logger.exception("Planner encountered an error while handling request.")
+            ERRORS.inc(stage="request")
             final_response = f"Planner error: {exc}"
         finally:
-            self._cleanup_temp_files(created_files)
-            if final_response:
-                self._append_history(user_request, steps, step_results, final_response)
-                logger.info("Planner completed request with %s steps.", len(steps))
+            self._finish_request(user_request, steps, step_results, final_response, created_handles)
+            STAGE_SECONDS.observe(time.perf_counter() - started, stage="request")
 
         return final_response
 
-    def _plan_steps(self, user_request: str) -> List[str]:
+    def _finish_request(
+        self,
+        user_request: str,
+        steps: List[str],
+        step_results: List[Dict[str, Any]],
+        final_response: str,
+        created_handles: List[str],
+    ) -> None:
+        if final_response:
+            with time_stage("context"):
+                self._append_history(user_request, steps, step_results, final_response)
+            logger.info("Planner completed request with %s steps.", len(steps))
+        for handle in created_handles:
+            self.artifacts.release(handle)
+
+    def _resolve_batched_calls(
+        self, user_request: str, plan: List[PlanStep]
+    ) -> Dict[int, Tuple[str, Dict[str, Any]]]:
+        candidates = self._batch_candidates(plan)
+        if not candidates:
+            return {}
+
+        calls = self.executor.resolve_batch(
+            self._build_batch_instruction(user_request, candidates),
+            [planned.description for planned in candidates],
+        )
+        return self._accept_batched_calls(calls, candidates)
+
+    def _batch_candidates(self, plan: List[PlanStep]) -> List[PlanStep]:
+        if not self.batch_executor_calls:
+            return []
+        independent = [
+            planned for planned in plan if not planned.depends_on and planned.tool is None
+        ]
+        # A single independent step gains nothing from batching.
+        return independent if len(independent) > 1 else []
+
+    def _accept_batched_calls(
+        self,
+        calls: Dict[int, Tuple[str, Dict[str, Any]]],
+        candidates: List[PlanStep],
+    ) -> Dict[int, Tuple[str, Dict[str, Any]]]:
+        eligible = {planned.index for planned in candidates}
+        accepted = {
+            index: call
+            for index, call in calls.items()
+            if index in eligible and call[0] in self.executor.tools
+        }
+        logger.info(
+            "Executor batch resolved %s of %s independent steps in one call.",
+            len(accepted),
+            len(candidates),
+        )
+        return accepted
+
+    def _build_batch_instruction(self, user_request: str, candidates: List[PlanStep]) -> str:
+        step_lines = "\n".join(
+            f"Step {planned.index}: {planned.description}" for planned in candidates
+        )
+        return (
+            f"Original request:\n{user_request}\n\n"
+            f"You are executing these independent plan steps together:\n{step_lines}\n\n"
+            "For this message only, respond with a single JSON object of the form "
+            '{"calls": [{"step": <step number>, "tool": "<tool_name>", "args": {...}}, ...]} '
+            "containing exactly one tool call per listed step, in the order listed. "
+            "Execute each step exactly once - do not loop or merge steps. "
+            "Keep tool arguments singular (for example, leave roll_dice 'rolls' at 1 unless a step explicitly says otherwise)."
+        )
+
+    def _direct_tool_call(
+        self,
+        planned: PlanStep,
+        dependencies: Dict[int, Dict[str, Any]],
+        batched_calls: Dict[int, Tuple[str, Dict[str, Any]]],
+    ) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """Return a tool call that can run without the executor LLM, if the step has one."""
+        if planned.index in batched_calls:
+            logger.info("Dispatching batched tool call for step %s: %s", planned.index, planned.description)
+            return batched_calls[planned.index]
+
+        if planned.tool is None:
+            return None
+
+        values = {index: entry.get("value") for index, entry in dependencies.items()}
+        try:
+            args = resolve_references(planned.args or {}, values)
+        except UnresolvedReferenceError as exc:
+            logger.warning(
+                "Step %s falls back to the executor LLM: %s", planned.index, exc
+            )
+            return None
+
+        logger.info("Dispatching planned tool call for step %s: %s", planned.index, planned.tool)
+        return planned.tool, args
+
+    def _prepare_step(
+        self,
+        user_request: str,
+        planned: PlanStep,
+        total_steps: int,
+        dependencies: Dict[int, Dict[str, Any]],
+    ) -> str:
+        logger.info("Executing plan step %s/%s: %s", planned.index, total_steps, planned.description)
+        return self._build_executor_instruction(
+            user_request, planned.description, planned.index, dependencies
+        )
+
+    def _record_step_result(
+        self, planned: PlanStep, result_text: str, value: Any, created_handles: List[str]
+    ) -> Dict[str, Any]:
+        handle = self.artifacts.put(result_text)
+        created_handles.append(handle)
+        return {
+            "step": planned.description,
+            "artifact": handle,
+            "value": value,
+        }
+
+    def _plan_steps(self, user_request: str) -> List[PlanStep]:
+        cached = self._get_cached_plan(user_request)
+        if cached:
+            return cached
+
+        messages = self._build_plan_messages(user_request)
+        with time_stage("planner"):
+            response = self.client.chat.completions.create(
+                model=self.planner_model,
+                messages=messages,
+                temperature=self.planner_temperature,
+            )
+        record_usage("planner", response)
+
+        content = response.choices[0].message.content.strip()
+        logger.debug("Planner plan response: %s", content)
+
+        return self._finalize_plan(content, user_request)
+
+    def _finalize_plan(self, content: str, user_request: str) -> List[PlanStep]:
+        planned_steps = self._parse_plan(content)
+        if not planned_steps:
+            return [PlanStep(index=1, description=user_request)]
+
+        self._store_cached_plan(user_request, planned_steps)
+        return planned_steps
+
+    @staticmethod
+    def _normalize_request(user_request: str) -> str:
+        return re.sub(r"\s+", " ", user_request).strip().casefold()
+
+    def _plan_cache_key(self, user_request: str) -> str:
+        normalized = self._normalize_request(user_request)
+        context = self._plan_cache_context(normalized)
+        key_material = json.dumps(
+            [normalized, self.planner_model, self.planner_temperature, self.tools_fingerprint, context],
+            ensure_ascii=True,
+            sort_keys=True,
+        )
+        return hashlib.sha256(key_material.encode("utf-8")).hexdigest()
+
+    def _plan_cache_context(self, normalized_request: str) -> Optional[List[Dict[str, str]]]:
+        """The turns a follow-up such as "double it" depends on; None for self-contained requests.
+
+        Keying every request on the whole history would only ever hit for identical
+        conversations, so self-contained requests share one entry across sessions.
+        """
+        if not self.context_history or not _BACK_REFERENCE.search(normalized_request):
+            return None
+        return self.context_history[-PLAN_CACHE_CONTEXT_MESSAGES:]
+
+    def _get_cached_plan(self, user_request: str) -> Optional[List[PlanStep]]:
+        if self.plan_cache is None:
+            return None
+
+        cached = self.plan_cache.get(self._plan_cache_key(user_request))
+        stats = self.plan_cache.stats
+        if self._plan_cache_context(self._normalize_request(user_request)) is not None:
+            stats.context_keyed += 1
+        if not cached:
+            logger.info(
+                "Plan cache miss (hits=%s, misses=%s, context-keyed=%s).",
+                stats.hits,
+                stats.misses,
+                stats.context_keyed,
+            )
+            return None
+
+        logger.info(
+            "Plan cache hit (hits=%s, misses=%s, context-keyed=%s).", stats.hits, stats.misses, stats.context_keyed
+        )
+        return [
+            PlanStep(
+                index=int(entry["index"]),
+                description=str(entry["description"]),
+                depends_on=tuple(int(dep) for dep in entry.get("depends_on", [])),
+            )
+            for entry in cached
+        ]
+
+    def _store_cached_plan(self, user_request: str, planned_steps: List[PlanStep]) -> None:
+        if self.plan_cache is None:
+            return
+
+        # Planned tool calls are not stored: the cache is shared by every session, and a
+        # replayed step has the executor derive its arguments from this request again.
+        self.plan_cache.set(
+            self._plan_cache_key(user_request),
+            [
+                {
+                    "index": planned.index,
+                    "description": planned.description,
+                    "depends_on": list(planned.depends_on),
+                }
+                for planned in planned_steps
+            ],
+        )
+
+    def _planner_tool_specs(self, user_request: str) -> List[Dict[str, Any]]:
+        """Tools listed to the planner: the top ``planner_top_k`` matches for the request, or all of them."""
+        if self.tool_index is None or not self.planner_top_k:
+            return self.tool_specs
+        return self.tool_index.select(user_request, self.planner_top_k, always=ALWAYS_OFFERED_TOOLS)
+
+    def _build_plan_messages(self, user_request: str) -> List[Dict[str, str]]:
         tool_lines = "\n".join(
-            f"- {spec.get('name')}: {spec.get('description')}" for spec in self.tool_specs
+            f"- {spec.get('name')}: {spec.get('description')}" for spec in self._planner_tool_specs(user_request)
         ) or "(No plugins available)"
 
         user_prompt = (
@@ -105,7 +393,8 @@ class PlannerAgent:
             "Only include essential actions that directly move the user toward their goal; "
             "omit pleasantries or generic follow-ups unless explicitly requested. Each step must map to a single tool call. "
             "If the user needs repeated actions (e.g., roll four times), output four distinct steps, one per iteration. "
-            "Remember calculator accepts exactly two inputs; create additional calculator steps to accumulate sums beyond two numbers, and refer to earlier outputs by step number (e.g., 'use step 1 result') rather than inventing new variables."
+            "Remember calculator accepts exactly two inputs; create additional calculator steps to accumulate sums beyond two numbers, and refer to earlier outputs by step number (e.g., 'use step 1 result') rather than inventing new variables. "
+            "List in depends_on every earlier step number whose output a step needs, and leave it empty for independent steps."
         )
 
         messages = [
@@ -116,37 +405,100 @@ class PlannerAgent:
         ]
         messages.extend(self.context_history)
         messages.append({"role": "user", "content": user_prompt})
+        if self.context_compactor is not None:
+            saved = self.context_compactor.measure(self.context_history)
+            logger.info(
+                "Planner context history: %s tokens (%s saved by compaction).",
+                self.context_compactor.stats.last_history_tokens,
+                saved,
+            )
+        return messages
 
-        response = self.client.chat.completions.create(
-            model=self.planner_model,
-            messages=messages,
-            temperature=self.planner_temperature,
-        )
-
-        content = response.choices[0].message.content.strip()
-        logger.debug("Planner plan response: %s", content)
-
-        planned_steps: List[str] = []
+    def _parse_plan(self, content: str) -> List[PlanStep]:
+        candidates: List[Tuple[int, str, Optional[List[int]], Optional[str], Optional[Dict[str, Any]]]] = []
         try:
             parsed = json.loads(content)
-            candidate_steps = parsed.get("steps", [])
-            if isinstance(candidate_steps, list):
-                for raw in candidate_steps:
+        except json.JSONDecodeError:
+            parsed = None
+
+        raw_steps = parsed.get("steps", []) if isinstance(parsed, dict) else []
+        if isinstance(raw_steps, list):
+            for original_index, raw in enumerate(raw_steps, start=1):
+                depends_on: Optional[List[int]] = None
+                tool: Optional[str] = None
+                args: Optional[Dict[str, Any]] = None
+                if isinstance(raw, dict):
+                    text_step = str(raw.get("step") or raw.get("description") or "").strip()
+                    raw_deps = raw.get("depends_on")
+                    if isinstance(raw_deps, list):
+                        depends_on = [int(dep) for dep in raw_deps if str(dep).strip().isdigit()]
+                    tool, args = self._parse_planned_call(raw, original_index)
+                    if tool is not None:
+                        depends_on = sorted(set(depends_on or []) | referenced_steps(args))
+                else:
                     text_step = str(raw).strip()
-                    if not text_step:
-                        continue
-                    if self._is_filler_step(text_step):
-                        continue
-                    if not self._mentions_tool(text_step):
+                candidates.append((original_index, text_step, depends_on, tool, args))
+
+        explicit_graph = any(candidate[2] is not None for candidate in candidates)
+
+        # Steps may be filtered out below, so dependencies are remapped onto the
+        # surviving steps (a dropped step passes its own dependencies through).
+        kept_index: Dict[int, int] = {}
+        inherited: Dict[int, Tuple[int, ...]] = {}
+        planned_steps: List[PlanStep] = []
+        for original_index, text_step, depends_on, tool, args in candidates:
+            if explicit_graph and depends_on is not None:
+                resolved: List[int] = []
+                for dep in depends_on or []:
+                    if dep >= original_index:
                         continue
-                    planned_steps.append(text_step)
-        except json.JSONDecodeError:
-            pass
+                    if dep in kept_index:
+                        resolved.append(kept_index[dep])
+                    else:
+                        resolved.extend(inherited.get(dep, ()))
+                deps = tuple(sorted(set(resolved)))
+            else:
+                deps = tuple(range(1, len(planned_steps) + 1))
+
+            if (
+                not text_step
+                or self._is_filler_step(text_step)
+                or (tool is None and not self._mentions_tool(text_step))
+                or len(planned_steps) >= self.max_steps
+            ):
+                inherited[original_index] = deps
+                continue
+
+            if tool is not None:
+                try:
+                    args = renumber_references(args, kept_index)
+                except UnresolvedReferenceError as exc:
+                    logger.debug("Dropping planned call for step %s: %s", original_index, exc)
+                    tool, args = None, None
+
+            kept_index[original_index] = len(planned_steps) + 1
+            planned_steps.append(
+                PlanStep(
+                    index=len(planned_steps) + 1,
+                    description=text_step,
+                    depends_on=deps,
+                    tool=tool,
+                    args=args,
+                )
+            )
 
-        if not planned_steps:
-            planned_steps = [user_request]
+        return planned_steps
 
-        return planned_steps[: self.max_steps]
+    def _parse_planned_call(
+        self, raw: Dict[str, Any], original_index: int
+    ) -> Tuple[Optional[str], Optional[Dict[str, Any]]]:
+        tool = raw.get("tool")
+        args = raw.get("args", {})
+        if not isinstance(tool, str) or tool not in self.executor.tools or not isinstance(args, dict):
+            return None, None
+        if any(ref >= original_index for ref in referenced_steps(args)):
+            return None, None
+        return tool, args
 
     def _mentions_tool(self, step: str) -> bool:
         lowered = step.lower()
@@ -158,32 +510,24 @@ class PlannerAgent:
 
     @staticmethod
     def _is_filler_step(step: str) -> bool:
-        fillers = [
-            "greet","hello","hi","thank","assist you today","offer further assistance","wait for","check in"
-        ]
-        lowered = step.lower()
-        return any(keyword in lowered for keyword in fillers)
+        return bool(_FILLER_STEP.search(_QUOTED_TEXT.sub(" ", step.lower())))
 
     def _build_executor_instruction(
         self,
         user_request: str,
         step: str,
         index: int,
-        prior_results: List[Dict[str, Any]],
+        prior_results: Dict[int, Dict[str, Any]],
     ) -> str:
         if prior_results:
             sections = []
-            for idx, entry in enumerate(prior_results):
-                file_path = Path(entry["file_path"]) if entry.get("file_path") else None
-                try:
-                    file_contents = (
-                        file_path.read_text(encoding="utf-8") if file_path else entry["result"]
-                    )
-                except OSError:
-                    file_contents = entry["result"]
-                preview = file_contents[:300]
+            for idx, entry in sorted(prior_results.items()):
+                handle = entry["artifact"]
+                preview = self.artifacts.preview(handle, 300)
                 sections.append(
-                    f"Step {idx + 1}: {entry['step']}\nFile: {entry['file_path']}\nOutput preview: {preview}"
+                    f"Step {idx}: {entry['step']}\n"
+                    f"Artifact: {handle} ({self.artifacts.size(handle)} bytes)\n"
+                    f"Output preview: {preview}"
                 )
             previous = "\n\n".join(sections)
         else:
@@ -194,6 +538,7 @@ class PlannerAgent:
             f"You are executing plan step #{index}: {step}.\n"
             f"Previous step outputs:\n{previous}\n\n"
             "Use the available tools to accomplish this step. Execute it exactly once - do not loop or batch. "
+            "To pass a previous output to a tool unchanged, use its artifact handle as the argument value instead of copying the text. "
             "Keep tool arguments singular (for example, leave roll_dice 'rolls' at 1 unless this step explicitly says otherwise)."
         )
 
@@ -203,20 +548,30 @@ class PlannerAgent:
         steps: List[str],
         results: List[Dict[str, Any]],
     ) -> str:
+        messages = self._build_summary_messages(user_request, steps, results)
+        with time_stage("summary"):
+            response = self.client.chat.completions.create(
+                model=self.planner_model,
+                messages=messages,
+                temperature=self.planner_temperature,
+            )
+        record_usage("summary", response)
+
+        final_content = response.choices[0].message.content.strip()
+        return final_content
+
+    def _build_summary_messages(
+        self,
+        user_request: str,
+        steps: List[str],
+        results: List[Dict[str, Any]],
+    ) -> List[Dict[str, str]]:
         summarized_results = []
         for entry in results:
-            file_path = Path(entry["file_path"]) if entry.get("file_path") else None
-            try:
-                file_contents = (
-                    file_path.read_text(encoding="utf-8") if file_path else entry["result"]
-                )
-            except OSError:
-                file_contents = entry["result"]
-
             summarized_results.append(
                 {
                     "step": entry["step"],
-                    "output_preview": file_contents[:1000],
+                    "output_preview": self.artifacts.preview(entry["artifact"], 1000),
                 }
             )
 
@@ -236,29 +591,7 @@ class PlannerAgent:
                 ),
             },
         ]
-
-        response = self.client.chat.completions.create(
-            model=self.planner_model,
-            messages=messages,
-            temperature=self.planner_temperature,
-        )
-
-        final_content = response.choices[0].message.content.strip()
-        return final_content
-
-    def _write_temp_file(self, data: str) -> Path:
-        self.temp_dir.mkdir(parents=True, exist_ok=True)
-        filename = secrets.token_hex(8) + ".txt"
-        file_path = self.temp_dir / filename
-        file_path.write_text(str(data), encoding="utf-8")
-        return file_path
-
-    def _cleanup_temp_files(self, files: List[Path]) -> None:
-        for file_path in files:
-            try:
-                file_path.unlink()
-            except FileNotFoundError:
-                pass
+        return messages
 
     def _append_history(
         self,
@@ -275,7 +608,7 @@ class PlannerAgent:
             condensed_results.append(
                 {
                     "step": entry.get("step", ""),
-                    "result_preview": str(entry.get("result", ""))[:500],
+                    "result_preview": self.artifacts.preview(entry["artifact"], 500),
                 }
             )
 
@@ -285,83 +618,62 @@ class PlannerAgent:
             "final_response": final_response,
         }
 
-        self.context_history.append(
-            {"role": "user", "content": f"Previous request:\n{user_request}"}
-        )
-        self.context_history.append(
+        turn = [
+            {"role": "user", "content": f"Previous request:\n{user_request}"},
             {
                 "role": "assistant",
                 "content": (
                     "Completed prior interaction:\n"
                     + json.dumps(summary_payload, ensure_ascii=False)
                 ),
-            }
-        )
-        self._persist_context_history()
+            },
+        ]
+        # Pick up external changes (e.g. clear_context ran during this request) first.
+        self._maybe_refresh_context_history()
+        self.context_history.extend(turn)
+        compacted = False
+        if self.context_compactor is not None:
+            self.context_compactor.record_turn(turn)
+            history = self.context_compactor.compact(self.context_history)
+            compacted = history is not self.context_history
+            self.context_history = history
+        self._persist_context_history(turn, replace=compacted)
 
     def _load_context_history(self) -> None:
-        if not self.context_file:
+        if self.context_log is None:
             return
         try:
-            raw_text = self.context_file.read_text(encoding="utf-8")
-            mtime = self.context_file.stat().st_mtime
-        except FileNotFoundError:
-            self.context_history = []
-            self._context_file_mtime = None
-            return
+            self.context_history = self.context_log.load()
         except OSError:
+            logger.exception("Failed to load context log %s", self.context_file)
             return
+        if self.context_compactor is not None:
+            self.context_compactor.reset(self.context_history)
 
-        try:
-            raw = json.loads(raw_text)
-        except json.JSONDecodeError:
-            self.context_history = []
-            self._context_file_mtime = mtime
-            return
-
-        cleaned: List[Dict[str, str]] = []
-        if isinstance(raw, list):
-            for entry in raw:
-                if (
-                    isinstance(entry, dict)
-                    and "role" in entry
-                    and "content" in entry
-                ):
-                    cleaned.append(
-                        {
-                            "role": str(entry["role"]),
-                            "content": str(entry["content"]),
-                        }
-                    )
-
-        self.context_history = cleaned
-        self._context_file_mtime = mtime
-
-    def _persist_context_history(self) -> None:
-        if not self.context_file:
+    def _persist_context_history(self, new_messages: List[Dict[str, str]], replace: bool = False) -> None:
+        if self.context_log is None:
             return
         try:
-            self.context_file.parent.mkdir(parents=True, exist_ok=True)
-            self.context_file.write_text(
-                json.dumps(self.context_history, ensure_ascii=False, indent=2),
-                encoding="utf-8",
-            )
-            self._context_file_mtime = self.context_file.stat().st_mtime
+            if replace:
+                self.context_log.replace(self.context_history)
+            else:
+                self.context_log.append(new_messages)
         except OSError:
-            pass
+            logger.exception("Failed to persist context log %s", self.context_file)
 
     def _maybe_refresh_context_history(self) -> None:
-        if not self.context_file:
+        if self.context_log is None:
             return
         try:
-            current_mtime = self.context_file.stat().st_mtime
-        except FileNotFoundError:
-            if self.context_history:
-                self.context_history = []
-            self._context_file_mtime = None
-            return
+            reset, messages = self.context_log.read_new()
         except OSError:
             return
 
-        if self._context_file_mtime is None or current_mtime > self._context_file_mtime:
-            self._load_context_history()
+        if reset:
+            self.context_history = messages
+            if self.context_compactor is not None:
+                self.context_compactor.reset(messages)
+        elif messages:
+            self.context_history.extend(messages)
+            if self.context_compactor is not None:
+                self.context_compactor.record_turn(messages)
@@ -0,0 +1,104 @@
+import asyncio
+import logging
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class PlanStep:
+    """A single planned step plus the 1-based step numbers whose outputs it consumes.
+
+    When the planner fully specifies the call, ``tool``/``args`` are set and the step
+    is run locally (args may hold ``$stepN.result`` references) without the executor LLM.
+    """
+
+    index: int
+    description: str
+    depends_on: Tuple[int, ...] = ()
+    tool: Optional[str] = None
+    args: Optional[Dict[str, Any]] = None
+
+
+StepCallable = Callable[[PlanStep, Dict[int, Any]], Any]
+AsyncStepCallable = Callable[[PlanStep, Dict[int, Any]], Awaitable[Any]]
+
+
+class StepGraphRunner:
+    """Executes plan steps as soon as their dependencies finish, on a bounded worker pool."""
+
+    def __init__(self, max_workers: int = 1) -> None:
+        self.max_workers = max(1, max_workers)
+
+    def run(self, steps: List[PlanStep], execute: StepCallable) -> List[Any]:
+        if self.max_workers == 1 or len(steps) <= 1:
+            return self._run_serial(steps, execute)
+        return self._run_parallel(steps, execute)
+
+    @staticmethod
+    def _run_serial(steps: List[PlanStep], execute: StepCallable) -> List[Any]:
+        results: Dict[int, Any] = {}
+        for step in steps:
+            dependencies = {dep: results[dep] for dep in step.depends_on}
+            results[step.index] = execute(step, dependencies)
+        return [results[step.index] for step in steps]
+
+    def _run_parallel(self, steps: List[PlanStep], execute: StepCallable) -> List[Any]:
+        results: Dict[int, Any] = {}
+        pending = {step.index: step for step in steps}
+        running: Dict[Future, PlanStep] = {}
+
+        with ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix="pipegent-step"
+        ) as pool:
+            while pending or running:
+                ready = [
+                    step
+                    for step in pending.values()
+                    if all(dep in results for dep in step.depends_on)
+                ]
+                for step in ready:
+                    del pending[step.index]
+                    dependencies = {dep: results[dep] for dep in step.depends_on}
+                    logger.debug(
+                        "Dispatching step %s (depends on %s)", step.index, list(step.depends_on)
+                    )
+                    running[pool.submit(execute, step, dependencies)] = step
+
+                if not running:
+                    unresolved = sorted(pending)
+                    raise RuntimeError(f"Plan steps have unsatisfiable dependencies: {unresolved}")
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    step = running.pop(future)
+                    try:
+                        value = future.result()
+                    except Exception:
+                        for other in running:
+                            other.cancel()
+                        raise
+                    results[step.index] = value
+
+        return [results[step.index] for step in steps]
+
+    async def run_async(self, steps: List[PlanStep], execute: AsyncStepCallable) -> List[Any]:
+        semaphore = asyncio.Semaphore(self.max_workers)
+        tasks: Dict[int, "asyncio.Task[Any]"] = {}
+
+        async def run_one(step: PlanStep) -> Any:
+            dependencies = {dep: await tasks[dep] for dep in step.depends_on}
+            async with semaphore:
+                return await execute(step, dependencies)
+
+        for step in steps:
+            tasks[step.index] = asyncio.ensure_future(run_one(step))
+
+        try:
+            return list(await asyncio.gather(*tasks.values()))
+        except BaseException:
+            for task in tasks.values():
+                task.cancel()
+            raise
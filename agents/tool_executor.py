@@ -1,11 +1,43 @@
+import contextlib
+import hashlib
+import inspect
 import json
 import logging
-from typing import Any, Callable, Dict
+from dataclasses import dataclass, field
+from typing import Any, Callable, ContextManager, Dict, FrozenSet, List, Optional, Sequence, Tuple
 
 from openai import OpenAI
 
+from prompts import ToolIndex, build_system_prompt
+from services.artifact_store import ArtifactStore
+from services.cache import LRUCache, TieredCache
+from services.metrics import record_usage, time_stage, time_tool
+from services.sessions import SessionContext
+from services.tool_scheduler import ToolScheduler
+
 logger = logging.getLogger(__name__)
 
+# Offered on every step so the model can always answer in words.
+ALWAYS_OFFERED_TOOLS = ("speech",)
+
+
+@dataclass(frozen=True)
+class ToolSet:
+    """One generation of the tool table and everything derived from it, swapped as a whole on reload."""
+
+    tools: Dict[str, Callable]
+    system_prompt: str
+    tool_index: Optional[ToolIndex] = None
+    session_tools: FrozenSet[str] = frozenset()
+    step_prompts: LRUCache = field(default_factory=lambda: LRUCache(max_entries=256))
+
+    @classmethod
+    def create(
+        cls, tools: Dict[str, Callable], system_prompt: str, tool_index: Optional[ToolIndex] = None
+    ) -> "ToolSet":
+        session_tools = frozenset(name for name, func in tools.items() if _accepts_session(func))
+        return cls(tools=tools, system_prompt=system_prompt, tool_index=tool_index, session_tools=session_tools)
+
 
 class ToolExecutor:
     """Runs individual instructions by forcing the executor LLM to use tools."""
@@ -17,45 +49,226 @@ class ToolExecutor:
         system_prompt: str,
         model: str,
         temperature: float,
+        artifact_store: Optional[ArtifactStore] = None,
+        session: Optional[SessionContext] = None,
+        response_cache: Optional[TieredCache] = None,
+        tool_index: Optional[ToolIndex] = None,
+        tool_top_k: int = 8,
+        tool_format: str = "json",
+        scheduler: Optional[ToolScheduler] = None,
     ) -> None:
         self.client = client
-        self.tools = tools
-        self.system_prompt = system_prompt
+        self.toolset = ToolSet.create(tools, system_prompt, tool_index)
         self.model = model
         self.temperature = temperature
+        self.artifact_store = artifact_store
+        self.session = session
+        self.response_cache = response_cache
+        self.tool_top_k = max(1, tool_top_k)
+        self.tool_format = tool_format
+        self.scheduler = scheduler
+
+    @property
+    def tools(self) -> Dict[str, Callable]:
+        return self.toolset.tools
+
+    @property
+    def system_prompt(self) -> str:
+        return self.toolset.system_prompt
+
+    @property
+    def tool_index(self) -> Optional[ToolIndex]:
+        return self.toolset.tool_index
 
     def execute(self, instruction: str) -> str:
-        messages = [
-            {"role": "system", "content": self.system_prompt},
-            {"role": "user", "content": instruction},
-        ]
+        return self.execute_step(instruction)[0]
 
-        response = self.client.chat.completions.create(
-            model=self.model,
-            messages=messages,
-            temperature=self.temperature,
-        )
+    def execute_step(self, instruction: str, tool_query: Optional[str] = None) -> Tuple[str, Any]:
+        """Like execute, but also returns the raw tool result so later steps can reference it.
+
+        ``tool_query`` (usually the step description) narrows the system prompt to the
+        tools relevant to this step when a tool index is configured.
+        """
+        content = self._complete(instruction, tool_queries=[tool_query] if tool_query else ())
+
+        tool_call = self._parse_tool_call(content)
+        if tool_call is None:
+            return content, content
+
+        tool_name, args = tool_call
+        return self.call_tool(tool_name, args)
+
+    def resolve_batch(
+        self, instruction: str, tool_queries: Sequence[str] = ()
+    ) -> Dict[int, Tuple[str, Dict[str, Any]]]:
+        """Ask the executor model for the tool calls of several steps in one round trip."""
+        content = self._complete(instruction, stage="executor_batch", tool_queries=tool_queries)
+        return self._parse_batch_calls(content)
+
+    def call_tool(self, tool_name: str, args: Dict[str, Any]) -> Tuple[str, Any]:
+        toolset = self.toolset
+        if tool_name not in toolset.tools:
+            message = f"Unknown tool: {tool_name}"
+            return message, message
+
+        try:
+            resolved_args = self._prepare_args(toolset, tool_name, args)
+            with self._tool_slot(tool_name, resolved_args), time_tool(tool_name):
+                result = toolset.tools[tool_name](**resolved_args)
+        except Exception as exc:
+            return self._tool_failure(tool_name, exc)
+        return self._format_result(tool_name, result), result
+
+    def _tool_slot(self, tool_name: str, args: Dict[str, Any]) -> ContextManager[Any]:
+        """Wait for the tool's concurrency and rate limits; the result releases the slot on exit."""
+        if self.scheduler is None:
+            return contextlib.nullcontext()
+        session_key = self.session.session_id if self.session is not None else ""
+        return self.scheduler.acquire(tool_name, args, session_key) or contextlib.nullcontext()
+
+    @staticmethod
+    def _tool_failure(tool_name: str, exc: Exception) -> Tuple[str, Any]:
+        # Anything a tool call raises (bad arguments, a stale artifact handle, a crashed sandbox
+        # worker, a queue timeout) fails this step only, whether the plugin runs inline or not.
+        logger.warning("Tool %s failed: %s", tool_name, exc, exc_info=logger.isEnabledFor(logging.DEBUG))
+        message = f"Tool {tool_name} failed: {exc}"
+        return message, message
+
+    def _prepare_args(self, toolset: ToolSet, tool_name: str, args: Dict[str, Any]) -> Dict[str, Any]:
+        """Resolve artifact handles and inject the session for plugins that declare one."""
+        resolved = dict(self._resolve_artifacts(args))
+        # The session is never taken from model output.
+        resolved.pop("session", None)
+        if tool_name in toolset.session_tools:
+            resolved["session"] = self.session
+        return resolved
+
+    def _resolve_artifacts(self, args: Dict[str, Any]) -> Dict[str, Any]:
+        if self.artifact_store is None:
+            return args
+        return self.artifact_store.resolve(args)
+
+    def update_tools(
+        self, tools: Dict[str, Callable], system_prompt: str, tool_index: Optional[ToolIndex] = None
+    ) -> None:
+        """Swap in a reloaded tool table; steps already running finish with the old one."""
+        self.toolset = ToolSet.create(tools, system_prompt, tool_index)
+
+    def invalidate_response_cache(self) -> None:
+        """Drop cached completions, e.g. after the plugin set (and system prompt) changed."""
+        if self.response_cache is not None:
+            self.response_cache.invalidate()
+
+    def _complete(
+        self, instruction: str, stage: str = "executor", tool_queries: Sequence[str] = ()
+    ) -> str:
+        messages = self._build_messages(instruction, tool_queries)
+        cache_key = self._response_cache_key(messages)
+        cached = self._get_cached_response(cache_key)
+        if cached is not None:
+            return cached
+
+        with time_stage(stage):
+            response = self.client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                temperature=self.temperature,
+            )
+        record_usage(stage, response)
 
         content = response.choices[0].message.content.strip()
         logger.debug("Executor response: %s", content)
-        messages.append({"role": "assistant", "content": content})
+        self._store_cached_response(cache_key, content)
+        return content
+
+    def _response_cache_key(self, messages: List[Dict[str, str]]) -> Optional[str]:
+        # Only deterministic (temperature 0) completions are worth replaying.
+        if self.response_cache is None or self.temperature != 0:
+            return None
+        payload = json.dumps(
+            {"model": self.model, "temperature": self.temperature, "messages": messages},
+            sort_keys=True,
+            ensure_ascii=False,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
 
+    def _get_cached_response(self, cache_key: Optional[str]) -> Optional[str]:
+        if cache_key is None or self.response_cache is None:
+            return None
+        cached = self.response_cache.get(cache_key)
+        if not isinstance(cached, str):
+            return None
+        logger.debug("Executor response cache hit (%s): %s", cache_key[:12], cached)
+        return cached
+
+    def _store_cached_response(self, cache_key: Optional[str], content: str) -> None:
+        if cache_key is not None and self.response_cache is not None and content:
+            self.response_cache.set(cache_key, content)
+
+    def _build_messages(self, instruction: str, tool_queries: Sequence[str] = ()) -> List[Dict[str, str]]:
+        return [
+            {"role": "system", "content": self._system_prompt_for(tool_queries)},
+            {"role": "user", "content": instruction},
+        ]
+
+    def _system_prompt_for(self, tool_queries: Sequence[str]) -> str:
+        """System prompt listing only the tools retrieved for ``tool_queries`` (all tools without an index)."""
+        toolset = self.toolset
+        tool_index = toolset.tool_index
+        if tool_index is None or not tool_queries:
+            return toolset.system_prompt
+
+        selected: Dict[str, Dict[str, Any]] = {}
+        for query in tool_queries:
+            for spec in tool_index.select(query, self.tool_top_k, always=ALWAYS_OFFERED_TOOLS):
+                selected[str(spec.get("name"))] = spec
+        if len(selected) >= len(tool_index):
+            return toolset.system_prompt
+
+        specs = [spec for spec in tool_index.tool_specs if str(spec.get("name")) in selected]
+        key = ",".join(str(spec.get("name")) for spec in specs)
+        prompt = toolset.step_prompts.get(key)
+        if prompt is None:
+            prompt = build_system_prompt(specs, self.tool_format)
+            toolset.step_prompts.set(key, prompt)
+        logger.debug("Executor prompt offers %s of %s tools: %s", len(specs), len(tool_index), key)
+        return prompt
+
+    def _parse_tool_call(self, content: str) -> Optional[Tuple[str, Dict[str, Any]]]:
         try:
             tool_call = json.loads(content)
         except json.JSONDecodeError:
-            return content
+            return None
 
         if not isinstance(tool_call, dict) or "tool" not in tool_call:
-            return content
+            return None
 
-        tool_name = tool_call["tool"]
-        args = self._normalize_args(tool_call)
+        return tool_call["tool"], self._normalize_args(tool_call)
 
-        if tool_name not in self.tools:
-            return f"Unknown tool: {tool_name}"
+    def _parse_batch_calls(self, content: str) -> Dict[int, Tuple[str, Dict[str, Any]]]:
+        try:
+            payload = json.loads(content)
+        except json.JSONDecodeError:
+            logger.warning("Executor batch response was not valid JSON.")
+            return {}
+
+        raw_calls = payload.get("calls") if isinstance(payload, dict) else payload
+        if not isinstance(raw_calls, list):
+            return {}
 
-        result = self.tools[tool_name](**args)
+        calls: Dict[int, Tuple[str, Dict[str, Any]]] = {}
+        for entry in raw_calls:
+            if not isinstance(entry, dict) or "tool" not in entry:
+                continue
+            step_number = str(entry.get("step", "")).strip()
+            if not step_number.isdigit() or int(step_number) in calls:
+                continue
+            args = self._normalize_args({k: v for k, v in entry.items() if k != "step"})
+            calls[int(step_number)] = (str(entry["tool"]), args)
+        return calls
 
+    @staticmethod
+    def _format_result(tool_name: str, result: Any) -> str:
         if tool_name == "speech":
             return str(result)
 
@@ -67,3 +280,10 @@ class ToolExecutor:
         if isinstance(args, dict):
             return args
         return {k: v for k, v in payload.items() if k != "tool"}
+
+
+def _accepts_session(func: Callable) -> bool:
+    try:
+        return "session" in inspect.signature(func).parameters
+    except (TypeError, ValueError):
+        return False
@@ -0,0 +1,3 @@
+from benchmarks.fake_openai import FakeOpenAIServer, Scenario, ScriptedResponder
+
+__all__ = ["FakeOpenAIServer", "Scenario", "ScriptedResponder"]
@@ -0,0 +1,226 @@
+import json
+import logging
+import random
+import re
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_PLAN_REQUEST = re.compile(r"User request:\n(.*?)\n\nAvailable tools:", re.DOTALL)
+_EXECUTOR_REQUEST = re.compile(r"Original request:\n(.*?)\n\nYou are executing", re.DOTALL)
+_EXECUTOR_STEP = re.compile(r"You are executing plan step #(\d+):")
+_BATCH_STEP = re.compile(r"^Step (\d+): ", re.MULTILINE)
+_ARTIFACT_SECTION = re.compile(r"^Step (\d+): .*?\nArtifact: (artifact://[0-9a-f]+)", re.MULTILINE)
+_STEP_PLACEHOLDER = re.compile(r"^@step(\d+)$")
+
+
+@dataclass
+class Scenario:
+    """A scripted request: the plan the fake planner returns and the tool call behind each step.
+
+    Steps with ``"direct": true`` are planned with their tool and args so Pipegent calls the
+    plugin without the executor LLM; the others are answered by the fake executor. Executor
+    args may use ``"@stepN"`` to pass the artifact handle of step N's output.
+    """
+
+    name: str
+    request: str
+    steps: List[Dict[str, Any]] = field(default_factory=list)
+
+    def plan(self) -> Dict[str, Any]:
+        planned = []
+        for step in self.steps:
+            entry: Dict[str, Any] = {"step": step["step"], "depends_on": step.get("depends_on", [])}
+            if step.get("direct"):
+                entry["tool"] = step["tool"]
+                entry["args"] = step.get("args", {})
+            planned.append(entry)
+        return {"steps": planned}
+
+    def call(self, index: int, handles: Dict[int, str]) -> Dict[str, Any]:
+        step = self.steps[index - 1] if 0 < index <= len(self.steps) else self.steps[-1]
+        args = {key: _substitute_handle(value, handles) for key, value in step.get("args", {}).items()}
+        return {"tool": step["tool"], "args": args}
+
+
+def fallback_scenario(request: str) -> Scenario:
+    """Plan used for requests without a script (e.g. replayed traffic)."""
+    text = request[:500]
+    return Scenario(
+        name="replay",
+        request=request,
+        steps=[
+            {"step": "word_counter on the request", "tool": "word_counter", "args": {"text": text}, "direct": True},
+            {"step": "string_reverser on the request", "tool": "string_reverser", "args": {"text": text}},
+        ],
+    )
+
+
+class ScriptedResponder:
+    """Answers chat completion requests the way the planner/executor prompts expect."""
+
+    def __init__(self, scenarios: List[Scenario]) -> None:
+        self.scenarios = {scenario.request: scenario for scenario in scenarios}
+        self.calls: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def respond(self, messages: List[Dict[str, Any]]) -> str:
+        system = str(messages[0].get("content", "")) if messages else ""
+        last = str(messages[-1].get("content", "")) if messages else ""
+
+        if "Break user goals into" in system:
+            kind, content = "planner", json.dumps(self._scenario(_PLAN_REQUEST, last).plan())
+        elif "craft a final response" in system:
+            kind, content = "summary", "All requested steps completed; see the tool outputs above."
+        elif '{"calls": [' in last:
+            scenario = self._scenario(_EXECUTOR_REQUEST, last)
+            handles = _artifact_handles(last)
+            calls = []
+            for match in _BATCH_STEP.finditer(last.split("You are executing", 1)[-1]):
+                index = int(match.group(1))
+                calls.append({"step": index, **scenario.call(index, handles)})
+            kind, content = "executor_batch", json.dumps({"calls": calls})
+        elif _EXECUTOR_STEP.search(last):
+            scenario = self._scenario(_EXECUTOR_REQUEST, last)
+            index = int(_EXECUTOR_STEP.search(last).group(1))
+            kind, content = "executor", json.dumps(scenario.call(index, _artifact_handles(last)))
+        else:
+            kind, content = "other", "Summary of earlier interactions."
+
+        with self._lock:
+            self.calls[kind] = self.calls.get(kind, 0) + 1
+        return content
+
+    def _scenario(self, pattern: "re.Pattern[str]", text: str) -> Scenario:
+        match = pattern.search(text)
+        request = match.group(1) if match else text
+        return self.scenarios.get(request) or fallback_scenario(request)
+
+
+class FakeOpenAIServer:
+    """Local stand-in for ``POST /v1/chat/completions`` with configurable latency."""
+
+    def __init__(
+        self,
+        scenarios: List[Scenario],
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        seed: int = 0,
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ) -> None:
+        self.responder = ScriptedResponder(scenarios)
+        self.latency = max(0.0, latency)
+        self.jitter = max(0.0, jitter)
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.busy_seconds = 0.0
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    @property
+    def calls(self) -> Dict[str, int]:
+        return dict(self.responder.calls)
+
+    def start(self) -> "FakeOpenAIServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-openai", daemon=True)
+        self._thread.start()
+        logger.info("Fake OpenAI server listening on %s", self.base_url)
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def complete(self, payload: Dict[str, Any]) -> Tuple[Dict[str, Any], float]:
+        started = time.perf_counter()
+        messages = payload.get("messages") or []
+        content = self.responder.respond(messages)
+        delay = self._delay()
+        if delay:
+            time.sleep(delay)
+        prompt_tokens = sum(len(str(message.get("content", ""))) for message in messages) // 4
+        completion_tokens = len(content) // 4
+        body = {
+            "id": f"chatcmpl-{uuid.uuid4().hex[:24]}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": payload.get("model", "fake-model"),
+            "choices": [
+                {
+                    "index": 0,
+                    "message": {"role": "assistant", "content": content},
+                    "finish_reason": "stop",
+                }
+            ],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        }
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self.busy_seconds += elapsed
+        return body, elapsed
+
+    def _delay(self) -> float:
+        if not self.jitter:
+            return self.latency
+        with self._lock:
+            return max(0.0, self.latency + self._random.uniform(-self.jitter, self.jitter))
+
+    def _handler_class(self) -> type:
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self) -> None:  # noqa: N802 - http.server API
+                if not self.path.rstrip("/").endswith("/chat/completions"):
+                    self._send(404, {"error": {"message": f"Unknown path {self.path}"}})
+                    return
+                length = int(self.headers.get("Content-Length") or 0)
+                try:
+                    payload = json.loads(self.rfile.read(length) or b"{}")
+                except json.JSONDecodeError:
+                    self._send(400, {"error": {"message": "Invalid JSON body"}})
+                    return
+                body, _ = server.complete(payload)
+                self._send(200, body)
+
+            def _send(self, status: int, body: Dict[str, Any]) -> None:
+                encoded = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(encoded)))
+                self.end_headers()
+                self.wfile.write(encoded)
+
+            def log_message(self, format: str, *args: Any) -> None:
+                logger.debug("fake openai: " + format, *args)
+
+        return Handler
+
+
+def _artifact_handles(text: str) -> Dict[int, str]:
+    return {int(index): handle for index, handle in _ARTIFACT_SECTION.findall(text)}
+
+
+def _substitute_handle(value: Any, handles: Dict[int, str]) -> Any:
+    if isinstance(value, str):
+        match = _STEP_PLACEHOLDER.match(value)
+        if match and int(match.group(1)) in handles:
+            return handles[int(match.group(1))]
+    return value
@@ -0,0 +1,143 @@
+"""Connection-reuse benchmark for the shared HTTP transport.
+
+Starts a local keep-alive HTTP/1.1 server that counts accepted TCP connections and
+fetches the same document with ``urllib.request.urlopen`` (one connection per call)
+and with ``services.http_transport.HttpTransport`` (pooled connections)::
+
+    python -m benchmarks.http_transport --requests 200 --threads 4 --gzip
+"""
+
+import argparse
+import gzip
+import json
+import statistics
+import sys
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+if str(BASE_DIR) not in sys.path:
+    sys.path.insert(0, str(BASE_DIR))
+
+from services.http_transport import HttpTransport  # noqa: E402
+
+
+class _CountingServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, payload: bytes, compress: bool) -> None:
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.payload = payload
+        self.compressed = gzip.compress(payload) if compress else None
+        self.connections = 0
+        self._lock = threading.Lock()
+
+    def get_request(self) -> Any:
+        accepted = super().get_request()
+        with self._lock:
+            self.connections += 1
+        return accepted
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body are separate writes; without this, delayed ACKs stall every reused connection.
+    disable_nagle_algorithm = True
+    server: _CountingServer
+
+    def do_GET(self) -> None:  # noqa: N802 - http.server naming
+        body = self.server.payload
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        if self.server.compressed is not None and "gzip" in self.headers.get("Accept-Encoding", ""):
+            body = self.server.compressed
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+
+def measure(label: str, fetch: Callable[[], int], requests: int, threads: int, server: _CountingServer) -> Dict[str, Any]:
+    server.connections = 0
+    latencies: List[float] = []
+
+    def timed(_: int) -> None:
+        started = time.perf_counter()
+        fetch()
+        latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(timed, range(requests)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "client": label,
+        "requests": requests,
+        "connections": server.connections,
+        "throughput_rps": requests / elapsed if elapsed else 0.0,
+        "mean_ms": statistics.fmean(latencies) * 1000,
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "p95_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000,
+    }
+
+
+def parse_args(argv: Optional[List[str]]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200, help="Requests per client.")
+    parser.add_argument("--threads", type=int, default=4, help="Concurrent callers.")
+    parser.add_argument("--size", type=int, default=16 * 1024, help="Approximate response size in bytes.")
+    parser.add_argument("--gzip", action="store_true", help="Serve gzip-encoded bodies to clients that accept them.")
+    parser.add_argument("--json", type=Path, help="Write the report as JSON to this path.")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    requests = max(1, args.requests)
+    threads = max(1, args.threads)
+    record = {"id": 0, "title": "Pipegent benchmark item", "tags": ["alpha", "beta", "gamma"]}
+    items = [dict(record, id=index) for index in range(max(1, args.size // 80))]
+    server = _CountingServer(json.dumps(items).encode("utf-8"), args.gzip)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/feed.json"
+    transport = HttpTransport(max_connections_per_host=threads)
+
+    def with_urllib() -> int:
+        with urllib.request.urlopen(url, timeout=10) as response:
+            return len(response.read())
+
+    def with_transport() -> int:
+        return len(transport.fetch("GET", url, timeout=10).body)
+
+    try:
+        report = [
+            measure("urllib", with_urllib, requests, threads, server),
+            measure("transport", with_transport, requests, threads, server),
+        ]
+    finally:
+        transport.close()
+        server.shutdown()
+        server.server_close()
+
+    print(f"{'client':<12}{'requests':>9}{'conns':>7}{'req/s':>9}{'mean ms':>9}{'p50 ms':>8}{'p95 ms':>8}")
+    for row in report:
+        print(
+            f"{row['client']:<12}{row['requests']:>9}{row['connections']:>7}{row['throughput_rps']:>9.0f}"
+            f"{row['mean_ms']:>9.2f}{row['p50_ms']:>8.2f}{row['p95_ms']:>8.2f}"
+        )
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,82 @@
+"""Compare executor system prompt sizes across tool formats.
+
+Loads every bundled plugin manifest and reports the token count of the full-catalog
+system prompt and the mean cost per tool for each ``PROMPTS.tool_format``::
+
+    python -m benchmarks.prompt_tokens
+    python -m benchmarks.prompt_tokens --top-k 8 --query "add step 1 and step 2 with simple_calculator"
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+if str(BASE_DIR) not in sys.path:
+    sys.path.insert(0, str(BASE_DIR))
+
+from prompts import TOOL_FORMATS, ToolIndex, build_system_prompt  # noqa: E402
+from services.tokens import estimate_tokens  # noqa: E402
+
+PLUGIN_DIRS = [BASE_DIR / "plugins" / "core_plugins", BASE_DIR / "plugins" / "user_plugins"]
+
+
+def load_manifest_specs(plugin_dirs: List[Path]) -> List[Dict[str, Any]]:
+    """Tool specs straight from manifest.json files (no plugin code is imported)."""
+    specs: List[Dict[str, Any]] = []
+    for plugin_dir in plugin_dirs:
+        for manifest_path in sorted(plugin_dir.glob("*/manifest.json")):
+            manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+            specs.append(
+                {key: manifest.get(key) for key in ("name", "description", "input_schema")}
+            )
+    return specs
+
+
+def measure(specs: List[Dict[str, Any]], model: str) -> Dict[str, Dict[str, float]]:
+    empty = {tool_format: estimate_tokens(build_system_prompt([], tool_format), model) for tool_format in TOOL_FORMATS}
+    report: Dict[str, Dict[str, float]] = {}
+    for tool_format in TOOL_FORMATS:
+        total = estimate_tokens(build_system_prompt(specs, tool_format), model)
+        report[tool_format] = {
+            "tools": len(specs),
+            "prompt_tokens": total,
+            "tokens_per_tool": (total - empty[tool_format]) / len(specs) if specs else 0.0,
+        }
+    return report
+
+
+def parse_args(argv: Optional[List[str]]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default="gpt-4o-mini", help="Model whose tokenizer is used (needs tiktoken).")
+    parser.add_argument("--query", help="Also measure the prompt for the tools retrieved for this step text.")
+    parser.add_argument("--top-k", type=int, default=8, help="Tools retrieved for --query.")
+    parser.add_argument("--json", type=Path, help="Write the report as JSON to this path.")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    specs = load_manifest_specs(PLUGIN_DIRS)
+    report: Dict[str, Any] = {"catalog": measure(specs, args.model)}
+    if args.query:
+        selected = ToolIndex(specs).select(args.query, args.top_k, always=("speech",))
+        report["retrieved"] = measure(selected, args.model)
+
+    baseline = report["catalog"]["json"]["prompt_tokens"]
+    print(f"{'scope':<11}{'format':<9}{'tools':>6}{'tokens':>9}{'per tool':>10}{'vs json':>9}")
+    for scope, formats in report.items():
+        for tool_format, row in formats.items():
+            print(
+                f"{scope:<11}{tool_format:<9}{row['tools']:>6}{row['prompt_tokens']:>9}"
+                f"{row['tokens_per_tool']:>10.1f}{row['prompt_tokens'] / max(1, baseline):>8.0%}"
+            )
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,164 @@
+"""Large-feed benchmark for rss_reader's streaming parser.
+
+Serves a synthetic RSS feed from a local server and compares the previous approach
+(download everything, ``ET.fromstring``, ``findall`` and slice) with ``rss_reader``,
+which parses entries as they arrive and stops reading after ``max_items``. "sent"
+counts what the server wrote before the client hung up, including what the kernel
+buffered for a reader that never asked for it::
+
+    python -m benchmarks.rss_stream --items 20000 --max-items 10 --runs 5
+"""
+
+import argparse
+import json
+import statistics
+import sys
+import threading
+import time
+import tracemalloc
+import urllib.request
+import xml.etree.ElementTree as ET
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+if str(BASE_DIR) not in sys.path:
+    sys.path.insert(0, str(BASE_DIR))
+
+from plugins.core_plugins.rss_reader.function import _extract_entry, rss_reader  # noqa: E402
+
+_WRITE_SIZE = 64 * 1024
+
+
+def build_feed(items: int) -> bytes:
+    parts = ['<?xml version="1.0" encoding="utf-8"?>\n<rss version="2.0"><channel><title>Synthetic feed</title>']
+    summary = "Lorem ipsum dolor sit amet, consectetur adipiscing elit. " * 6
+    for index in range(items):
+        parts.append(
+            f"<item><title>Episode {index}</title><link>https://example.com/episodes/{index}</link>"
+            f"<guid>https://example.com/episodes/{index}</guid>"
+            f"<pubDate>Mon, 01 Jan 2024 00:00:00 GMT</pubDate><description>{summary}</description></item>"
+        )
+    parts.append("</channel></rss>")
+    return "".join(parts).encode("utf-8")
+
+
+class _FeedServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, payload: bytes) -> None:
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.payload = payload
+        self.bytes_sent = 0
+        self._lock = threading.Lock()
+
+    def count(self, sent: int) -> None:
+        with self._lock:
+            self.bytes_sent += sent
+
+    def handle_error(self, request: Any, client_address: Any) -> None:
+        # Streaming readers hang up mid-body on purpose.
+        pass
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    server: _FeedServer
+
+    def do_GET(self) -> None:  # noqa: N802 - http.server naming
+        payload = self.server.payload
+        self.send_response(200)
+        self.send_header("Content-Type", "application/rss+xml")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        try:
+            for start in range(0, len(payload), _WRITE_SIZE):
+                self.wfile.write(payload[start : start + _WRITE_SIZE])
+                self.server.count(min(_WRITE_SIZE, len(payload) - start))
+        except OSError:
+            # The client stopped reading (and closed the connection) early.
+            self.close_connection = True
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+
+def buffered_reader(url: str, max_items: int) -> List[Dict[str, Any]]:
+    """rss_reader before streaming: the whole document is downloaded and parsed first."""
+    with urllib.request.urlopen(url, timeout=30) as response:
+        data = response.read()
+    root = ET.fromstring(data)
+    return [_extract_entry(entry) for entry in root.findall(".//item")[:max_items]]
+
+
+def streaming_reader(url: str, max_items: int) -> List[Dict[str, Any]]:
+    return rss_reader(url, max_items=max_items, timeout=30)["entries"]
+
+
+def measure(
+    label: str, reader: Callable[[str, int], List[Dict[str, Any]]], url: str, max_items: int, runs: int, server: _FeedServer
+) -> Dict[str, Any]:
+    timings: List[float] = []
+    sent: List[int] = []
+    entries: List[Dict[str, Any]] = []
+    for _ in range(runs):
+        server.bytes_sent = 0
+        started = time.perf_counter()
+        entries = reader(url, max_items)
+        timings.append(time.perf_counter() - started)
+        # Give the server thread a moment to notice the closed connection.
+        time.sleep(0.05)
+        sent.append(server.bytes_sent)
+
+    tracemalloc.start()
+    reader(url, max_items)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "reader": label,
+        "entries": len(entries),
+        "first": entries[0]["title"] if entries else "",
+        "median_ms": statistics.median(timings) * 1000,
+        "peak_kib": peak / 1024,
+        "sent_kib": statistics.median(sent) / 1024,
+    }
+
+
+def parse_args(argv: Optional[List[str]]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=20000, help="Entries in the synthetic feed.")
+    parser.add_argument("--max-items", type=int, default=10, help="max_items passed to the reader.")
+    parser.add_argument("--runs", type=int, default=5, help="Timed runs per reader (median is reported).")
+    parser.add_argument("--json", type=Path, help="Write the report as JSON to this path.")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    payload = build_feed(max(1, args.items))
+    server = _FeedServer(payload)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/feed.xml"
+    runs = max(1, args.runs)
+    try:
+        report = [
+            measure("buffered", buffered_reader, url, args.max_items, runs, server),
+            measure("streaming", streaming_reader, url, args.max_items, runs, server),
+        ]
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    print(f"Feed: {args.items} items, {len(payload) / 1024 / 1024:.1f} MiB; max_items={args.max_items}")
+    print(f"{'reader':<12}{'entries':>8}{'median ms':>11}{'peak KiB':>11}{'sent KiB':>11}")
+    for row in report:
+        print(f"{row['reader']:<12}{row['entries']:>8}{row['median_ms']:>11.1f}{row['peak_kib']:>11.0f}{row['sent_kib']:>11.0f}")
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
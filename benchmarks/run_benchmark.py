@@ -0,0 +1,350 @@
+"""Offline end-to-end benchmark for Pipegent.
+
+Starts a local fake chat completions server, points ``create_agent()`` at it and drives
+the scripted workloads (plus any replayed requests) through ``PlannerAgent.handle_request``::
+
+    python -m benchmarks.run_benchmark --iterations 20 --latency 0.05 --json bench.json
+    python -m benchmarks.run_benchmark --baseline bench.json   # exit 1 on regressions
+"""
+
+import argparse
+import configparser
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+if str(BASE_DIR) not in sys.path:
+    sys.path.insert(0, str(BASE_DIR))
+
+from benchmarks.fake_openai import FakeOpenAIServer, Scenario, fallback_scenario  # noqa: E402
+
+DEFAULT_WORKLOADS = Path(__file__).resolve().parent / "workloads.json"
+
+
+def load_workloads(path: Path) -> List[Scenario]:
+    entries = json.loads(path.read_text(encoding="utf-8"))
+    return [Scenario(name=entry["name"], request=entry["request"], steps=entry["steps"]) for entry in entries]
+
+
+def load_replay(path: Path, limit: Optional[int] = None) -> List[Scenario]:
+    """Read one request per JSONL line (``request``, ``prompt`` or ``title`` field)."""
+    scenarios: List[Scenario] = []
+    for line in path.read_text(encoding="utf-8").splitlines():
+        if not line.strip():
+            continue
+        record = json.loads(line)
+        text = record if isinstance(record, str) else (
+            record.get("request") or record.get("prompt") or record.get("title")
+        )
+        if text:
+            scenarios.append(fallback_scenario(" ".join(str(text).split())))
+        if limit is not None and len(scenarios) >= limit:
+            break
+    return scenarios
+
+
+def write_configs(
+    directory: Path, plan_cache: bool, executor_cache: bool = False, tool_retrieval: bool = False
+) -> None:
+    parser = configparser.ConfigParser()
+    parser.read(BASE_DIR / "example.system.config.ini")
+    overrides = {
+        "PLAN_CACHE": {"enabled": str(plan_cache).lower(), "path": ""},
+        "EXECUTOR_CACHE": {"enabled": str(executor_cache).lower(), "path": ""},
+        "CONTEXT": {"summary_model": ""},
+        "METRICS": {"enabled": "false", "json_dump_path": ""},
+        "TOOL_RETRIEVAL": {"enabled": str(tool_retrieval).lower()},
+    }
+    for section, values in overrides.items():
+        if not parser.has_section(section):
+            parser.add_section(section)
+        for key, value in values.items():
+            parser.set(section, key, value)
+    with (directory / "system.config.ini").open("w", encoding="utf-8") as handle:
+        parser.write(handle)
+    (directory / "user.config.ini").write_text("[OPENAI]\nchatgpt_key = sk-benchmark\n", encoding="utf-8")
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def summarize_latencies(latencies: List[float], errors: int) -> Dict[str, Any]:
+    total = sum(latencies)
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": len(latencies) / total if total else 0.0,
+        "mean_ms": total / len(latencies) * 1000 if latencies else 0.0,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+    }
+
+
+def histogram_totals(snapshot: Dict[str, Any], name: str, label: str) -> Dict[str, Dict[str, float]]:
+    return {
+        entry["labels"][label]: {"count": entry["count"], "sum": entry["sum"]}
+        for entry in snapshot.get(name, [])
+    }
+
+
+def diff_totals(before: Dict[str, Dict[str, float]], after: Dict[str, Dict[str, float]]) -> Dict[str, Dict[str, float]]:
+    breakdown: Dict[str, Dict[str, float]] = {}
+    for key, totals in after.items():
+        count = totals["count"] - before.get(key, {}).get("count", 0)
+        seconds = totals["sum"] - before.get(key, {}).get("sum", 0.0)
+        if count:
+            breakdown[key] = {"count": count, "total_s": seconds, "mean_ms": seconds / count * 1000}
+    return breakdown
+
+
+def prompt_tokens(
+    before: Dict[str, Any], after: Dict[str, Any], stages: Dict[str, Dict[str, float]]
+) -> Dict[str, Dict[str, float]]:
+    """Prompt tokens reported by the (fake) API per stage, overall and per call."""
+    def totals(snapshot: Dict[str, Any]) -> Dict[str, float]:
+        return {
+            entry["labels"]["stage"]: entry["value"]
+            for entry in snapshot.get("pipegent_llm_tokens_total", [])
+            if entry["labels"]["kind"] == "prompt"
+        }
+
+    previous = totals(before)
+    report: Dict[str, Dict[str, float]] = {}
+    for stage, value in totals(after).items():
+        tokens = value - previous.get(stage, 0.0)
+        calls = stages.get(stage, {}).get("count", 0)
+        if tokens:
+            report[stage] = {"total": tokens, "per_call": tokens / calls if calls else 0.0}
+    return report
+
+
+def run_request(agent: Any, request: str) -> bool:
+    reply = agent.handle_request(request)
+    return not reply.startswith("Planner error")
+
+
+def tool_call_count(snapshot: Dict[str, Any]) -> int:
+    return sum(entry["count"] for entry in snapshot.get("pipegent_tool_duration_seconds", []))
+
+
+def check_tool_calls(agent: Any, scenarios: List[Scenario], registry: Any) -> List[str]:
+    """Run each workload once and compare its tool calls with the scripted steps.
+
+    Catches steps Pipegent drops or repeats (e.g. a step mistaken for filler), which the
+    latency numbers alone would report as a faster run.
+    """
+    mismatches = []
+    for scenario in scenarios:
+        before = tool_call_count(registry.snapshot())
+        run_request(agent, scenario.request)
+        calls = tool_call_count(registry.snapshot()) - before
+        if calls != len(scenario.steps):
+            mismatches.append(f"{scenario.name}: {calls} tool call(s), expected {len(scenario.steps)}")
+    return mismatches
+
+
+def measure_allocations(agent: Any, scenarios: List[Scenario]) -> Dict[str, Dict[str, float]]:
+    """Run each workload once under tracemalloc (kept out of the timed pass)."""
+    results: Dict[str, Dict[str, float]] = {}
+    tracemalloc.start()
+    try:
+        for scenario in scenarios:
+            tracemalloc.reset_peak()
+            before, _ = tracemalloc.get_traced_memory()
+            run_request(agent, scenario.request)
+            current, peak = tracemalloc.get_traced_memory()
+            entry = results.setdefault(scenario.name, {"peak_kib": 0.0, "retained_kib": 0.0})
+            entry["peak_kib"] = max(entry["peak_kib"], (peak - before) / 1024)
+            entry["retained_kib"] += (current - before) / 1024
+    finally:
+        tracemalloc.stop()
+    return results
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    regressions = []
+    for name, current in report["workloads"].items():
+        previous = baseline.get("workloads", {}).get(name)
+        if not previous:
+            continue
+        for metric in ("p50_ms", "p95_ms"):
+            if previous[metric] > 0 and current[metric] > previous[metric] * (1 + tolerance):
+                regressions.append(
+                    f"{name}.{metric}: {previous[metric]:.2f} -> {current[metric]:.2f} ms"
+                )
+    return regressions
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    print(f"Startup (create_agent): {report['startup_seconds'] * 1000:.1f} ms")
+    print(f"{'workload':<18}{'reqs':>6}{'err':>5}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'peak KiB':>10}")
+    rows = dict(report["workloads"], overall=report["overall"])
+    for name, row in rows.items():
+        allocations = report["allocations"].get(name, {})
+        print(
+            f"{name:<18}{row['requests']:>6}{row['errors']:>5}{row['throughput_rps']:>9.1f}"
+            f"{row['p50_ms']:>9.2f}{row['p95_ms']:>9.2f}{row['p99_ms']:>9.2f}"
+            f"{allocations.get('peak_kib', 0.0):>10.1f}"
+        )
+    print("\nStage breakdown:")
+    for kind in ("stages", "tools"):
+        for name, row in sorted(report[kind].items()):
+            print(f"  {kind[:-1]} {name:<22}{row['count']:>6} calls {row['mean_ms']:>9.3f} ms avg")
+    overhead = report["overhead"]
+    print(
+        f"\nFake API time per request: {overhead['fake_api_ms_per_request']:.2f} ms; "
+        f"Pipegent overhead per request: {overhead['pipegent_ms_per_request']:.2f} ms"
+    )
+    print(f"LLM calls: {report['llm_calls']}")
+    print("Prompt tokens per call: " + ", ".join(
+        f"{stage} {row['per_call']:.0f}" for stage, row in sorted(report["prompt_tokens"].items())
+    ))
+
+
+def parse_args(argv: Optional[List[str]]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workloads", type=Path, default=DEFAULT_WORKLOADS, help="Scripted workload JSON file.")
+    parser.add_argument("--replay", type=Path, help="JSONL file of requests to replay after the scripted workloads.")
+    parser.add_argument("--replay-limit", type=int, help="Replay at most this many requests.")
+    parser.add_argument("--iterations", type=int, default=10, help="Timed passes over every workload.")
+    parser.add_argument("--warmup", type=int, default=1, help="Untimed passes before measuring.")
+    parser.add_argument("--latency", type=float, default=0.0, help="Simulated API latency in seconds.")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Uniform +/- jitter added to the latency.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--plan-cache", action="store_true", help="Keep the plan cache enabled (memory only).")
+    parser.add_argument(
+        "--executor-cache", action="store_true", help="Keep the executor response cache enabled (memory only)."
+    )
+    parser.add_argument(
+        "--tool-retrieval",
+        action="store_true",
+        help="Send only the retrieved tools with each executor call (enables TOOL_RETRIEVAL).",
+    )
+    parser.add_argument("--no-allocations", action="store_true", help="Skip the tracemalloc pass.")
+    parser.add_argument("--json", type=Path, help="Write the report as JSON to this path.")
+    parser.add_argument("--baseline", type=Path, help="Report from a previous run to compare against.")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed p50/p95 slowdown vs. the baseline.")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    random.seed(args.seed)
+
+    scenarios = load_workloads(args.workloads)
+    if args.replay:
+        scenarios.extend(load_replay(args.replay, args.replay_limit))
+
+    server = FakeOpenAIServer(scenarios, latency=args.latency, jitter=args.jitter, seed=args.seed).start()
+    config_dir = Path(tempfile.mkdtemp(prefix="pipegent-bench-"))
+    write_configs(config_dir, args.plan_cache, args.executor_cache, args.tool_retrieval)
+    os.environ["PIPEGENT_SYSTEM_CONFIG"] = str(config_dir / "system.config.ini")
+    os.environ["PIPEGENT_USER_CONFIG"] = str(config_dir / "user.config.ini")
+    os.environ["OPENAI_BASE_URL"] = server.base_url
+    os.environ["NO_PROXY"] = ",".join(filter(None, [os.environ.get("NO_PROXY"), "127.0.0.1", "localhost"]))
+
+    # Imported late: config.py reads the config files at import time.
+    import main as pipegent_main
+    from services.metrics import REGISTRY
+
+    try:
+        started = time.perf_counter()
+        agent = pipegent_main.create_agent()
+        startup_seconds = time.perf_counter() - started
+
+        tool_call_mismatches = check_tool_calls(agent, scenarios, REGISTRY)
+        for _ in range(args.warmup):
+            for scenario in scenarios:
+                run_request(agent, scenario.request)
+
+        before = REGISTRY.snapshot()
+        busy_before = server.busy_seconds
+        latencies: Dict[str, List[float]] = {}
+        errors: Dict[str, int] = {}
+        for _ in range(args.iterations):
+            for scenario in scenarios:
+                started = time.perf_counter()
+                ok = run_request(agent, scenario.request)
+                latencies.setdefault(scenario.name, []).append(time.perf_counter() - started)
+                errors[scenario.name] = errors.get(scenario.name, 0) + (0 if ok else 1)
+        after = REGISTRY.snapshot()
+        fake_api_seconds = server.busy_seconds - busy_before
+
+        all_latencies = [value for values in latencies.values() for value in values]
+        stages = diff_totals(
+            histogram_totals(before, "pipegent_stage_duration_seconds", "stage"),
+            histogram_totals(after, "pipegent_stage_duration_seconds", "stage"),
+        )
+        report: Dict[str, Any] = {
+            "settings": {
+                "iterations": args.iterations,
+                "latency": args.latency,
+                "jitter": args.jitter,
+                "plan_cache": args.plan_cache,
+                "executor_cache": args.executor_cache,
+                "tool_retrieval": args.tool_retrieval,
+                "workloads": len(scenarios),
+            },
+            "startup_seconds": startup_seconds,
+            "workloads": {
+                name: summarize_latencies(values, errors.get(name, 0)) for name, values in latencies.items()
+            },
+            "overall": summarize_latencies(all_latencies, sum(errors.values())),
+            "stages": stages,
+            "prompt_tokens": prompt_tokens(before, after, stages),
+            "tools": diff_totals(
+                histogram_totals(before, "pipegent_tool_duration_seconds", "tool"),
+                histogram_totals(after, "pipegent_tool_duration_seconds", "tool"),
+            ),
+            "overhead": {
+                "fake_api_ms_per_request": fake_api_seconds / max(1, len(all_latencies)) * 1000,
+                "pipegent_ms_per_request": (sum(all_latencies) - fake_api_seconds)
+                / max(1, len(all_latencies))
+                * 1000,
+            },
+            "allocations": {} if args.no_allocations else measure_allocations(agent, scenarios),
+            "llm_calls": server.calls,
+            "tool_call_mismatches": tool_call_mismatches,
+        }
+    finally:
+        server.stop()
+
+    print_report(report)
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2), encoding="utf-8")
+
+    if report["tool_call_mismatches"]:
+        print("\nTool calls differ from the scripted workloads:")
+        for line in report["tool_call_mismatches"]:
+            print(f"  {line}")
+        return 1
+    if report["overall"]["errors"]:
+        print(f"\n{report['overall']['errors']} request(s) failed; see logs/ for details.")
+        return 1
+    if args.baseline:
+        regressions = compare(report, json.loads(args.baseline.read_text(encoding="utf-8")), args.tolerance)
+        if regressions:
+            print("\nRegressions against baseline:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
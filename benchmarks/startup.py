@@ -0,0 +1,100 @@
+"""Cold-start benchmark for plugin loading.
+
+Each run happens in a fresh interpreter so module imports are really cold. Measures
+the time from interpreter start to a built executor system prompt for eager imports,
+lazy imports with an empty manifest index, and lazy imports with a warm index::
+
+    python -m benchmarks.startup --runs 5
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+_CHILD = """
+import json, sys, time
+started = time.perf_counter()
+baseline_modules = len(sys.modules)
+sys.path.insert(0, {base_dir!r})
+from pathlib import Path
+from prompts import ToolIndex, build_system_prompt
+from services.plugin_index import PluginIndex
+from services.plugin_loader import load_plugins
+
+index = PluginIndex(Path({index_path!r})) if {index_path!r} else None
+tools, specs = {{}}, []
+for directory in ("core_plugins", "user_plugins"):
+    dir_tools, dir_specs = load_plugins(Path({base_dir!r}) / "plugins" / directory, lazy={lazy!r}, index=index)
+    tools.update(dir_tools)
+    specs.extend(dir_specs)
+loaded = time.perf_counter()
+prompt = build_system_prompt(specs, "compact")
+ToolIndex(specs)
+ready = time.perf_counter()
+print(json.dumps({{
+    "load_ms": (loaded - started) * 1000,
+    "ready_ms": (ready - started) * 1000,
+    "tools": len(tools),
+    "modules": len(sys.modules) - baseline_modules,
+}}))
+"""
+
+
+def run_child(lazy: bool, index_path: Optional[Path]) -> Dict[str, Any]:
+    code = _CHILD.format(base_dir=str(BASE_DIR), index_path=str(index_path) if index_path else "", lazy=lazy)
+    completed = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True, cwd=str(BASE_DIR)
+    )
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def measure(label: str, runs: int, lazy: bool, index_path: Optional[Path], reset_index: bool) -> Dict[str, Any]:
+    samples: List[Dict[str, Any]] = []
+    for _ in range(runs):
+        if reset_index and index_path is not None:
+            index_path.unlink(missing_ok=True)
+        samples.append(run_child(lazy, index_path))
+    return {
+        "mode": label,
+        "tools": samples[-1]["tools"],
+        "modules": samples[-1]["modules"],
+        "load_ms": statistics.median(sample["load_ms"] for sample in samples),
+        "ready_ms": statistics.median(sample["ready_ms"] for sample in samples),
+    }
+
+
+def parse_args(argv: Optional[List[str]]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters per mode (median is reported).")
+    parser.add_argument("--json", type=Path, help="Write the report as JSON to this path.")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    runs = max(1, args.runs)
+    with tempfile.TemporaryDirectory(prefix="pipegent-startup-") as tmp:
+        index_path = Path(tmp) / "plugin_index.json"
+        report = [
+            measure("eager", runs, lazy=False, index_path=None, reset_index=False),
+            measure("lazy, cold index", runs, lazy=True, index_path=index_path, reset_index=True),
+            measure("lazy, warm index", runs, lazy=True, index_path=index_path, reset_index=False),
+        ]
+
+    print(f"{'mode':<20}{'tools':>6}{'modules':>9}{'load ms':>10}{'prompt ms':>11}")
+    for row in report:
+        print(f"{row['mode']:<20}{row['tools']:>6}{row['modules']:>9}{row['load_ms']:>10.1f}{row['ready_ms']:>11.1f}")
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
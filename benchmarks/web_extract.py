@@ -0,0 +1,140 @@
+"""Benchmark for web_scraper's streaming text mode.
+
+Serves a synthetic article page (inline scripts, styles and navigation around the
+content) from a local server and compares ``web_scraper`` in the default "raw" mode,
+which returns up to ``max_bytes`` of markup, with "text" mode, which parses the page
+as it downloads and stops after ``max_chars`` characters of readable text. "result
+chars" is the size of the JSON that goes back to the model::
+
+    python -m benchmarks.web_extract --paragraphs 5000 --max-chars 4000 --runs 5
+"""
+
+import argparse
+import json
+import statistics
+import sys
+import threading
+import time
+import tracemalloc
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+if str(BASE_DIR) not in sys.path:
+    sys.path.insert(0, str(BASE_DIR))
+
+from plugins.core_plugins.web_scraper.function import web_scraper  # noqa: E402
+
+_WRITE_SIZE = 64 * 1024
+
+
+def build_page(paragraphs: int) -> bytes:
+    script = "window.__STATE__ = " + json.dumps({"items": [{"id": index, "flag": True} for index in range(2000)]})
+    nav = "".join(f'<li><a href="/section/{index}">Section {index}</a></li>' for index in range(200))
+    sentence = "Lorem ipsum dolor sit amet, consectetur adipiscing elit, sed do eiusmod tempor. " * 3
+    body = "".join(
+        f'<div class="row"><p>{sentence}<a href="/ref/{index}">reference {index}</a></p></div>\n'
+        for index in range(paragraphs)
+    )
+    return (
+        '<!doctype html><html><head><title>Synthetic article</title>'
+        f"<style>{'.row{margin:0 auto;padding:4px}' * 500}</style><script>{script}</script></head>"
+        f"<body><header><nav><ul>{nav}</ul></nav></header><main><h1>Synthetic article</h1>{body}</main>"
+        "<footer>Footer</footer></body></html>"
+    ).encode("utf-8")
+
+
+class _PageServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, payload: bytes) -> None:
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.payload = payload
+
+    def handle_error(self, request: Any, client_address: Any) -> None:
+        # Text mode hangs up mid-body on purpose.
+        pass
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    server: _PageServer
+
+    def do_GET(self) -> None:  # noqa: N802 - http.server naming
+        payload = self.server.payload
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        try:
+            for start in range(0, len(payload), _WRITE_SIZE):
+                self.wfile.write(payload[start : start + _WRITE_SIZE])
+        except OSError:
+            self.close_connection = True
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+
+def measure(label: str, url: str, runs: int, **options: Any) -> Dict[str, Any]:
+    timings: List[float] = []
+    result: Dict[str, Any] = {}
+    for _ in range(runs):
+        started = time.perf_counter()
+        result = web_scraper(url, timeout=30, **options)
+        timings.append(time.perf_counter() - started)
+
+    tracemalloc.start()
+    web_scraper(url, timeout=30, **options)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "mode": label,
+        "bytes_read": result.get("bytes_read", len(result.get("body", "").encode("utf-8"))),
+        "result_chars": len(json.dumps(result, ensure_ascii=False)),
+        "median_ms": statistics.median(timings) * 1000,
+        "peak_kib": peak / 1024,
+    }
+
+
+def parse_args(argv: Optional[List[str]]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--paragraphs", type=int, default=5000, help="Paragraphs in the synthetic page.")
+    parser.add_argument("--max-chars", type=int, default=4000, help="max_chars passed in text mode.")
+    parser.add_argument("--runs", type=int, default=5, help="Timed runs per mode (median is reported).")
+    parser.add_argument("--json", type=Path, help="Write the report as JSON to this path.")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    payload = build_page(max(1, args.paragraphs))
+    server = _PageServer(payload)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/article.html"
+    runs = max(1, args.runs)
+    try:
+        report = [
+            measure("raw", url, runs),
+            measure("text", url, runs, mode="text", max_chars=args.max_chars),
+        ]
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    print(f"Page: {len(payload) / 1024:.0f} KiB; max_chars={args.max_chars}")
+    print(f"{'mode':<8}{'bytes read':>12}{'result chars':>14}{'median ms':>11}{'peak KiB':>10}")
+    for row in report:
+        print(
+            f"{row['mode']:<8}{row['bytes_read']:>12}{row['result_chars']:>14}"
+            f"{row['median_ms']:>11.1f}{row['peak_kib']:>10.0f}"
+        )
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,10 +1,12 @@
 import configparser
+import os
 from pathlib import Path
 from typing import Iterable, List
 
 BASE_DIR = Path(__file__).resolve().parent
-SYSTEM_CONFIG_PATH = BASE_DIR / "system.config.ini"
-USER_CONFIG_PATH = BASE_DIR / "user.config.ini"
+# Environment overrides let benchmarks and CI point Pipegent at throwaway configs.
+SYSTEM_CONFIG_PATH = Path(os.environ.get("PIPEGENT_SYSTEM_CONFIG") or BASE_DIR / "system.config.ini")
+USER_CONFIG_PATH = Path(os.environ.get("PIPEGENT_USER_CONFIG") or BASE_DIR / "user.config.ini")
 
 
 def _load_config(paths: Iterable[Path]) -> configparser.ConfigParser:
@@ -29,3 +31,86 @@ executor_model = config["EXECUTER_LLM"]["model"]
 executor_temperature = config.getfloat("EXECUTER_LLM", "temperature", fallback=0.0)
 
 max_steps = config.getint("AGENT", "max_steps", fallback=5)
+max_parallel_steps = config.getint("AGENT", "max_parallel_steps", fallback=4)
+max_tool_workers = config.getint("AGENT", "max_tool_workers", fallback=8)
+batch_executor_calls = config.getboolean("AGENT", "batch_executor_calls", fallback=False)
+
+plan_cache_enabled = config.getboolean("PLAN_CACHE", "enabled", fallback=True)
+plan_cache_max_entries = config.getint("PLAN_CACHE", "max_entries", fallback=512)
+plan_cache_ttl_seconds = config.getfloat("PLAN_CACHE", "ttl_seconds", fallback=86400.0)
+_plan_cache_path = config.get("PLAN_CACHE", "path", fallback="cache/pipegent_cache.sqlite3").strip()
+plan_cache_path = (BASE_DIR / _plan_cache_path) if _plan_cache_path else None
+
+executor_cache_enabled = config.getboolean("EXECUTOR_CACHE", "enabled", fallback=True)
+executor_cache_max_entries = config.getint("EXECUTOR_CACHE", "max_entries", fallback=2048)
+executor_cache_ttl_seconds = config.getfloat("EXECUTOR_CACHE", "ttl_seconds", fallback=604800.0)
+_executor_cache_path = config.get("EXECUTOR_CACHE", "path", fallback="cache/pipegent_cache.sqlite3").strip()
+executor_cache_path = (BASE_DIR / _executor_cache_path) if _executor_cache_path else None
+
+plugin_lazy_import = config.getboolean("PLUGINS", "lazy_import", fallback=True)
+_plugin_index_path = config.get("PLUGINS", "index_path", fallback="cache/plugin_index.json").strip()
+plugin_index_path = (BASE_DIR / _plugin_index_path) if _plugin_index_path else None
+_plugin_usage_path = config.get("PLUGINS", "usage_path", fallback="cache/plugin_usage.json").strip()
+plugin_usage_path = (BASE_DIR / _plugin_usage_path) if _plugin_usage_path else None
+plugin_prewarm_top_n = config.getint("PLUGINS", "prewarm_top_n", fallback=4)
+plugin_hot_reload = config.getboolean("PLUGINS", "hot_reload", fallback=False)
+plugin_reload_interval = config.getfloat("PLUGINS", "reload_interval", fallback=2.0)
+
+sandbox_enabled = config.getboolean("SANDBOX", "enabled", fallback=False)
+sandbox_workers = config.getint("SANDBOX", "workers", fallback=4)
+sandbox_default_mode = config.get("SANDBOX", "default_mode", fallback="inline").strip().lower()
+sandbox_timeout_seconds = config.getfloat("SANDBOX", "default_timeout_seconds", fallback=60.0)
+sandbox_max_memory_mb = config.getint("SANDBOX", "default_max_memory_mb", fallback=2048)
+sandbox_shm_threshold = config.getint("SANDBOX", "shm_threshold_bytes", fallback=1024 * 1024)
+sandbox_max_tasks_per_worker = config.getint("SANDBOX", "max_tasks_per_worker", fallback=500)
+sandbox_preload_modules = [
+    name.strip()
+    for name in config.get("SANDBOX", "preload_modules", fallback="").split(",")
+    if name.strip()
+]
+
+http_max_connections_per_host = config.getint("HTTP", "max_connections_per_host", fallback=8)
+http_idle_timeout_seconds = config.getfloat("HTTP", "idle_timeout_seconds", fallback=60.0)
+http_dns_cache_size = config.getint("HTTP", "dns_cache_size", fallback=256)
+http_dns_ttl_seconds = config.getfloat("HTTP", "dns_ttl_seconds", fallback=300.0)
+_http_cache_path = config.get("HTTP", "cache_path", fallback="cache/http_cache.sqlite3").strip()
+http_cache_path = (BASE_DIR / _http_cache_path) if _http_cache_path else None
+http_cache_max_mb = config.getint("HTTP", "cache_max_mb", fallback=64)
+
+tool_limits_enabled = config.getboolean("TOOL_LIMITS", "enabled", fallback=True)
+tool_queue_timeout_seconds = config.getfloat("TOOL_LIMITS", "queue_timeout_seconds", fallback=300.0)
+
+prompt_tool_format = config.get("PROMPTS", "tool_format", fallback="json").strip().lower()
+
+tool_retrieval_enabled = config.getboolean("TOOL_RETRIEVAL", "enabled", fallback=False)
+tool_retrieval_top_k = config.getint("TOOL_RETRIEVAL", "executor_top_k", fallback=8)
+tool_retrieval_planner_top_k = config.getint("TOOL_RETRIEVAL", "planner_top_k", fallback=32)
+
+artifact_spill_threshold = config.getint("ARTIFACTS", "spill_threshold_bytes", fallback=64 * 1024)
+
+context_max_tokens = config.getint("CONTEXT", "max_history_tokens", fallback=3000)
+context_keep_turns = config.getint("CONTEXT", "keep_turns", fallback=3)
+context_summary_model = config.get("CONTEXT", "summary_model", fallback="").strip()
+
+metrics_enabled = config.getboolean("METRICS", "enabled", fallback=False)
+metrics_host = config.get("METRICS", "host", fallback="127.0.0.1").strip()
+metrics_port = config.getint("METRICS", "port", fallback=9464)
+_metrics_json_path = config.get("METRICS", "json_dump_path", fallback="").strip()
+metrics_json_path = (BASE_DIR / _metrics_json_path) if _metrics_json_path else None
+metrics_json_interval = config.getfloat("METRICS", "json_dump_interval", fallback=60.0)
+
+server_host = config.get("SERVER", "host", fallback="127.0.0.1").strip()
+server_port = config.getint("SERVER", "port", fallback=8080)
+server_max_request_bytes = config.getint("SERVER", "max_request_bytes", fallback=1024 * 1024)
+server_max_active_sessions = config.getint("SERVER", "max_active_sessions", fallback=256)
+server_idle_seconds = config.getfloat("SERVER", "idle_seconds", fallback=600.0)
+server_session_retention_seconds = config.getfloat("SERVER", "session_retention_seconds", fallback=604800.0)
+server_sessions_dir = BASE_DIR / config.get("SERVER", "sessions_dir", fallback="tempstore/sessions").strip()
+server_workers = config.getint("SERVER", "workers", fallback=1)
+server_max_worker_requests = config.getint("SERVER", "max_worker_requests", fallback=10000)
+server_max_worker_rss_mb = config.getint("SERVER", "max_worker_rss_mb", fallback=1024)
+server_preload_modules = [
+    name.strip()
+    for name in config.get("SERVER", "preload_modules", fallback="").split(",")
+    if name.strip()
+]
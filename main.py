@@ -1,27 +1,87 @@
+import functools
 import logging
 import os
 import shutil
 import uuid
+import weakref
+from dataclasses import dataclass, field
 from datetime import datetime
 from pathlib import Path
-from typing import Any, Callable, Dict, List, Optional, Tuple
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
 
-from openai import OpenAI
+from openai import AsyncOpenAI, OpenAI
 
 from config import (
+    artifact_spill_threshold,
+    batch_executor_calls,
     chatgpt_key,
+    context_keep_turns,
+    context_max_tokens,
+    context_summary_model,
+    executor_cache_enabled,
+    executor_cache_max_entries,
+    executor_cache_path,
+    executor_cache_ttl_seconds,
     executor_model,
     executor_temperature,
+    http_cache_max_mb,
+    http_cache_path,
+    http_dns_cache_size,
+    http_dns_ttl_seconds,
+    http_idle_timeout_seconds,
+    http_max_connections_per_host,
+    max_parallel_steps,
     max_steps,
+    max_tool_workers,
+    metrics_enabled,
+    metrics_host,
+    metrics_json_interval,
+    metrics_json_path,
+    metrics_port,
+    plan_cache_enabled,
+    plan_cache_max_entries,
+    plan_cache_path,
+    plan_cache_ttl_seconds,
     planner_model,
     planner_temperature,
+    plugin_hot_reload,
+    plugin_index_path,
+    plugin_lazy_import,
+    plugin_prewarm_top_n,
+    plugin_reload_interval,
+    plugin_usage_path,
+    prompt_tool_format,
+    sandbox_default_mode,
+    sandbox_enabled,
+    sandbox_max_memory_mb,
+    sandbox_max_tasks_per_worker,
+    sandbox_preload_modules,
+    sandbox_shm_threshold,
+    sandbox_timeout_seconds,
+    sandbox_workers,
+    server_sessions_dir,
+    tool_limits_enabled,
+    tool_queue_timeout_seconds,
+    tool_retrieval_enabled,
+    tool_retrieval_planner_top_k,
+    tool_retrieval_top_k,
 )
-from agents import PlannerAgent, ToolExecutor
-from prompts import build_system_prompt
-from services import load_plugins
+from agents import AsyncPlannerAgent, AsyncToolExecutor, PlannerAgent, ToolExecutor
+from agents.context_compactor import ContextCompactor, build_model_summarizer
+from prompts import ToolIndex, build_system_prompt
+from services import ArtifactStore, TieredCache, build_tiered_cache
+from services.http_transport import configure_transport
+from services.metrics import register_cache, start_json_dump, start_metrics_server
+from services.plugin_index import PluginIndex, PluginUsage
+from services.plugin_loader import PluginCatalog, prewarm_tools
+from services.plugin_watcher import PluginWatcher
+from services.sandbox import SandboxPool
+from services.sessions import SessionContext
+from services.tool_scheduler import ToolScheduler
 
 logger = logging.getLogger(__name__)
 _LOG_FILE: Optional[Path] = None
+_METRICS_STARTED = False
 
 
 def configure_logging() -> Path:
@@ -44,52 +104,302 @@ def configure_logging() -> Path:
     return log_file
 
 
-def create_agent() -> PlannerAgent:
+def start_metrics() -> None:
+    global _METRICS_STARTED
+    if _METRICS_STARTED:
+        return
+    _METRICS_STARTED = True
+    if metrics_enabled:
+        try:
+            start_metrics_server(metrics_host, metrics_port)
+        except OSError:
+            logger.exception("Could not start metrics endpoint on %s:%s", metrics_host, metrics_port)
+    if metrics_json_path is not None:
+        start_json_dump(metrics_json_path, metrics_json_interval)
+
+
+@dataclass
+class AgentRuntime:
+    """Everything that is loaded once per process and shared by all sessions."""
+
+    client: OpenAI
+    tools: Dict[str, Callable[..., Any]]
+    tool_specs: List[Dict[str, Any]]
+    system_prompt: str
+    plan_cache: Optional[TieredCache]
+    response_cache: Optional[TieredCache]
+    tool_index: Optional[ToolIndex] = None
+    catalog: Optional[PluginCatalog] = None
+    watcher: Optional[PluginWatcher] = None
+    scheduler: Optional[ToolScheduler] = None
+    agents: "weakref.WeakSet[PlannerAgent]" = field(default_factory=weakref.WeakSet)
+
+    def register(self, agent: PlannerAgent) -> PlannerAgent:
+        """Track a live agent so plugin reloads reach it."""
+        self.agents.add(agent)
+        return agent
+
+    def apply_plugins(
+        self,
+        tools: Dict[str, Callable[..., Any]],
+        tool_specs: List[Dict[str, Any]],
+        changed: Sequence[str] = (),
+    ) -> None:
+        """Swap a reloaded tool set into the runtime and every live agent."""
+        system_prompt = build_system_prompt(tool_specs, prompt_tool_format)
+        tool_index = ToolIndex(tool_specs) if tool_retrieval_enabled else None
+        self.tools, self.tool_specs, self.system_prompt, self.tool_index = tools, tool_specs, system_prompt, tool_index
+        if self.scheduler is not None and self.catalog is not None:
+            self.scheduler.configure(self.catalog.tool_limits())
+        # The caches are left alone: plan keys include the tool fingerprint and executor keys the
+        # system prompt, so entries for the previous tool set simply stop matching.
+        agents = list(self.agents)
+        for agent in agents:
+            agent.update_tools(tools, tool_specs, system_prompt, tool_index)
+        logger.info(
+            "Reloaded plugins (%s); %s tools now available to %s live agent(s).",
+            ", ".join(changed) or "no tool changes",
+            len(tools),
+            len(agents),
+        )
+
+
+def create_runtime(plugins: Optional[PluginCatalog] = None, serve_metrics: bool = True) -> AgentRuntime:
+    """Build the shared runtime; ``plugins`` lets a pre-fork parent hand over an already loaded catalog."""
     log_file = configure_logging()
-    logger.info("Creating agent with logs at %s", log_file)
+    if serve_metrics:
+        start_metrics()
+    logger.info("Loading Pipegent runtime with logs at %s", log_file)
     os.environ["OPENAI_API_KEY"] = chatgpt_key
-    client = OpenAI()
 
-    base_plugins_dir = Path(__file__).parent / "plugins"
-    plugin_dirs = [
-        base_plugins_dir / "core_plugins",
-        base_plugins_dir / "user_plugins",
-    ]
-    tools, tool_specs = _load_all_plugins(plugin_dirs)
-    if not tools:
-        raise RuntimeError("No plugins were loaded. Ensure manifest.json files are valid.")
+    catalog = plugins if plugins is not None else load_plugin_catalog()
+    tools, tool_specs = catalog.snapshot()
+    if catalog.sandbox is not None:
+        catalog.sandbox.start()
+    runtime = AgentRuntime(
+        client=OpenAI(),
+        tools=tools,
+        tool_specs=tool_specs,
+        system_prompt=build_system_prompt(tool_specs, prompt_tool_format),
+        plan_cache=_build_plan_cache(),
+        response_cache=_build_executor_cache(),
+        tool_index=ToolIndex(tool_specs) if tool_retrieval_enabled else None,
+        catalog=catalog,
+        scheduler=(
+            ToolScheduler(catalog.tool_limits(), tool_queue_timeout_seconds) if tool_limits_enabled else None
+        ),
+    )
+    catalog.on_unload = runtime.apply_plugins
+    if plugins is None:
+        prewarm_tools(tools, PluginUsage(plugin_usage_path).most_used(plugin_prewarm_top_n))
+    if plugin_hot_reload:
+        runtime.watcher = PluginWatcher(catalog, runtime.apply_plugins, plugin_reload_interval).start()
+    return runtime
 
-    system_prompt = build_system_prompt(tool_specs)
+
+def create_session_agent(runtime: AgentRuntime, session: SessionContext) -> PlannerAgent:
+    artifact_store = ArtifactStore(session.temp_dir / "artifacts", artifact_spill_threshold)
     executor = ToolExecutor(
-        client=client,
-        tools=tools,
-        system_prompt=system_prompt,
+        client=runtime.client,
+        tools=runtime.tools,
+        system_prompt=runtime.system_prompt,
         model=executor_model,
         temperature=executor_temperature,
+        artifact_store=artifact_store,
+        session=session,
+        response_cache=runtime.response_cache,
+        tool_index=runtime.tool_index,
+        tool_top_k=tool_retrieval_top_k,
+        tool_format=prompt_tool_format,
+        scheduler=runtime.scheduler,
     )
 
-    temp_dir = Path(__file__).parent / "tempstore"
-    prepare_temp_dir(temp_dir)
-    context_file = initialize_context_file(temp_dir)
-    os.environ["PIPEGENT_CONTEXT_FILE"] = str(context_file)
-
     agent = PlannerAgent(
-        client=client,
+        client=runtime.client,
         executor=executor,
-        tool_specs=tool_specs,
+        tool_specs=runtime.tool_specs,
         planner_model=planner_model,
         planner_temperature=planner_temperature,
         max_steps=max_steps,
-        temp_dir=temp_dir,
-        context_file=context_file,
+        temp_dir=session.temp_dir,
+        context_file=session.context_file,
+        max_parallel_steps=max_parallel_steps,
+        plan_cache=runtime.plan_cache,
+        batch_executor_calls=batch_executor_calls,
+        artifact_store=artifact_store,
+        context_compactor=_build_context_compactor(runtime.client),
+        tool_index=runtime.tool_index,
+        planner_top_k=tool_retrieval_planner_top_k,
     )
-    logger.info("Agent initialized with %s tools.", len(tools))
+    return runtime.register(agent)
+
+
+def create_agent() -> PlannerAgent:
+    runtime = create_runtime()
+    agent = create_session_agent(runtime, _prepare_run_session())
+    logger.info("Agent initialized with %s tools.", len(runtime.tools))
     return agent
 
 
+def create_async_agent() -> AsyncPlannerAgent:
+    runtime = create_runtime()
+    client = AsyncOpenAI()
+    session = _prepare_run_session()
+    artifact_store = ArtifactStore(session.temp_dir / "artifacts", artifact_spill_threshold)
+
+    executor = AsyncToolExecutor(
+        client=client,
+        tools=runtime.tools,
+        system_prompt=runtime.system_prompt,
+        model=executor_model,
+        temperature=executor_temperature,
+        max_tool_workers=max_tool_workers,
+        artifact_store=artifact_store,
+        session=session,
+        response_cache=runtime.response_cache,
+        tool_index=runtime.tool_index,
+        tool_top_k=tool_retrieval_top_k,
+        tool_format=prompt_tool_format,
+        scheduler=runtime.scheduler,
+    )
+
+    agent = AsyncPlannerAgent(
+        client=client,
+        executor=executor,
+        tool_specs=runtime.tool_specs,
+        planner_model=planner_model,
+        planner_temperature=planner_temperature,
+        max_steps=max_steps,
+        temp_dir=session.temp_dir,
+        context_file=session.context_file,
+        max_parallel_steps=max_parallel_steps,
+        plan_cache=runtime.plan_cache,
+        batch_executor_calls=batch_executor_calls,
+        artifact_store=artifact_store,
+        context_compactor=_build_context_compactor(runtime.client),
+        tool_index=runtime.tool_index,
+        planner_top_k=tool_retrieval_planner_top_k,
+    )
+    logger.info("Async agent initialized with %s tools.", len(runtime.tools))
+    return runtime.register(agent)
+
+
+def load_plugin_catalog(sandboxed: bool = True) -> PluginCatalog:
+    """Load every plugin root; ``sandboxed=False`` runs all plugins inline even when [SANDBOX] is enabled."""
+    base_plugins_dir = Path(__file__).parent / "plugins"
+    plugin_dirs = [
+        base_plugins_dir / "core_plugins",
+        base_plugins_dir / "user_plugins",
+    ]
+    index = PluginIndex(plugin_index_path)
+    transport_settings = _transport_settings()
+    transport_settings()
+    catalog = PluginCatalog(
+        plugin_dirs,
+        lazy=plugin_lazy_import,
+        index=index,
+        usage=PluginUsage(plugin_usage_path),
+        sandbox=_build_sandbox(transport_settings) if sandboxed else None,
+    )
+    tools, _ = catalog.load()
+    if not tools:
+        raise RuntimeError("No plugins were loaded. Ensure manifest.json files are valid.")
+    logger.info(
+        "Loaded %s plugins from %s directories (%s manifests from the index, lazy import %s).",
+        len(tools),
+        len(plugin_dirs),
+        index.hits,
+        "on" if plugin_lazy_import else "off",
+    )
+    return catalog
+
+
+def load_plugin_tools() -> Tuple[Dict[str, Callable[..., Any]], List[Dict[str, Any]]]:
+    return load_plugin_catalog().snapshot()
+
+
+def _transport_settings() -> Callable[[], None]:
+    """Applies the [HTTP] settings to this process's shared transport (picklable for sandbox workers)."""
+    return functools.partial(
+        configure_transport,
+        max_connections_per_host=http_max_connections_per_host,
+        idle_timeout_seconds=http_idle_timeout_seconds,
+        dns_cache_size=http_dns_cache_size,
+        dns_ttl_seconds=http_dns_ttl_seconds,
+        cache_path=http_cache_path,
+        cache_max_bytes=http_cache_max_mb * 1024 * 1024,
+    )
+
+
+def _build_sandbox(initializer: Optional[Callable[[], None]] = None) -> Optional[SandboxPool]:
+    if not sandbox_enabled:
+        return None
+    return SandboxPool(
+        workers=sandbox_workers,
+        default_mode=sandbox_default_mode,
+        default_timeout_seconds=sandbox_timeout_seconds,
+        default_max_memory_mb=sandbox_max_memory_mb,
+        shm_threshold_bytes=sandbox_shm_threshold,
+        max_tasks_per_worker=sandbox_max_tasks_per_worker,
+        preload_modules=sandbox_preload_modules,
+        initializer=initializer,
+    )
+
+
+def _build_plan_cache() -> Optional[TieredCache]:
+    if not plan_cache_enabled:
+        return None
+    cache = build_tiered_cache(
+        namespace="plans",
+        max_entries=plan_cache_max_entries,
+        ttl_seconds=plan_cache_ttl_seconds,
+        sqlite_path=plan_cache_path,
+    )
+    register_cache("plans", cache)
+    return cache
+
+
+def _build_executor_cache() -> Optional[TieredCache]:
+    if not executor_cache_enabled:
+        return None
+    if executor_temperature != 0:
+        logger.info("Executor response cache disabled: temperature %s is not deterministic.", executor_temperature)
+        return None
+    cache = build_tiered_cache(
+        namespace="executor_responses",
+        max_entries=executor_cache_max_entries,
+        ttl_seconds=executor_cache_ttl_seconds,
+        sqlite_path=executor_cache_path,
+    )
+    register_cache("executor_responses", cache)
+    return cache
+
+
+def _build_context_compactor(client: OpenAI) -> ContextCompactor:
+    summarizer = (
+        build_model_summarizer(client, context_summary_model) if context_summary_model else None
+    )
+    return ContextCompactor(
+        max_tokens=context_max_tokens,
+        keep_turns=context_keep_turns,
+        summarizer=summarizer,
+        model=planner_model,
+    )
+
+
+def _prepare_run_session() -> SessionContext:
+    temp_dir = Path(__file__).parent / "tempstore"
+    prepare_temp_dir(temp_dir)
+    context_file = initialize_context_file(temp_dir)
+    return SessionContext(session_id=context_file.stem, temp_dir=temp_dir, context_file=context_file)
+
+
 def prepare_temp_dir(temp_dir: Path) -> None:
     temp_dir.mkdir(parents=True, exist_ok=True)
     for item in temp_dir.iterdir():
+        if item == server_sessions_dir:
+            # Server sessions outlive CLI runs.
+            continue
         if item.is_file():
             item.unlink()
         elif item.is_dir():
@@ -97,29 +407,15 @@ def prepare_temp_dir(temp_dir: Path) -> None:
 
 
 def initialize_context_file(temp_dir: Path) -> Path:
-    for existing in temp_dir.glob("context_history*.json"):
+    for existing in temp_dir.glob("context_history*.json*"):
         existing.unlink(missing_ok=True)
 
     run_id = uuid.uuid4().hex
-    context_file = temp_dir / f"context_history_{run_id}.json"
-    context_file.write_text("[]", encoding="utf-8")
+    context_file = temp_dir / f"context_history_{run_id}.jsonl"
+    context_file.touch()
     return context_file
 
 
-def _load_all_plugins(plugin_dirs: List[Path]) -> Tuple[Dict[str, Callable[..., Any]], List[Dict[str, Any]]]:
-    aggregated_tools: Dict[str, Callable[..., Any]] = {}
-    aggregated_specs: List[Dict[str, Any]] = []
-    for directory in plugin_dirs:
-        dir_tools, dir_specs = load_plugins(directory)
-        for name, func in dir_tools.items():
-            if name in aggregated_tools:
-                raise RuntimeError(f"Duplicate plugin name detected: {name}")
-            aggregated_tools[name] = func
-        aggregated_specs.extend(dir_specs)
-    logger.info("Loaded %s plugins from %s directories.", len(aggregated_tools), len(plugin_dirs))
-    return aggregated_tools, aggregated_specs
-
-
 def main() -> None:
     configure_logging()
     agent = create_agent()
@@ -1,20 +1,20 @@
+import json
 import os
-from pathlib import Path
-from typing import Optional
+from typing import Any, Optional
 
 
-def clear_context(reason: Optional[str] = None) -> str:
-    context_path_str = os.getenv("PIPEGENT_CONTEXT_FILE")
-    if not context_path_str:
+def clear_context(reason: Optional[str] = None, session: Optional[Any] = None) -> str:
+    if session is None:
         raise RuntimeError("Context file location is not configured.")
 
-    context_path = Path(context_path_str)
+    # The context file is an append-only JSONL log; a truncation marker discards
+    # every record before it without deleting or rewriting the file.
+    context_path = session.context_file
     context_path.parent.mkdir(parents=True, exist_ok=True)
-    try:
-        context_path.unlink()
-    except FileNotFoundError:
-        pass
-    context_path.write_text("[]", encoding="utf-8")
+    with context_path.open("a", encoding="utf-8") as handle:
+        handle.write(json.dumps({"op": "truncate"}) + "\n")
+        handle.flush()
+        os.fsync(handle.fileno())
 
     suffix = f" Reason: {reason}" if reason else ""
     return f"Context history reset ({context_path.name}).{suffix}"
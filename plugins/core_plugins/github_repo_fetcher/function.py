@@ -1,10 +1,10 @@
 import base64
 import json
-import urllib.error
 import urllib.parse
-import urllib.request
 from typing import Any, Dict, Optional
 
+from services.http_transport import HttpTransportError, get_transport
+
 
 API_ROOT = "https://api.github.com"
 USER_AGENT = "PipegentGithubFetcher/1.0"
@@ -22,16 +22,14 @@ def _request(path: str, auth_token: Optional[str] = None, params: Optional[Dict[
     if auth_token:
         headers["Authorization"] = f"Bearer {auth_token}"
 
-    request = urllib.request.Request(url, headers=headers, method="GET")
     try:
-        with urllib.request.urlopen(request, timeout=20) as response:
-            return json.loads(response.read().decode("utf-8"))
-    except urllib.error.HTTPError as exc:
-        error_text = exc.read().decode("utf-8", errors="replace")
-        raise ConnectionError(f"GitHub API error {exc.code}: {error_text}") from exc
-    except urllib.error.URLError as exc:
-        reason = exc.reason if hasattr(exc, "reason") else str(exc)
-        raise ConnectionError(f"GitHub API request failed: {reason}") from exc
+        # The repository and contents calls share one pooled connection to the API.
+        result = get_transport().fetch("GET", url, headers=headers, timeout=20)
+    except (HttpTransportError, OSError) as exc:
+        raise ConnectionError(f"GitHub API request failed: {exc}") from exc
+    if result.status >= 400:
+        raise ConnectionError(f"GitHub API error {result.status}: {result.text()}")
+    return json.loads(result.body.decode("utf-8"))
 
 
 def github_repo_fetcher(
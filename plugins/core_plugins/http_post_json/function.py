@@ -1,9 +1,9 @@
 import json
-import urllib.error
 import urllib.parse
-import urllib.request
 from typing import Any, Dict, Optional
 
+from services.http_transport import HttpTransportError, get_transport
+
 
 DEFAULT_TIMEOUT = 20.0
 DEFAULT_HEADERS = {
@@ -35,23 +35,14 @@ def http_post_json(
             merged_headers[str(key)] = str(value)
 
     data = json.dumps(payload).encode("utf-8")
-    request = urllib.request.Request(url, data=data, headers=merged_headers, method="POST")
 
     try:
-        with urllib.request.urlopen(request, timeout=run_timeout) as response:
-            body = response.read().decode(response.headers.get_content_charset() or "utf-8", errors="replace")
-            return {
-                "status": response.status,
-                "headers": dict(response.headers.items()),
-                "body": body,
-            }
-    except urllib.error.HTTPError as exc:
-        body = exc.read().decode(exc.headers.get_content_charset() or "utf-8", errors="replace")
-        return {
-            "status": exc.code,
-            "headers": dict(exc.headers.items()) if exc.headers else {},
-            "body": body,
-        }
-    except urllib.error.URLError as exc:
-        reason = exc.reason if hasattr(exc, "reason") else str(exc)
-        raise ConnectionError(f"POST request failed: {reason}") from exc
+        result = get_transport().fetch("POST", url, headers=merged_headers, body=data, timeout=run_timeout)
+    except (HttpTransportError, OSError) as exc:
+        raise ConnectionError(f"POST request failed: {exc}") from exc
+
+    return {
+        "status": result.status,
+        "headers": dict(result.headers.items()),
+        "body": result.text(),
+    }
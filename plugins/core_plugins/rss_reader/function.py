@@ -1,14 +1,34 @@
+import contextvars
 import datetime as dt
-import urllib.error
+import email.utils
+import json
+import sqlite3
 import urllib.parse
-import urllib.request
 import xml.etree.ElementTree as ET
-from typing import Any, Dict, List, Optional
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple, Union
 
+from services.http_transport import HttpTransportError, get_transport
 
+
+PROJECT_ROOT = Path(__file__).resolve().parents[3]
+WATERMARK_PATH = PROJECT_ROOT / "cache" / "rss_watermarks.sqlite3"
 DEFAULT_MAX_ITEMS = 10
 MAX_LIMIT = 50
 DEFAULT_TIMEOUT = 15.0
+MAX_FEEDS = 20
+# Feeds are fetched on at most this many threads, one host per thread: the tool scheduler
+# gives a call one per-host slot for each host in ``urls``, so a host sees one request at a time.
+MAX_PARALLEL_FEEDS = 4
+# Entry ids remembered per feed, for entries without a usable publish date.
+MAX_SEEN_IDS = 500
+
+ParsedEntry = Tuple[str, Dict[str, Any]]
+# Newest returned publish time and recently returned entry ids of one feed.
+Watermark = Tuple[Optional[float], Set[str]]
+# (published timestamp, position, feed url, entry id, entry)
+Candidate = Tuple[Optional[float], int, str, str, Dict[str, Any]]
 
 
 def _local_name(tag: str) -> str:
@@ -63,57 +83,293 @@ def _extract_entry(entry: ET.Element) -> Dict[str, Any]:
     }
 
 
+def _entry_id(element: ET.Element, entry: Dict[str, Any]) -> str:
+    for child in element:
+        if _local_name(child.tag) in {"guid", "id"} and _extract_text(child):
+            return _extract_text(child)
+    return entry["link"] or f"{entry['title']}|{entry['published']}"
+
+
+def _parse_feed(
+    chunks: Iterable[bytes], limit: int, watermark: Optional[Watermark] = None
+) -> Tuple[str, List[ParsedEntry]]:
+    """Parse (id, entry) pairs as the feed arrives; stops reading once ``limit`` entries are parsed.
+
+    With a ``watermark`` only entries past it are kept and counted towards ``limit``.
+    """
+    parser = ET.XMLPullParser(events=("start", "end"))
+    stack: List[ET.Element] = []
+    entry_tag = ""
+    feed_title = ""
+    entries: List[ParsedEntry] = []
+
+    def consume() -> bool:
+        nonlocal entry_tag, feed_title
+        for event, element in parser.read_events():
+            if event == "start":
+                if not stack:
+                    entry_tag = "entry" if _local_name(element.tag).lower() == "feed" else "item"
+                stack.append(element)
+                continue
+            stack.pop()
+            name = _local_name(element.tag)
+            parent = _local_name(stack[-1].tag) if stack else ""
+            if name == "title" and not feed_title and parent.lower() in {"channel", "feed"}:
+                feed_title = _extract_text(element)
+            elif name == entry_tag and not any(_local_name(node.tag) == entry_tag for node in stack):
+                entry = _extract_entry(element)
+                entry_id = _entry_id(element, entry)
+                if watermark is None or _is_new(entry_id, _published_timestamp(entry["published"]), watermark):
+                    entries.append((entry_id, entry))
+                # Processed entries are dropped so memory stays flat on large feeds.
+                element.clear()
+                if stack:
+                    stack[-1].remove(element)
+                if len(entries) >= limit:
+                    return True
+        return False
+
+    try:
+        for chunk in chunks:
+            parser.feed(chunk)
+            if consume():
+                return feed_title, entries
+        parser.close()
+        consume()
+    except ET.ParseError as exc:
+        raise ValueError(f"Feed parsing failed: {exc}") from exc
+    return feed_title, entries
+
+
+def _published_timestamp(value: str) -> Optional[float]:
+    """Seconds since the epoch for RSS (RFC 822) and Atom (ISO 8601) dates."""
+    if not value:
+        return None
+    try:
+        parsed = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        try:
+            parsed = dt.datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=dt.timezone.utc)
+    return parsed.timestamp()
+
+
+def _validate_url(url: str) -> str:
+    url = url.strip() if isinstance(url, str) else ""
+    if not url:
+        raise ValueError("A feed URL is required.")
+    parsed = urllib.parse.urlparse(url)
+    if parsed.scheme not in {"http", "https"} or not parsed.netloc:
+        raise ValueError("Only HTTP(S) URLs are supported.")
+    return url
+
+
+def _fetch_feed(
+    url: str, limit: int, timeout: float, watermark: Optional[Watermark] = None
+) -> Tuple[str, List[ParsedEntry]]:
+    headers = {
+        "User-Agent": "PipegentRssReader/1.0",
+        "Accept": "application/rss+xml, application/atom+xml, */*",
+    }
+
+    try:
+        response = get_transport().request("GET", url, headers=headers, timeout=timeout)
+    except (HttpTransportError, OSError) as exc:
+        raise ConnectionError(f"Failed to download feed: {exc}") from exc
+    with response:
+        if response.status >= 400:
+            raise ConnectionError(f"Failed to download feed: HTTP {response.status} {response.reason}")
+        try:
+            # Closing the response early abandons the rest of the download.
+            return _parse_feed(response.iter_chunks(), limit, watermark)
+        except HttpTransportError as exc:
+            raise ConnectionError(f"Failed to download feed: {exc}") from exc
+
+
+def _fetch_feeds(
+    feed_urls: List[str], limit: int, timeout: float, watermarks: Dict[str, Watermark]
+) -> List[Tuple[str, Union[Tuple[str, List[ParsedEntry]], Exception]]]:
+    """Fetch feeds in order, keeping each failure as that feed's outcome."""
+    outcomes: List[Tuple[str, Union[Tuple[str, List[ParsedEntry]], Exception]]] = []
+    for feed_url in feed_urls:
+        try:
+            outcomes.append((feed_url, _fetch_feed(feed_url, limit, timeout, watermarks.get(feed_url))))
+        except (ConnectionError, ValueError) as exc:
+            outcomes.append((feed_url, exc))
+    return outcomes
+
+
+class _Watermarks:
+    """Per-feed newest publish time and recently returned entry ids, shared by every worker."""
+
+    def __init__(self, path: Path, namespace: str) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.namespace = namespace
+        self._conn = sqlite3.connect(str(path), timeout=30)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS watermarks ("
+                " namespace TEXT NOT NULL,"
+                " feed TEXT NOT NULL,"
+                " published REAL,"
+                " seen TEXT NOT NULL,"
+                " PRIMARY KEY (namespace, feed))"
+            )
+
+    def load(self, feed: str) -> Watermark:
+        row = self._conn.execute(
+            "SELECT published, seen FROM watermarks WHERE namespace = ? AND feed = ?", (self.namespace, feed)
+        ).fetchone()
+        return (row[0], set(json.loads(row[1]))) if row else (None, set())
+
+    def advance(self, feed: str, published: Optional[float], ids: List[str]) -> None:
+        # IMMEDIATE takes the write lock before reading, so concurrent calls merge instead of overwriting.
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = self._conn.execute(
+                "SELECT published, seen FROM watermarks WHERE namespace = ? AND feed = ?", (self.namespace, feed)
+            ).fetchone()
+            previous, seen = (row[0], json.loads(row[1])) if row else (None, [])
+            seen = [item for item in seen if item not in ids] + ids
+            if previous is not None and (published is None or previous > published):
+                published = previous
+            self._conn.execute(
+                "INSERT OR REPLACE INTO watermarks (namespace, feed, published, seen) VALUES (?, ?, ?, ?)",
+                (self.namespace, feed, published, json.dumps(seen[-MAX_SEEN_IDS:])),
+            )
+            self._conn.execute("COMMIT")
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+def _is_new(entry_id: str, published: Optional[float], watermark: Watermark) -> bool:
+    newest, seen = watermark
+    if entry_id in seen:
+        return False
+    return published is None or newest is None or published >= newest
+
+
 def rss_reader(
-    url: str,
+    url: Optional[str] = None,
+    urls: Optional[List[str]] = None,
     max_items: Optional[int] = None,
     timeout: Optional[float] = None,
+    only_new: bool = False,
+    watermark_key: Optional[str] = None,
 ) -> Dict[str, Any]:
-    if not url or not url.strip():
-        raise ValueError("A feed URL is required.")
-    parsed = urllib.parse.urlparse(url.strip())
-    if parsed.scheme not in {"http", "https"} or not parsed.netloc:
-        raise ValueError("Only HTTP(S) URLs are supported.")
+    if urls:
+        if not isinstance(urls, list):
+            raise ValueError("urls must be a list of feed URLs.")
+        feed_urls = list(dict.fromkeys(_validate_url(item) for item in ([url] if url else []) + urls))
+        if len(feed_urls) > MAX_FEEDS:
+            raise ValueError(f"At most {MAX_FEEDS} feeds can be read in one call.")
+    else:
+        feed_urls = [_validate_url(url or "")]
 
     limit = DEFAULT_MAX_ITEMS if max_items is None else max(1, min(MAX_LIMIT, max_items))
     run_timeout = timeout if timeout and timeout > 0 else DEFAULT_TIMEOUT
+    fetched_at = dt.datetime.utcnow().isoformat() + "Z"
 
-    request = urllib.request.Request(
-        url,
-        method="GET",
-        headers={
-            "User-Agent": "PipegentRssReader/1.0",
-            "Accept": "application/rss+xml, application/atom+xml, */*",
-        },
-    )
+    if not urls and not only_new:
+        feed_title, parsed_entries = _fetch_feed(feed_urls[0], limit, run_timeout)
+        return {
+            "feed_title": feed_title or "",
+            "entry_count": len(parsed_entries),
+            "fetched_at": fetched_at,
+            "entries": [entry for _, entry in parsed_entries],
+        }
 
+    store = _Watermarks(WATERMARK_PATH, (watermark_key or "default").strip()) if only_new else None
     try:
-        with urllib.request.urlopen(request, timeout=run_timeout) as response:
-            data = response.read()
-    except urllib.error.URLError as exc:
-        reason = exc.reason if hasattr(exc, "reason") else str(exc)
-        raise ConnectionError(f"Failed to download feed: {reason}") from exc
+        marks = {feed_url: store.load(feed_url) for feed_url in feed_urls} if store is not None else {}
+        results: Dict[str, Tuple[str, List[ParsedEntry]]] = {}
+        errors: List[Dict[str, str]] = []
+        if len(feed_urls) == 1:
+            results[feed_urls[0]] = _fetch_feed(feed_urls[0], limit, run_timeout, marks.get(feed_urls[0]))
+        else:
+            by_host: Dict[str, List[str]] = {}
+            for feed_url in feed_urls:
+                by_host.setdefault(urllib.parse.urlparse(feed_url).netloc.lower(), []).append(feed_url)
+            outcomes: Dict[str, Union[Tuple[str, List[ParsedEntry]], Exception]] = {}
+            with ThreadPoolExecutor(max_workers=min(MAX_PARALLEL_FEEDS, len(by_host))) as pool:
+                # Each host's feeds run in a copy of this context so the tool's HTTP cache scope applies.
+                futures = [
+                    pool.submit(contextvars.copy_context().run, _fetch_feeds, group, limit, run_timeout, marks)
+                    for group in by_host.values()
+                ]
+                for future in futures:
+                    outcomes.update(future.result())
+            for feed_url in feed_urls:
+                outcome = outcomes[feed_url]
+                if isinstance(outcome, Exception):
+                    errors.append({"url": feed_url, "error": str(outcome)})
+                else:
+                    results[feed_url] = outcome
+            if not results:
+                raise ConnectionError(
+                    "Failed to download any feed: " + "; ".join(error["error"] for error in errors)
+                )
 
-    try:
-        root = ET.fromstring(data)
-    except ET.ParseError as exc:
-        raise ValueError(f"Feed parsing failed: {exc}") from exc
+        candidates: List[Candidate] = []
+        for feed_url, (feed_title, parsed_entries) in results.items():
+            for entry_id, entry in parsed_entries:
+                if urls:
+                    entry = dict(entry, feed=feed_title or feed_url)
+                published = _published_timestamp(entry["published"])
+                candidates.append((published, len(candidates), feed_url, entry_id, entry))
 
-    channel = root.find("channel")
-    if channel is None and _local_name(root.tag) == "rss":
-        entries = root.findall(".//item")
-        feed_title = _extract_text(root.find("./channel/title"))
-    elif _local_name(root.tag).lower() == "feed":
-        entries = root.findall(".//{*}entry")
-        feed_title = _extract_text(root.find("./{*}title"))
-    else:
-        entries = root.findall(".//item")
-        feed_title = _extract_text(root.find("./title"))
+        # Newest first; undated entries keep their feed order after the dated ones.
+        candidates.sort(key=lambda item: (item[0] is None, -(item[0] or 0.0), item[1]))
+        selected: List[Candidate] = []
+        duplicates: List[Candidate] = []
+        left_over: List[Candidate] = []
+        seen_keys: Set[str] = set()
+        for candidate in candidates:
+            keys = {candidate[3], candidate[4]["link"]} - {""}
+            if keys & seen_keys:
+                duplicates.append(candidate)
+            elif len(selected) < limit:
+                seen_keys |= keys
+                selected.append(candidate)
+            else:
+                left_over.append(candidate)
 
-    parsed_entries = [_extract_entry(entry) for entry in entries[:limit]]
+        if store is not None:
+            for feed_url in results:
+                # A duplicate of a returned entry counts as returned.
+                returned = [item for item in selected + duplicates if item[2] == feed_url]
+                dates = [item[0] for item in returned if item[0] is not None]
+                # Entries cut by max_items are older than the ones returned; moving the date
+                # past them would hide them for good, so until they are returned only ids are kept.
+                pending = any(item[2] == feed_url for item in left_over)
+                newest = max(dates) if dates and not pending else None
+                store.advance(feed_url, newest, [item[3] for item in returned])
+    finally:
+        if store is not None:
+            store.close()
 
+    entries = [item[4] for item in selected]
+    if not urls:
+        return {
+            "feed_title": results[feed_urls[0]][0] or "",
+            "entry_count": len(entries),
+            "fetched_at": fetched_at,
+            "entries": entries,
+        }
     return {
-        "feed_title": feed_title or "",
-        "entry_count": len(parsed_entries),
-        "fetched_at": dt.datetime.utcnow().isoformat() + "Z",
-        "entries": parsed_entries,
+        "feeds": [
+            {"url": feed_url, "feed_title": feed_title or "", "entries_read": len(parsed_entries)}
+            for feed_url, (feed_title, parsed_entries) in results.items()
+        ],
+        "errors": errors,
+        "entry_count": len(entries),
+        "fetched_at": fetched_at,
+        "entries": entries,
     }
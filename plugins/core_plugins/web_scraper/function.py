@@ -1,12 +1,178 @@
-import urllib.error
+import codecs
+import re
 import urllib.parse
-import urllib.request
-from typing import Any, Dict, Optional, Union
+from html.parser import HTMLParser
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple, Union
+
+from services.http_transport import HttpResponse, HttpTransportError, get_transport
 
 
 DEFAULT_TIMEOUT = 20.0
 DEFAULT_MAX_BYTES = 200_000
+DEFAULT_MAX_CHARS = 8_000
 DEFAULT_USER_AGENT = "PipegentWebScraper/1.0"
+MAX_LINKS = 50
+# Markup is fed to the parser in slices this size, so downloading stops soon after max_chars.
+FEED_SIZE = 8 * 1024
+
+# Elements whose content is never readable text (or is site chrome rather than the page).
+SKIPPED_TAGS = {
+    "script", "style", "noscript", "template", "svg", "canvas", "iframe",
+    "nav", "header", "footer", "aside", "form", "button", "select",
+}
+BLOCK_TAGS = {
+    "address", "article", "blockquote", "br", "dd", "details", "div", "dl", "dt", "figcaption",
+    "figure", "h1", "h2", "h3", "h4", "h5", "h6", "hr", "li", "main", "ol", "p", "pre", "section",
+    "summary", "table", "td", "th", "tr", "ul",
+}
+_WHITESPACE = re.compile(r"\s+")
+
+
+class _TextExtractor(HTMLParser):
+    """Collects readable text, the title, and outgoing links from HTML fed in pieces."""
+
+    def __init__(self, base_url: str, max_chars: int) -> None:
+        super().__init__(convert_charrefs=True)
+        self.base_url = base_url
+        self.max_chars = max_chars
+        self.title = ""
+        self.links: List[Dict[str, str]] = []
+        self._parts: List[str] = []
+        self._length = 0
+        self._skip: List[str] = []
+        self._in_title = False
+        self._anchor: Optional[Tuple[str, List[str]]] = None
+        self._hrefs: Set[str] = set()
+
+    @property
+    def full(self) -> bool:
+        return self._length >= self.max_chars
+
+    def text(self) -> str:
+        return "".join(self._parts).strip()[: self.max_chars]
+
+    def handle_starttag(self, tag: str, attrs: List[Tuple[str, Optional[str]]]) -> None:
+        if tag in SKIPPED_TAGS:
+            self._skip.append(tag)
+        elif self._skip:
+            return
+        elif tag == "title":
+            # The document title only; SVG and later titles are ignored.
+            self._in_title = not self.title
+        elif tag == "a":
+            self._anchor = (dict(attrs).get("href") or "", [])
+        if tag in BLOCK_TAGS:
+            self._newline()
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag in SKIPPED_TAGS:
+            if tag in self._skip:
+                # Closes the innermost open element of this kind, and any unclosed ones inside it.
+                del self._skip[len(self._skip) - 1 - self._skip[::-1].index(tag) :]
+        elif tag == "title":
+            self._in_title = False
+        elif tag == "a" and self._anchor is not None:
+            href, words = self._anchor
+            self._anchor = None
+            self._add_link(href, " ".join(words))
+        if tag in BLOCK_TAGS:
+            self._newline()
+
+    def handle_data(self, data: str) -> None:
+        if self._in_title:
+            self.title = _WHITESPACE.sub(" ", self.title + data).strip()
+            return
+        if self._skip or self.full:
+            return
+        text = _WHITESPACE.sub(" ", data)
+        if not text.strip():
+            if self._parts and not self._parts[-1].endswith(("\n", " ")):
+                self._append(" ")
+            return
+        if self._anchor is not None:
+            self._anchor[1].append(text.strip())
+        if not self._parts or self._parts[-1].endswith("\n"):
+            text = text.lstrip()
+        self._append(text)
+
+    def _newline(self) -> None:
+        if self._parts and not self._parts[-1].endswith("\n"):
+            self._parts[-1] = self._parts[-1].rstrip(" ")
+            self._append("\n")
+
+    def _append(self, text: str) -> None:
+        self._parts.append(text)
+        self._length += len(text)
+
+    def _add_link(self, href: str, text: str) -> None:
+        href = href.strip()
+        if not href or href.startswith("#") or self.full or len(self.links) >= MAX_LINKS:
+            return
+        absolute = urllib.parse.urldefrag(urllib.parse.urljoin(self.base_url, href))[0]
+        if urllib.parse.urlparse(absolute).scheme not in {"http", "https"} or absolute in self._hrefs:
+            return
+        self._hrefs.add(absolute)
+        self.links.append({"text": text, "href": absolute})
+
+
+def _pieces(response: HttpResponse, byte_limit: int) -> Iterator[bytes]:
+    remaining = byte_limit
+    for chunk in response.iter_chunks():
+        for start in range(0, len(chunk), FEED_SIZE):
+            piece = chunk[start : start + min(FEED_SIZE, remaining)]
+            remaining -= len(piece)
+            yield piece
+            if remaining <= 0:
+                return
+
+
+def _extract_text(response: HttpResponse, charset: str, byte_limit: int, max_chars: int) -> Dict[str, Any]:
+    """Stream the body through the extractor; stops reading at ``max_chars`` of text or ``byte_limit`` bytes."""
+    try:
+        decoder = codecs.getincrementaldecoder(charset)(errors="replace")
+    except LookupError:
+        charset = "utf-8"
+        decoder = codecs.getincrementaldecoder(charset)(errors="replace")
+    # Anything that is not HTML (plain text, JSON, ...) is passed through as it is.
+    extractor = _TextExtractor(response.url, max_chars) if "html" in response.headers.get_content_type() else None
+    plain: List[str] = []
+    plain_length = 0
+    bytes_read = 0
+
+    for piece in _pieces(response, byte_limit):
+        bytes_read += len(piece)
+        markup = decoder.decode(piece)
+        if extractor is not None:
+            extractor.feed(markup)
+            if extractor.full:
+                break
+        else:
+            plain.append(markup)
+            plain_length += len(markup)
+            if plain_length >= max_chars:
+                break
+    tail = decoder.decode(b"", final=True)
+
+    if extractor is None:
+        text = "".join(plain) + tail
+        return {
+            "encoding_used": charset,
+            "truncated": not response.eof or len(text) > max_chars,
+            "title": "",
+            "text": text[:max_chars],
+            "links": [],
+            "bytes_read": bytes_read,
+        }
+    extractor.feed(tail)
+    extractor.close()
+    return {
+        "encoding_used": charset,
+        "truncated": not response.eof or extractor.full,
+        "title": extractor.title,
+        "text": extractor.text(),
+        "links": extractor.links,
+        "bytes_read": bytes_read,
+    }
 
 
 def web_scraper(
@@ -14,10 +180,13 @@ def web_scraper(
     timeout: Optional[Union[int, float]] = None,
     max_bytes: Optional[int] = None,
     user_agent: Optional[str] = None,
+    mode: Optional[str] = None,
+    max_chars: Optional[int] = None,
 ) -> Dict[str, Any]:
     """
     Fetch the provided URL and return a subset of the response details.
-    Response always includes HTTP status, content type, encoding, truncation flag, and the body snippet.
+    Response always includes HTTP status, content type, encoding, and truncation flag. The default
+    "raw" mode adds the body snippet; "text" mode adds the page's readable text, title, and links.
     """
 
     if not url or not url.strip():
@@ -35,42 +204,47 @@ def web_scraper(
     if byte_limit <= 0:
         raise ValueError("max_bytes must be greater than zero.")
 
+    run_mode = (mode or "raw").strip().lower()
+    if run_mode not in {"raw", "text"}:
+        raise ValueError("mode must be 'raw' or 'text'.")
+
+    char_limit = int(max_chars) if max_chars is not None else DEFAULT_MAX_CHARS
+    if char_limit <= 0:
+        raise ValueError("max_chars must be greater than zero.")
+
     headers = {
         "User-Agent": user_agent.strip() if user_agent else DEFAULT_USER_AGENT,
-        "Accept": "*/*",
+        "Accept": "text/html, */*;q=0.8" if run_mode == "text" else "*/*",
     }
-    request = urllib.request.Request(url, headers=headers, method="GET")
 
-    try:
-        with urllib.request.urlopen(request, timeout=run_timeout) as response:
-            body_bytes = response.read(byte_limit + 1)  # +1 so we can flag truncation.
-            truncated = len(body_bytes) > byte_limit
-            content_bytes = body_bytes[:byte_limit]
-            charset = response.headers.get_content_charset() or "utf-8"
-            text = content_bytes.decode(charset, errors="replace")
+    if run_mode == "text":
+        try:
+            response = get_transport().request("GET", url, headers=headers, timeout=run_timeout)
+        except (HttpTransportError, OSError) as exc:
+            raise ConnectionError(f"Failed to fetch {url}: {exc}") from exc
+        with response:
+            try:
+                # Closing the response early abandons the rest of the download.
+                extracted = _extract_text(response, response.charset or "utf-8", byte_limit, char_limit)
+            except HttpTransportError as exc:
+                raise ConnectionError(f"Failed to fetch {url}: {exc}") from exc
             return {
                 "status": response.status,
                 "content_type": response.headers.get("Content-Type", ""),
-                "encoding_used": charset,
-                "truncated": truncated,
-                "body": text,
+                **extracted,
             }
-    except urllib.error.HTTPError as exc:
-        error_body = exc.read(byte_limit if byte_limit > 0 else DEFAULT_MAX_BYTES)
-        charset = "utf-8"
-        content_type = ""
-        if exc.headers:
-            header_charset = exc.headers.get_content_charset()
-            if header_charset:
-                charset = header_charset
-            content_type = exc.headers.get("Content-Type", "")
-        return {
-            "status": exc.code,
-            "content_type": content_type,
-            "encoding_used": charset,
-            "truncated": False,
-            "body": error_body.decode(charset, errors="replace"),
-        }
-    except urllib.error.URLError as exc:
-        reason = exc.reason if hasattr(exc, "reason") else str(exc)
-        raise ConnectionError(f"Failed to fetch {url}: {reason}") from exc
+
+    try:
+        # Error statuses come back as a normal result; only the first byte_limit bytes are read.
+        result = get_transport().fetch("GET", url, headers=headers, timeout=run_timeout, max_bytes=byte_limit)
+    except (HttpTransportError, OSError) as exc:
+        raise ConnectionError(f"Failed to fetch {url}: {exc}") from exc
+
+    charset = result.charset or "utf-8"
+    return {
+        "status": result.status,
+        "content_type": result.headers.get("Content-Type", ""),
+        "encoding_used": charset,
+        "truncated": result.truncated,
+        "body": result.text(charset),
+    }
@@ -0,0 +1,395 @@
+import gc
+import http.client
+import importlib
+import json
+import logging
+import os
+import random
+import re
+import signal
+import socket
+import sys
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+
+from config import (
+    server_host,
+    server_max_worker_requests,
+    server_max_worker_rss_mb,
+    server_port,
+    server_preload_modules,
+    server_workers,
+)
+from main import configure_logging, create_runtime, load_plugin_catalog
+from server import RequestBodyError, build_session_manager, content_length, make_handler
+from services.plugin_loader import PluginCatalog, load_lazy_tools
+
+logger = logging.getLogger(__name__)
+
+_SESSION_PATH = re.compile(r"^/sessions/([^/?]+)")
+PROXY_TIMEOUT_SECONDS = 900.0
+RESPAWN_BACKOFF_SECONDS = 1.0
+HOP_HEADERS = {"connection", "keep-alive", "transfer-encoding", "content-length", "host"}
+
+
+@dataclass
+class _Slot:
+    index: int
+    sock: socket.socket
+    port: int
+    pid: Optional[int] = None
+    started_at: float = 0.0
+    restarts: int = 0
+
+
+class PreforkSupervisor:
+    """Single-threaded parent that preloads plugins once and forks worker processes.
+
+    Every worker serves the session API on its own pre-bound loopback socket, so a
+    replacement worker inherits the same port (and any connections queued while it
+    restarts). A separate router process listens on the public address and forwards
+    each session to ``crc32(session_id) % workers``, keeping a session's context log
+    owned by a single process. Workers recycle themselves after ``max_requests``
+    requests or once their RSS exceeds ``max_rss_mb``; the parent respawns them.
+    """
+
+    def __init__(
+        self,
+        workers: int,
+        host: str = "127.0.0.1",
+        port: int = 8080,
+        max_requests: int = 10000,
+        max_rss_mb: int = 1024,
+        preload_modules: Optional[List[str]] = None,
+    ) -> None:
+        self.workers = max(1, workers)
+        self.host = host
+        self.port = port
+        self.max_requests = max(0, max_requests)
+        self.max_rss_mb = max(0, max_rss_mb)
+        self.preload_modules = preload_modules or []
+        self.slots: List[_Slot] = []
+        self.router_pid: Optional[int] = None
+        self._router_socket: Optional[socket.socket] = None
+        self._plugins: Optional[PluginCatalog] = None
+        self._stopping = False
+
+    def run(self) -> None:
+        configure_logging()
+        self._preload()
+        self._bind_sockets()
+        signal.signal(signal.SIGTERM, self._handle_stop)
+        signal.signal(signal.SIGINT, self._handle_stop)
+
+        for slot in self.slots:
+            self._spawn_worker(slot)
+        self._spawn_router()
+        logger.info(
+            "Pre-fork supervisor %s serving http://%s:%s with %s workers.",
+            os.getpid(),
+            self.host,
+            self.port,
+            self.workers,
+        )
+        self._supervise()
+
+    def _preload(self) -> None:
+        for name in self.preload_modules:
+            try:
+                importlib.import_module(name)
+            except ImportError:
+                logger.info("Preload module %s is not installed; skipping.", name)
+        # Process-mode plugins run inline here: the workers already spread CPU-heavy plugins over
+        # cores, and a sandbox pool per worker would fork workers * (1 + sandbox_workers) processes
+        # that import the plugins again instead of sharing the modules preloaded below.
+        self._plugins = load_plugin_catalog(sandboxed=False)
+        # Workers should share plugin modules copy-on-write rather than each import them lazily.
+        load_lazy_tools(self._plugins.snapshot()[0].values())
+        # Move everything loaded so far out of the collector's reach so that GC passes in
+        # the workers do not touch (and un-share) these pages.
+        gc.collect()
+        gc.freeze()
+
+    def _bind_sockets(self) -> None:
+        self._router_socket = _listen(self.host, self.port)
+        self.port = self._router_socket.getsockname()[1]
+        for index in range(self.workers):
+            sock = _listen("127.0.0.1", 0)
+            self.slots.append(_Slot(index=index, sock=sock, port=sock.getsockname()[1]))
+
+    def _spawn_worker(self, slot: _Slot) -> None:
+        pid = os.fork()
+        if pid == 0:
+            code = 1
+            try:
+                self._close_inherited(keep=slot.sock)
+                code = _run_worker(slot.index, slot.sock, self._plugins, self.max_requests, self.max_rss_mb)
+            except BaseException:
+                logger.exception("Worker %s crashed.", slot.index)
+            finally:
+                os._exit(code)
+        slot.pid = pid
+        slot.started_at = time.monotonic()
+        logger.info("Started worker %s (pid %s) on port %s.", slot.index, pid, slot.port)
+
+    def _spawn_router(self) -> None:
+        assert self._router_socket is not None
+        pid = os.fork()
+        if pid == 0:
+            code = 1
+            try:
+                self._close_inherited(keep=self._router_socket)
+                code = _run_router(self._router_socket, [slot.port for slot in self.slots])
+            except BaseException:
+                logger.exception("Router crashed.")
+            finally:
+                os._exit(code)
+        self.router_pid = pid
+
+    def _supervise(self) -> None:
+        while True:
+            try:
+                pid, status = os.waitpid(-1, 0)
+            except ChildProcessError:
+                break
+            if self._stopping:
+                continue
+
+            if pid == self.router_pid:
+                logger.warning("Router exited with status %s; restarting.", status)
+                time.sleep(RESPAWN_BACKOFF_SECONDS)
+                self._spawn_router()
+                continue
+
+            slot = next((candidate for candidate in self.slots if candidate.pid == pid), None)
+            if slot is None:
+                continue
+            uptime = time.monotonic() - slot.started_at
+            logger.info("Worker %s (pid %s) exited with status %s after %.1fs.", slot.index, pid, status, uptime)
+            if os.waitstatus_to_exitcode(status) != 0 and uptime < RESPAWN_BACKOFF_SECONDS:
+                # Crash loop protection.
+                time.sleep(RESPAWN_BACKOFF_SECONDS)
+            slot.restarts += 1
+            self._spawn_worker(slot)
+        logger.info("Pre-fork supervisor stopped.")
+
+    def _handle_stop(self, signum: int, frame: Any) -> None:
+        if self._stopping:
+            return
+        self._stopping = True
+        logger.info("Supervisor received signal %s; stopping workers.", signum)
+        for pid in [self.router_pid] + [slot.pid for slot in self.slots]:
+            if pid:
+                try:
+                    os.kill(pid, signal.SIGTERM)
+                except ProcessLookupError:
+                    pass
+
+    def _close_inherited(self, keep: socket.socket) -> None:
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        random.seed()
+        for sock in [self._router_socket] + [slot.sock for slot in self.slots]:
+            if sock is not None and sock is not keep:
+                sock.close()
+
+
+def _listen(host: str, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(128)
+    return sock
+
+
+def _serve_on(sock: socket.socket, handler: type, daemon_threads: bool) -> ThreadingHTTPServer:
+    httpd = ThreadingHTTPServer(sock.getsockname()[:2], handler, bind_and_activate=False)
+    httpd.socket.close()
+    httpd.socket = sock
+    httpd.server_address = sock.getsockname()[:2]
+    httpd.daemon_threads = daemon_threads
+    return httpd
+
+
+def _run_worker(
+    index: int,
+    sock: socket.socket,
+    plugins: Optional[PluginCatalog],
+    max_requests: int,
+    max_rss_mb: int,
+) -> int:
+    # Clients, caches and threads are created after the fork so nothing is shared by accident.
+    runtime = create_runtime(plugins=plugins, serve_metrics=False)
+    manager = build_session_manager(runtime)
+    manager.start_janitor()
+    httpd = _serve_on(sock, make_handler(manager), daemon_threads=False)
+
+    stop = threading.Event()
+
+    def request_stop(reason: str) -> None:
+        if not stop.is_set():
+            stop.set()
+            logger.info("Worker %s (pid %s) stopping: %s", index, os.getpid(), reason)
+            threading.Thread(target=httpd.shutdown, daemon=True).start()
+
+    def watchdog() -> None:
+        while not stop.wait(1.0):
+            if max_requests and manager.requests_handled >= max_requests:
+                request_stop(f"served {manager.requests_handled} requests")
+            elif max_rss_mb and _rss_mb() > max_rss_mb:
+                request_stop(f"RSS {_rss_mb():.0f} MiB above {max_rss_mb} MiB")
+
+    signal.signal(signal.SIGTERM, lambda signum, frame: request_stop("SIGTERM"))
+    threading.Thread(target=watchdog, name="pipegent-worker-watchdog", daemon=True).start()
+    httpd.serve_forever()
+    # Waits for in-flight requests; queued connections stay on the socket for the next worker.
+    httpd.server_close()
+    manager.close()
+    return 0
+
+
+def _run_router(sock: socket.socket, worker_ports: List[int]) -> int:
+    httpd = _serve_on(sock, _make_router_handler(worker_ports), daemon_threads=True)
+    signal.signal(signal.SIGTERM, lambda signum, frame: threading.Thread(target=httpd.shutdown).start())
+    httpd.serve_forever()
+    httpd.server_close()
+    return 0
+
+
+def _make_router_handler(worker_ports: List[int]) -> type:
+    local = threading.local()
+
+    def forward(
+        port: int, method: str, path: str, body: bytes, headers: Dict[str, str]
+    ) -> Tuple[int, List[Tuple[str, str]], bytes]:
+        pool: Dict[int, http.client.HTTPConnection] = local.__dict__.setdefault("connections", {})
+        conn = pool.get(port)
+        reused = conn is not None
+        if conn is None:
+            conn = pool[port] = http.client.HTTPConnection("127.0.0.1", port, timeout=PROXY_TIMEOUT_SECONDS)
+        try:
+            conn.request(method, path, body=body or None, headers=headers)
+            response = conn.getresponse()
+            return response.status, response.getheaders(), response.read()
+        except (ConnectionError, http.client.HTTPException):
+            conn.close()
+            pool.pop(port, None)
+            if not reused:
+                raise
+        # A pooled keep-alive connection was closed by a recycled worker; retry once on a fresh one.
+        return forward(port, method, path, body, headers)
+
+    class RouterHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self) -> None:  # noqa: N802 - http.server API
+            if self.path == "/healthz":
+                self._healthz()
+                return
+            self._route()
+
+        def do_POST(self) -> None:  # noqa: N802 - http.server API
+            if self.path == "/sessions":
+                # Any worker can create the session directory; its requests then go to the owner.
+                body = self._drain()
+                if body is not None:
+                    self._proxy(random.choice(worker_ports), body)
+                return
+            self._route()
+
+        def do_DELETE(self) -> None:  # noqa: N802 - http.server API
+            self._route()
+
+        def _route(self) -> None:
+            body = self._drain()
+            if body is None:
+                return
+            match = _SESSION_PATH.match(self.path)
+            if not match:
+                self._send_json(404, {"error": "Not found"})
+                return
+            self._proxy(worker_ports[zlib.crc32(match.group(1).encode("utf-8")) % len(worker_ports)], body)
+
+        def _proxy(self, port: int, body: bytes) -> None:
+            headers = {
+                key: value for key, value in self.headers.items() if key.lower() not in HOP_HEADERS
+            }
+            try:
+                status, response_headers, payload = forward(port, self.command, self.path, body, headers)
+            except (OSError, http.client.HTTPException):
+                logger.exception("Forwarding %s %s to port %s failed.", self.command, self.path, port)
+                self._send_json(502, {"error": "Worker unavailable"})
+                return
+            self.send_response(status)
+            for key, value in response_headers:
+                if key.lower() not in HOP_HEADERS:
+                    self.send_header(key, value)
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def _healthz(self) -> None:
+            workers = []
+            for index, port in enumerate(worker_ports):
+                try:
+                    status, _, payload = forward(port, "GET", "/healthz", b"", {})
+                    entry = json.loads(payload) if status == 200 else {"status": f"HTTP {status}"}
+                except (OSError, ValueError, http.client.HTTPException) as exc:
+                    entry = {"status": f"unreachable: {exc}"}
+                workers.append({"worker": index, **entry})
+            healthy = all(entry.get("status") == "ok" for entry in workers)
+            self._send_json(200 if healthy else 503, {"status": "ok" if healthy else "degraded", "workers": workers})
+
+        def _drain(self) -> Optional[bytes]:
+            try:
+                length = content_length(self.headers)
+            except RequestBodyError as exc:
+                self.close_connection = True
+                self._send_json(exc.status, {"error": str(exc)})
+                return None
+            return self.rfile.read(length) if length else b""
+
+        def _send_json(self, status: int, payload: Dict[str, Any]) -> None:
+            encoded = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(encoded)))
+            self.end_headers()
+            self.wfile.write(encoded)
+
+        def log_message(self, format: str, *args: Any) -> None:
+            logger.debug("router: %s - " + format, self.address_string(), *args)
+
+    return RouterHandler
+
+
+def _rss_mb() -> float:
+    try:
+        with open("/proc/self/statm", "r", encoding="ascii") as handle:
+            resident_pages = int(handle.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        import resource
+
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is reported in bytes on macOS and KiB elsewhere.
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def run_prefork() -> None:
+    PreforkSupervisor(
+        workers=server_workers,
+        host=server_host,
+        port=server_port,
+        max_requests=server_max_worker_requests,
+        max_rss_mb=server_max_worker_rss_mb,
+        preload_modules=server_preload_modules,
+    ).run()
+
+
+if __name__ == "__main__":
+    run_prefork()
@@ -1,3 +1,4 @@
-from prompts.system_prompt import build_system_prompt
+from prompts.system_prompt import TOOL_FORMATS, build_system_prompt
+from prompts.tool_index import ToolIndex
 
-__all__ = ["build_system_prompt"]
+__all__ = ["TOOL_FORMATS", "ToolIndex", "build_system_prompt"]
@@ -17,16 +17,32 @@ RULES:
 """
 
 
-def build_system_prompt(tool_specs: List[Dict[str, Any]]) -> str:
-    tool_lines: List[str] = []
-    for spec in tool_specs:
-        name = spec.get("name", "unknown_tool")
-        description = spec.get("description", "No description provided.")
-        schema = spec.get("input_schema", {})
-        schema_json = json.dumps(schema, ensure_ascii=True)
-        tool_lines.append(
-            f"   - {name}: {description}\n     input_schema: {schema_json}"
-        )
+COMPACT_FORMAT_NOTE = (
+    "   Tools are listed as name(arg: type, ...); arg? is optional, = gives its default, "
+    "and \"a\"|\"b\" lists the allowed values."
+)
+
+_COMPACT_TYPES = {
+    "string": "str",
+    "integer": "int",
+    "number": "number",
+    "boolean": "bool",
+    "object": "dict",
+    "null": "None",
+}
+
+TOOL_FORMATS = ("json", "compact")
+
+
+def build_system_prompt(tool_specs: List[Dict[str, Any]], tool_format: str = "json") -> str:
+    """Executor system prompt; ``tool_format`` is "json" (full input_schema) or "compact" (signatures)."""
+    if tool_format not in TOOL_FORMATS:
+        raise ValueError(f"Unknown tool format {tool_format!r}; expected one of {', '.join(TOOL_FORMATS)}.")
+
+    render = render_compact_tool if tool_format == "compact" else render_json_tool
+    tool_lines = [render(spec) for spec in tool_specs]
+    if tool_lines and tool_format == "compact":
+        tool_lines.insert(0, COMPACT_FORMAT_NOTE)
 
     if not tool_lines:
         fallback_schema = json.dumps(
@@ -39,3 +55,48 @@ def build_system_prompt(tool_specs: List[Dict[str, Any]]) -> str:
 
     tools_block = "\n".join(tool_lines)
     return SYSTEM_PROMPT_TEMPLATE.replace("{tools_block}", tools_block)
+
+
+def render_json_tool(spec: Dict[str, Any]) -> str:
+    name = spec.get("name", "unknown_tool")
+    description = spec.get("description", "No description provided.")
+    schema_json = json.dumps(spec.get("input_schema", {}), ensure_ascii=True)
+    return f"   - {name}: {description}\n     input_schema: {schema_json}"
+
+
+def render_compact_tool(spec: Dict[str, Any]) -> str:
+    """One line per tool, e.g. ``table_parser(file_path: str, max_rows?: int = 100) - Parse a table.``"""
+    name = spec.get("name", "unknown_tool")
+    description = " ".join(str(spec.get("description", "No description provided.")).split())
+    return f"   - {name}({_compact_params(spec.get('input_schema', {}))}) - {description}"
+
+
+def _compact_params(schema: Any) -> str:
+    if not isinstance(schema, dict) or not isinstance(schema.get("properties"), dict):
+        return ""
+    required = set(schema.get("required") or [])
+    params: List[str] = []
+    for prop_name, prop in schema["properties"].items():
+        prop = prop if isinstance(prop, dict) else {}
+        marker = "" if prop_name in required else "?"
+        param = f"{prop_name}{marker}: {_compact_type(prop)}"
+        if "default" in prop:
+            param += f" = {json.dumps(prop['default'], ensure_ascii=True)}"
+        params.append(param)
+    return ", ".join(params)
+
+
+def _compact_type(prop: Dict[str, Any]) -> str:
+    enum = prop.get("enum")
+    if isinstance(enum, list) and enum:
+        return "|".join(json.dumps(value, ensure_ascii=True) for value in enum)
+
+    schema_type = prop.get("type")
+    if isinstance(schema_type, list):
+        return "|".join(_compact_type({**prop, "type": entry}) for entry in schema_type)
+    if schema_type == "array":
+        items = prop.get("items")
+        return f"list[{_compact_type(items)}]" if isinstance(items, dict) and items else "list"
+    if schema_type == "object" and isinstance(prop.get("properties"), dict):
+        return "{" + _compact_params(prop) + "}"
+    return _COMPACT_TYPES.get(str(schema_type), "any")
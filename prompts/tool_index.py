@@ -0,0 +1,122 @@
+import math
+import re
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Pattern, Sequence, Tuple
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from in into is it its of on or the this that to with "
+    "use using call step steps value values result results tool earlier previous".split()
+)
+# Tool names are the strongest signal, so their tokens count several times per document.
+_NAME_WEIGHT = 3
+
+
+def tokenize(text: str) -> List[str]:
+    tokens: List[str] = []
+    for token in _TOKEN_PATTERN.findall(text.lower().replace("_", " ")):
+        if token in _STOPWORDS or token.isdigit():
+            continue
+        tokens.append(_stem(token))
+    return tokens
+
+
+def _stem(token: str) -> str:
+    # Deliberately tiny suffix stripping: enough to match "words"/"word" and "rolling"/"roll".
+    if len(token) > 5 and token.endswith("ing"):
+        return token[:-3]
+    if len(token) > 4 and token.endswith("es") and not token.endswith("ses"):
+        return token[:-2]
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+
+def _schema_text(schema: Any) -> Iterable[str]:
+    if not isinstance(schema, dict):
+        return
+    properties = schema.get("properties")
+    if not isinstance(properties, dict):
+        return
+    for name, prop in properties.items():
+        yield str(name)
+        if isinstance(prop, dict):
+            yield str(prop.get("description", ""))
+            enum = prop.get("enum")
+            if isinstance(enum, list):
+                yield " ".join(str(value) for value in enum)
+            yield from _schema_text(prop.get("items"))
+            yield from _schema_text(prop)
+
+
+class ToolIndex:
+    """BM25 index over plugin manifests, built once when the plugins are loaded.
+
+    Documents are a tool's name, description and input schema (property names,
+    descriptions and enum values). ``select`` returns the specs worth showing the
+    executor for one step: tools named verbatim in the query, the ``always`` tools,
+    and the top-k BM25 matches, in catalog order so prompts stay stable.
+    """
+
+    def __init__(self, tool_specs: Sequence[Dict[str, Any]], k1: float = 1.5, b: float = 0.75) -> None:
+        self.tool_specs = list(tool_specs)
+        self.k1 = k1
+        self.b = b
+        self._positions = {str(spec.get("name")): position for position, spec in enumerate(self.tool_specs)}
+        self._lengths: List[int] = []
+        self._postings: Dict[str, List[Tuple[int, int]]] = {}
+        for position, spec in enumerate(self.tool_specs):
+            terms = self._document_terms(spec)
+            self._lengths.append(len(terms))
+            for term, count in Counter(terms).items():
+                self._postings.setdefault(term, []).append((position, count))
+
+        total = len(self.tool_specs)
+        self._average_length = (sum(self._lengths) / total) if total else 0.0
+        self._idf = {
+            term: math.log(1 + (total - len(postings) + 0.5) / (len(postings) + 0.5))
+            for term, postings in self._postings.items()
+        }
+        names = sorted(self._positions, key=len, reverse=True)
+        self._name_pattern: Optional[Pattern[str]] = (
+            re.compile(r"(?<![A-Za-z0-9_])(" + "|".join(re.escape(name) for name in names) + r")(?![A-Za-z0-9_])")
+            if names
+            else None
+        )
+
+    def __len__(self) -> int:
+        return len(self.tool_specs)
+
+    def search(self, query: str, k: int) -> List[str]:
+        """Names of the ``k`` best-scoring tools for ``query`` (only tools with a positive score)."""
+        scores: Dict[int, float] = {}
+        for term in set(tokenize(query)):
+            idf = self._idf.get(term)
+            if idf is None:
+                continue
+            for position, count in self._postings[term]:
+                length_norm = 1 - self.b + self.b * self._lengths[position] / (self._average_length or 1.0)
+                scores[position] = scores.get(position, 0.0) + idf * count * (self.k1 + 1) / (
+                    count + self.k1 * length_norm
+                )
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[: max(0, k)]
+        return [str(self.tool_specs[position].get("name")) for position, _ in ranked]
+
+    def mentioned(self, text: str) -> List[str]:
+        if self._name_pattern is None:
+            return []
+        return list(dict.fromkeys(self._name_pattern.findall(text)))
+
+    def select(self, query: str, k: int, always: Iterable[str] = ()) -> List[Dict[str, Any]]:
+        """Specs for the tools relevant to ``query``; every spec when nothing matches at all."""
+        relevant = set(self.mentioned(query)) | set(self.search(query, k))
+        if not relevant:
+            return list(self.tool_specs)
+        relevant.update(name for name in always if name in self._positions)
+        return [self.tool_specs[self._positions[name]] for name in sorted(relevant, key=self._positions.get)]
+
+    @staticmethod
+    def _document_terms(spec: Dict[str, Any]) -> List[str]:
+        name_terms = tokenize(str(spec.get("name", "")))
+        text = " ".join([str(spec.get("description", "")), *_schema_text(spec.get("input_schema"))])
+        return name_terms * _NAME_WEIGHT + tokenize(text)
@@ -0,0 +1,198 @@
+import json
+import logging
+import os
+import re
+from email.message import Message
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional, Tuple
+
+from config import (
+    server_host,
+    server_idle_seconds,
+    server_max_active_sessions,
+    server_max_request_bytes,
+    server_port,
+    server_session_retention_seconds,
+    server_sessions_dir,
+    server_workers,
+)
+from main import AgentRuntime, create_runtime, create_session_agent
+from services.metrics import REGISTRY
+from services.sessions import InvalidSessionIdError, SessionManager, SessionNotFoundError
+
+logger = logging.getLogger(__name__)
+
+_SESSION_PATH = re.compile(r"^/sessions/([^/]+)(/requests)?$")
+
+
+class RequestBodyError(ValueError):
+    """A request whose Content-Length cannot be served; ``status`` is the HTTP reply."""
+
+    def __init__(self, status: int, message: str) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+def content_length(headers: Message, limit: int = server_max_request_bytes) -> int:
+    """The request's declared body size, validated before anything is read from the socket."""
+    raw = (headers.get("Content-Length") or "0").strip()
+    try:
+        length = int(raw)
+    except ValueError:
+        raise RequestBodyError(400, "Invalid Content-Length header.") from None
+    if length < 0:
+        raise RequestBodyError(400, "Invalid Content-Length header.")
+    if length > limit:
+        raise RequestBodyError(413, "Request body too large")
+    return length
+
+
+def build_session_manager(runtime: AgentRuntime) -> SessionManager:
+    manager = SessionManager(
+        agent_factory=lambda session: create_session_agent(runtime, session),
+        root_dir=server_sessions_dir,
+        max_active=server_max_active_sessions,
+        idle_seconds=server_idle_seconds,
+        retention_seconds=server_session_retention_seconds,
+    )
+    REGISTRY.gauge_callback(
+        "pipegent_sessions",
+        "Live, evicted and expired server sessions.",
+        ("state",),
+        lambda: [
+            (("active",), manager.active_count()),
+            (("evicted",), manager.evictions),
+            (("expired",), manager.purged),
+        ],
+    )
+    return manager
+
+
+def make_handler(manager: SessionManager) -> type:
+    class PipegentHandler(BaseHTTPRequestHandler):
+        """JSON API: POST /sessions, POST /sessions/<id>/requests, DELETE /sessions/<id>."""
+
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self) -> None:  # noqa: N802 - http.server API
+            if self.path == "/healthz":
+                self._send(
+                    200, {"status": "ok", "pid": os.getpid(), "active_sessions": manager.active_count()}
+                )
+                return
+            self._send(404, {"error": "Not found"})
+
+        def do_POST(self) -> None:  # noqa: N802 - http.server API
+            body = self._read_json()
+            if body is None:
+                return
+
+            if self.path == "/sessions":
+                session_id = manager.create_session()
+                self._send(201, {"session_id": session_id})
+                return
+
+            match = _SESSION_PATH.match(self.path)
+            if not match or not match.group(2):
+                self._send(404, {"error": "Not found"})
+                return
+
+            user_request = body.get("request")
+            if not isinstance(user_request, str) or not user_request.strip():
+                self._send(400, {"error": "Body must contain a non-empty 'request' string."})
+                return
+
+            session_id = match.group(1)
+            try:
+                reply = manager.handle_request(session_id, user_request)
+            except InvalidSessionIdError as exc:
+                self._send(400, {"error": str(exc)})
+                return
+            except SessionNotFoundError as exc:
+                self._send(404, {"error": str(exc)})
+                return
+            except Exception:
+                logger.exception("Session %s failed to handle a request.", session_id)
+                self._send(500, {"error": "Internal server error"})
+                return
+            self._send(200, {"session_id": session_id, "response": reply})
+
+        def do_DELETE(self) -> None:  # noqa: N802 - http.server API
+            match = _SESSION_PATH.match(self.path)
+            if not match or match.group(2):
+                self._send(404, {"error": "Not found"})
+                return
+            try:
+                deleted = manager.delete(match.group(1))
+            except InvalidSessionIdError as exc:
+                self._send(400, {"error": str(exc)})
+                return
+            self._send(200 if deleted else 404, {"session_id": match.group(1), "deleted": deleted})
+
+        def _read_json(self) -> Optional[Dict[str, Any]]:
+            try:
+                length = content_length(self.headers)
+            except RequestBodyError as exc:
+                # The unread body would be parsed as the next request.
+                self.close_connection = True
+                self._send(exc.status, {"error": str(exc)})
+                return None
+            raw = self.rfile.read(length) if length else b""
+            if not raw.strip():
+                return {}
+            try:
+                body = json.loads(raw)
+            except (UnicodeDecodeError, json.JSONDecodeError):
+                self._send(400, {"error": "Body must be valid JSON."})
+                return None
+            if not isinstance(body, dict):
+                self._send(400, {"error": "Body must be a JSON object."})
+                return None
+            return body
+
+        def _send(self, status: int, payload: Dict[str, Any]) -> None:
+            encoded = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(encoded)))
+            self.end_headers()
+            self.wfile.write(encoded)
+
+        def log_message(self, format: str, *args: Any) -> None:
+            logger.info("%s - " + format, self.address_string(), *args)
+
+    return PipegentHandler
+
+
+def create_server(host: str = server_host, port: int = server_port) -> Tuple[ThreadingHTTPServer, SessionManager]:
+    runtime = create_runtime()
+    manager = build_session_manager(runtime)
+    manager.start_janitor()
+    server = ThreadingHTTPServer((host, port), make_handler(manager))
+    server.daemon_threads = True
+    logger.info("Pipegent server ready on http://%s:%s with %s tools.", host, server.server_port, len(runtime.tools))
+    return server, manager
+
+
+def main() -> None:
+    if server_workers > 1:
+        if hasattr(os, "fork"):
+            from prefork import run_prefork
+
+            run_prefork()
+            return
+        logger.warning("SERVER.workers=%s needs os.fork(); serving from a single process.", server_workers)
+
+    server, manager = create_server()
+    print(f"Pipegent server listening on http://{server_host}:{server.server_port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logger.info("Shutting down Pipegent server.")
+    finally:
+        server.server_close()
+        manager.close()
+
+
+if __name__ == "__main__":
+    main()
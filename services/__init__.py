@@ -1,3 +1,61 @@
-from services.plugin_loader import ManifestValidationError, load_plugins
+from services.artifact_store import ArtifactNotFoundError, ArtifactStore
+from services.cache import CacheStats, LRUCache, SQLiteCache, TieredCache, build_tiered_cache
+from services.context_log import ContextLog
+from services.http_cache import HttpCache, http_cache_scope
+from services.http_transport import HttpResult, HttpTransport, HttpTransportError, get_transport
+from services.memoize import MemoizedTool
+from services.metrics import REGISTRY, MetricsRegistry
+from services.plugin_index import PluginIndex, PluginUsage
+from services.plugin_loader import (
+    LazyTool,
+    ManifestValidationError,
+    PluginCatalog,
+    PluginImportError,
+    fingerprint_tool_specs,
+    load_plugins,
+)
+from services.plugin_watcher import PluginWatcher
+from services.sandbox import SandboxError, SandboxedTool, SandboxPool, ToolExecutionError, ToolTimeoutError
+from services.sessions import InvalidSessionIdError, SessionContext, SessionManager, SessionNotFoundError
+from services.tool_scheduler import FairGate, ToolQueueTimeout, ToolScheduler
 
-__all__ = ["ManifestValidationError", "load_plugins"]
+__all__ = [
+    "ArtifactNotFoundError",
+    "ArtifactStore",
+    "CacheStats",
+    "ContextLog",
+    "FairGate",
+    "HttpCache",
+    "HttpResult",
+    "HttpTransport",
+    "HttpTransportError",
+    "InvalidSessionIdError",
+    "LRUCache",
+    "LazyTool",
+    "ManifestValidationError",
+    "MemoizedTool",
+    "MetricsRegistry",
+    "PluginCatalog",
+    "PluginImportError",
+    "PluginIndex",
+    "PluginUsage",
+    "PluginWatcher",
+    "REGISTRY",
+    "SQLiteCache",
+    "SandboxError",
+    "SandboxPool",
+    "SandboxedTool",
+    "SessionContext",
+    "SessionManager",
+    "SessionNotFoundError",
+    "TieredCache",
+    "ToolExecutionError",
+    "ToolQueueTimeout",
+    "ToolScheduler",
+    "ToolTimeoutError",
+    "build_tiered_cache",
+    "fingerprint_tool_specs",
+    "get_transport",
+    "http_cache_scope",
+    "load_plugins",
+]
@@ -0,0 +1,142 @@
+import hashlib
+import logging
+import mmap
+import re
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+ARTIFACT_SCHEME = "artifact://"
+_HANDLE_PATTERN = re.compile(r"artifact://[0-9a-f]{16,64}")
+
+DEFAULT_SPILL_THRESHOLD = 64 * 1024
+
+
+class ArtifactNotFoundError(KeyError):
+    def __str__(self) -> str:
+        return f"Unknown artifact handle: {self.args[0]}"
+
+
+@dataclass
+class _Artifact:
+    size: int
+    refcount: int = 1
+    text: Optional[str] = None
+    path: Optional[Path] = None
+    mapping: Optional[mmap.mmap] = None
+
+
+class ArtifactStore:
+    """Content-addressed store for step outputs.
+
+    Small payloads stay in memory; payloads larger than ``spill_threshold`` bytes are
+    written once to ``spill_dir`` and read back through a memory map, so prompts and
+    tools pass a short ``artifact://`` handle around instead of the payload itself.
+    """
+
+    def __init__(self, spill_dir: Path, spill_threshold: int = DEFAULT_SPILL_THRESHOLD) -> None:
+        self.spill_dir = spill_dir
+        self.spill_threshold = max(0, spill_threshold)
+        self._artifacts: Dict[str, _Artifact] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def is_handle(value: Any) -> bool:
+        return isinstance(value, str) and bool(_HANDLE_PATTERN.fullmatch(value.strip()))
+
+    def put(self, data: str) -> str:
+        encoded = str(data).encode("utf-8")
+        handle = ARTIFACT_SCHEME + hashlib.sha256(encoded).hexdigest()[:32]
+        with self._lock:
+            existing = self._artifacts.get(handle)
+            if existing is not None:
+                existing.refcount += 1
+                return handle
+
+            if len(encoded) <= self.spill_threshold:
+                self._artifacts[handle] = _Artifact(size=len(encoded), text=str(data))
+            else:
+                self._artifacts[handle] = self._spill(handle, encoded)
+        return handle
+
+    def get(self, handle: str) -> str:
+        content = self._read(handle)
+        return content if isinstance(content, str) else content.decode("utf-8")
+
+    def preview(self, handle: str, length: int) -> str:
+        # UTF-8 uses at most 4 bytes per character, so this slice always covers `length` chars.
+        content = self._read(handle, length * 4)
+        if isinstance(content, bytes):
+            content = content.decode("utf-8", errors="ignore")
+        return content[:length]
+
+    def size(self, handle: str) -> int:
+        return self._lookup(handle).size
+
+    def resolve(self, value: Any) -> Any:
+        """Replace artifact handles (recursively, in dicts and lists) with their contents."""
+        if self.is_handle(value):
+            return self.get(value.strip())
+        if isinstance(value, dict):
+            return {key: self.resolve(item) for key, item in value.items()}
+        if isinstance(value, list):
+            return [self.resolve(item) for item in value]
+        return value
+
+    def release(self, handle: str) -> None:
+        with self._lock:
+            artifact = self._artifacts.get(handle)
+            if artifact is None:
+                return
+            artifact.refcount -= 1
+            if artifact.refcount > 0:
+                return
+            del self._artifacts[handle]
+        self._discard(artifact)
+
+    def clear(self) -> None:
+        with self._lock:
+            artifacts = list(self._artifacts.values())
+            self._artifacts.clear()
+        for artifact in artifacts:
+            self._discard(artifact)
+
+    def __len__(self) -> int:
+        return len(self._artifacts)
+
+    def _lookup(self, handle: str) -> _Artifact:
+        artifact = self._artifacts.get(handle.strip())
+        if artifact is None:
+            raise ArtifactNotFoundError(handle)
+        return artifact
+
+    def _read(self, handle: str, limit: Optional[int] = None) -> Union[str, bytes]:
+        # Copied under the lock: a concurrent release() or clear() closes the mapping.
+        with self._lock:
+            artifact = self._lookup(handle)
+            if artifact.text is not None:
+                return artifact.text
+            assert artifact.mapping is not None
+            return artifact.mapping[:limit]
+
+    def _spill(self, handle: str, encoded: bytes) -> _Artifact:
+        self.spill_dir.mkdir(parents=True, exist_ok=True)
+        path = self.spill_dir / (handle[len(ARTIFACT_SCHEME):] + ".bin")
+        path.write_bytes(encoded)
+        with path.open("rb") as handle_file:
+            mapping = mmap.mmap(handle_file.fileno(), 0, access=mmap.ACCESS_READ)
+        logger.debug("Spilled %s bytes to %s", len(encoded), path)
+        return _Artifact(size=len(encoded), path=path, mapping=mapping)
+
+    @staticmethod
+    def _discard(artifact: _Artifact) -> None:
+        if artifact.mapping is not None:
+            artifact.mapping.close()
+        if artifact.path is not None:
+            try:
+                artifact.path.unlink()
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,237 @@
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    expirations: int = 0
+    # Lookups keyed on conversation context as well (plan cache follow-ups); these rarely hit.
+    context_keyed: int = 0
+
+    @property
+    def hit_ratio(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        data = asdict(self)
+        data["hit_ratio"] = round(self.hit_ratio, 4)
+        return data
+
+
+class LRUCache:
+    """Thread-safe in-memory LRU cache with an optional per-entry TTL."""
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: Optional[float] = None) -> None:
+        self.max_entries = max(1, max_entries)
+        self.ttl_seconds = ttl_seconds if ttl_seconds and ttl_seconds > 0 else None
+        self.stats = CacheStats()
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats.misses += 1
+                return default
+            value, stored_at = entry
+            if self.ttl_seconds is not None and time.time() - stored_at > self.ttl_seconds:
+                del self._entries[key]
+                self.stats.expirations += 1
+                self.stats.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.stats.hits += 1
+            return value
+
+    def set(self, key: str, value: Any, stored_at: Optional[float] = None) -> None:
+        with self._lock:
+            self._entries[key] = (value, stored_at if stored_at is not None else time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats.evictions += 1
+
+    def invalidate(self, key: Optional[str] = None) -> None:
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SQLiteCache:
+    """Persistent LRU cache stored in SQLite; values must be JSON serializable."""
+
+    def __init__(
+        self,
+        path: Path,
+        namespace: str,
+        max_entries: int = 10_000,
+        ttl_seconds: Optional[float] = None,
+    ) -> None:
+        self.path = path
+        self.namespace = namespace
+        self.max_entries = max(1, max_entries)
+        self.ttl_seconds = ttl_seconds if ttl_seconds and ttl_seconds > 0 else None
+        self.stats = CacheStats()
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache_entries ("
+                " namespace TEXT NOT NULL,"
+                " key TEXT NOT NULL,"
+                " value TEXT NOT NULL,"
+                " stored_at REAL NOT NULL,"
+                " accessed_at REAL NOT NULL,"
+                " PRIMARY KEY (namespace, key))"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS cache_entries_lru"
+                " ON cache_entries (namespace, accessed_at)"
+            )
+
+    def get_entry(self, key: str) -> Optional[tuple]:
+        now = time.time()
+        try:
+            with self._lock, self._conn:
+                row = self._conn.execute(
+                    "SELECT value, stored_at FROM cache_entries WHERE namespace = ? AND key = ?",
+                    (self.namespace, key),
+                ).fetchone()
+                if row is None:
+                    self.stats.misses += 1
+                    return None
+                value_text, stored_at = row
+                if self.ttl_seconds is not None and now - stored_at > self.ttl_seconds:
+                    self._conn.execute(
+                        "DELETE FROM cache_entries WHERE namespace = ? AND key = ?",
+                        (self.namespace, key),
+                    )
+                    self.stats.expirations += 1
+                    self.stats.misses += 1
+                    return None
+                self._conn.execute(
+                    "UPDATE cache_entries SET accessed_at = ? WHERE namespace = ? AND key = ?",
+                    (now, self.namespace, key),
+                )
+        except sqlite3.Error as exc:
+            logger.warning("Cache read from %s failed: %s", self.path, exc)
+            self.stats.misses += 1
+            return None
+
+        self.stats.hits += 1
+        return json.loads(value_text), stored_at
+
+    def get(self, key: str, default: Any = None) -> Any:
+        entry = self.get_entry(key)
+        return default if entry is None else entry[0]
+
+    def set(self, key: str, value: Any) -> None:
+        now = time.time()
+        payload = json.dumps(value, ensure_ascii=False)
+        try:
+            with self._lock, self._conn:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO cache_entries"
+                    " (namespace, key, value, stored_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                    (self.namespace, key, payload, now, now),
+                )
+                evicted = self._conn.execute(
+                    "DELETE FROM cache_entries WHERE namespace = ? AND key IN ("
+                    " SELECT key FROM cache_entries WHERE namespace = ?"
+                    " ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                    (self.namespace, self.namespace, self.max_entries),
+                ).rowcount
+                self.stats.evictions += max(0, evicted)
+        except sqlite3.Error as exc:
+            logger.warning("Cache write to %s failed: %s", self.path, exc)
+
+    def invalidate(self, key: Optional[str] = None) -> None:
+        try:
+            with self._lock, self._conn:
+                if key is None:
+                    self._conn.execute(
+                        "DELETE FROM cache_entries WHERE namespace = ?", (self.namespace,)
+                    )
+                else:
+                    self._conn.execute(
+                        "DELETE FROM cache_entries WHERE namespace = ? AND key = ?",
+                        (self.namespace, key),
+                    )
+        except sqlite3.Error as exc:
+            logger.warning("Cache invalidation in %s failed: %s", self.path, exc)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class TieredCache:
+    """In-memory LRU tier backed by an optional SQLite tier that survives restarts."""
+
+    def __init__(self, memory: LRUCache, disk: Optional[SQLiteCache] = None) -> None:
+        self.memory = memory
+        self.disk = disk
+        self.stats = CacheStats()
+
+    def get(self, key: str, default: Any = None) -> Any:
+        value = self.memory.get(key, _MISSING)
+        if value is not _MISSING:
+            self.stats.hits += 1
+            return value
+
+        if self.disk is not None:
+            entry = self.disk.get_entry(key)
+            if entry is not None:
+                value, stored_at = entry
+                self.memory.set(key, value, stored_at=stored_at)
+                self.stats.hits += 1
+                return value
+
+        self.stats.misses += 1
+        return default
+
+    def set(self, key: str, value: Any) -> None:
+        self.memory.set(key, value)
+        if self.disk is not None:
+            self.disk.set(key, value)
+
+    def invalidate(self, key: Optional[str] = None) -> None:
+        self.memory.invalidate(key)
+        if self.disk is not None:
+            self.disk.invalidate(key)
+
+
+def build_tiered_cache(
+    namespace: str,
+    max_entries: int,
+    ttl_seconds: Optional[float] = None,
+    sqlite_path: Optional[Path] = None,
+) -> TieredCache:
+    disk = (
+        SQLiteCache(sqlite_path, namespace, max_entries=max_entries, ttl_seconds=ttl_seconds)
+        if sqlite_path is not None
+        else None
+    )
+    return TieredCache(LRUCache(max_entries=max_entries, ttl_seconds=ttl_seconds), disk)
@@ -0,0 +1,229 @@
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+Message = Dict[str, str]
+
+TRUNCATE_MARKER = {"op": "truncate"}
+
+
+class ContextLog:
+    """Append-only JSONL log of planner context messages.
+
+    Each line is either a message (``{"role": ..., "content": ...}``) or a truncation
+    marker (``{"op": "truncate"}``) that discards everything before it. Readers keep a
+    byte offset and only parse lines appended since their last read. Writes are flushed
+    immediately but fsynced in batches, and the file is rewritten with only the live
+    records once dead records (those before the last marker) dominate.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        fsync_every: int = 8,
+        fsync_interval: float = 2.0,
+        compact_min_dead_records: int = 64,
+    ) -> None:
+        self.path = path
+        self.fsync_every = max(1, fsync_every)
+        self.fsync_interval = max(0.0, fsync_interval)
+        self.compact_min_dead_records = max(1, compact_min_dead_records)
+        self._lock = threading.RLock()
+        self._offset = 0
+        self._inode: Optional[int] = None
+        self._total_records = 0
+        self._live_records = 0
+        self._unsynced_writes = 0
+        self._last_fsync = time.monotonic()
+        self._needs_reload = False
+
+    def load(self) -> List[Message]:
+        """Read the whole log from the start and return the live messages."""
+        with self._lock:
+            self._offset = 0
+            self._inode = None
+            self._total_records = 0
+            self._live_records = 0
+            _, messages = self.read_new()
+            return messages
+
+    def read_new(self) -> Tuple[bool, List[Message]]:
+        """Parse records appended since the last read.
+
+        Returns ``(reset, messages)``: when ``reset`` is true the caller must discard
+        its history (a truncation marker was read or the file was replaced) and use
+        ``messages`` as the new history; otherwise ``messages`` should be appended.
+        """
+        with self._lock:
+            if self._needs_reload:
+                self._needs_reload = False
+                return True, self.load()
+
+            try:
+                stat = self.path.stat()
+            except FileNotFoundError:
+                reset = self._offset > 0 or self._total_records > 0
+                self._offset, self._inode = 0, None
+                self._total_records = self._live_records = 0
+                return reset, []
+
+            reset = False
+            if self._inode is not None and (stat.st_ino != self._inode or stat.st_size < self._offset):
+                # Compacted or recreated by another writer: start over.
+                self._offset = 0
+                self._total_records = self._live_records = 0
+                reset = True
+            self._inode = stat.st_ino
+            if stat.st_size == self._offset:
+                return reset, []
+
+            with self.path.open("rb") as handle:
+                handle.seek(self._offset)
+                chunk = handle.read()
+
+            if self._offset == 0 and chunk.lstrip().startswith(b"["):
+                return True, self._read_legacy_json(chunk)
+
+            # Leave a trailing partial line (a concurrent writer mid-append) for the next read.
+            complete, newline, _ = chunk.rpartition(b"\n")
+            if not newline:
+                return reset, []
+            self._offset += len(complete) + 1
+
+            messages: List[Message] = []
+            for raw_line in complete.split(b"\n"):
+                record = _parse_line(raw_line)
+                if record is None:
+                    continue
+                self._total_records += 1
+                if record.get("op") == "truncate":
+                    messages = []
+                    self._live_records = 0
+                    reset = True
+                    continue
+                message = _as_message(record)
+                if message is not None:
+                    messages.append(message)
+                    self._live_records += 1
+            return reset, messages
+
+    def append(self, messages: List[Message]) -> None:
+        self._write([{"role": m["role"], "content": m["content"]} for m in messages])
+
+    def replace(self, messages: List[Message]) -> None:
+        """Record a new full history (e.g. after compaction) without rewriting the file."""
+        self._write([TRUNCATE_MARKER] + [{"role": m["role"], "content": m["content"]} for m in messages])
+
+    def truncate(self) -> None:
+        self._write([TRUNCATE_MARKER])
+
+    def flush(self) -> None:
+        with self._lock:
+            if self._unsynced_writes and self.path.exists():
+                with self.path.open("ab") as handle:
+                    os.fsync(handle.fileno())
+            self._unsynced_writes = 0
+            self._last_fsync = time.monotonic()
+
+    def compact(self) -> None:
+        """Rewrite the log so it only contains the live records."""
+        with self._lock:
+            self._rewrite(self.load())
+
+    def _rewrite(self, messages: List[Message]) -> None:
+        with self._lock:
+            tmp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+            payload = b"".join(_encode(message) for message in messages)
+            with tmp_path.open("wb") as handle:
+                handle.write(payload)
+                handle.flush()
+                os.fsync(handle.fileno())
+            os.replace(tmp_path, self.path)
+            stat = self.path.stat()
+            self._offset = len(payload)
+            self._inode = stat.st_ino
+            self._total_records = self._live_records = len(messages)
+            self._unsynced_writes = 0
+            logger.debug("Rewrote context log %s with %s records.", self.path, len(messages))
+
+    def _write(self, records: List[Dict[str, Any]]) -> None:
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            payload = b"".join(_encode(record) for record in records)
+            with self.path.open("ab") as handle:
+                start = handle.tell()
+                handle.write(payload)
+                handle.flush()
+                self._unsynced_writes += 1
+                now = time.monotonic()
+                if (
+                    self._unsynced_writes >= self.fsync_every
+                    or now - self._last_fsync >= self.fsync_interval
+                ):
+                    os.fsync(handle.fileno())
+                    self._unsynced_writes = 0
+                    self._last_fsync = now
+
+            if start == self._offset:
+                # Nothing unread precedes our records, so skip over them.
+                self._offset = start + len(payload)
+                self._inode = self.path.stat().st_ino
+                self._count_records(records)
+            else:
+                # Someone else appended since our last read; re-read from the start
+                # next time so the file stays the single source of truth.
+                self._needs_reload = True
+                return
+
+            if self._needs_compaction():
+                self.compact()
+
+    def _count_records(self, records: List[Dict[str, Any]]) -> None:
+        for record in records:
+            self._total_records += 1
+            if record.get("op") == "truncate":
+                self._live_records = 0
+            else:
+                self._live_records += 1
+
+    def _needs_compaction(self) -> bool:
+        dead = self._total_records - self._live_records
+        return dead >= self.compact_min_dead_records and dead > self._live_records
+
+    def _read_legacy_json(self, data: bytes) -> List[Message]:
+        """Convert a pre-JSONL context file (a single JSON array) in place."""
+        try:
+            raw = json.loads(data.decode("utf-8"))
+        except (UnicodeDecodeError, json.JSONDecodeError):
+            raw = []
+        entries = raw if isinstance(raw, list) else []
+        messages = [message for message in (_as_message(entry) for entry in entries) if message]
+        self._rewrite(messages)
+        return messages
+
+
+def _encode(record: Dict[str, Any]) -> bytes:
+    return (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+def _parse_line(raw_line: bytes) -> Optional[Dict[str, Any]]:
+    if not raw_line.strip():
+        return None
+    try:
+        record = json.loads(raw_line.decode("utf-8"))
+    except (UnicodeDecodeError, json.JSONDecodeError):
+        logger.warning("Skipping corrupt context log line.")
+        return None
+    return record if isinstance(record, dict) else None
+
+
+def _as_message(entry: Any) -> Optional[Message]:
+    if isinstance(entry, dict) and "role" in entry and "content" in entry:
+        return {"role": str(entry["role"]), "content": str(entry["content"])}
+    return None
@@ -0,0 +1,340 @@
+import calendar
+import contextvars
+import email.utils
+import functools
+import hashlib
+import http.client
+import json
+import logging
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Mapping, Optional, Tuple
+
+from services.cache import CacheStats
+from services.metrics import HTTP_CACHE_EVENTS
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+# Headers a 304 must not overwrite on the stored response (RFC 9111, section 3.2).
+_PRESERVED_ON_REFRESH = {"content-encoding", "content-length", "content-range", "transfer-encoding"}
+
+_POLICY: "contextvars.ContextVar[Optional[Dict[str, Any]]]" = contextvars.ContextVar(
+    "pipegent_http_cache_policy", default=None
+)
+
+
+@contextmanager
+def http_cache_scope(policy: Optional[Dict[str, Any]]) -> Iterator[None]:
+    """GET requests made through the shared transport inside this block may use the cache."""
+    token = _POLICY.set(policy)
+    try:
+        yield
+    finally:
+        _POLICY.reset(token)
+
+
+def active_http_cache_policy() -> Optional[Dict[str, Any]]:
+    return _POLICY.get()
+
+
+class HttpCacheScopedTool:
+    """Runs an in-process plugin inside ``http_cache_scope`` with its manifest policy."""
+
+    def __init__(self, func: Callable[..., Any], policy: Dict[str, Any]) -> None:
+        self.func = func
+        self.policy = policy
+        # updated=() keeps the wrapped object's attributes (e.g. a LazyTool's state) off this wrapper.
+        functools.update_wrapper(self, func, updated=())
+
+    def __call__(self, **kwargs: Any) -> Any:
+        with http_cache_scope(self.policy):
+            return self.func(**kwargs)
+
+
+@dataclass
+class CachedEntry:
+    url: str
+    final_url: str
+    status: int
+    reason: str
+    headers: List[Tuple[str, str]]
+    body: bytes
+    complete: bool
+    expires_at: float
+    vary: Dict[str, str] = field(default_factory=dict)
+
+    def message(self) -> http.client.HTTPMessage:
+        message = http.client.HTTPMessage()
+        for name, value in self.headers:
+            message[name] = value
+        return message
+
+    def header(self, name: str) -> Optional[str]:
+        name = name.lower()
+        for key, value in self.headers:
+            if key.lower() == name:
+                return value
+        return None
+
+    def is_fresh(self, now: Optional[float] = None) -> bool:
+        return (now if now is not None else time.time()) < self.expires_at
+
+    def covers(self, max_bytes: Optional[int]) -> bool:
+        """Whether a caller reading at most ``max_bytes`` (None = all) can be served from this entry."""
+        return self.complete or (max_bytes is not None and max_bytes < len(self.body))
+
+    def validators(self) -> Dict[str, str]:
+        validators: Dict[str, str] = {}
+        etag = self.header("ETag")
+        if etag:
+            validators["If-None-Match"] = etag
+        last_modified = self.header("Last-Modified")
+        if last_modified:
+            validators["If-Modified-Since"] = last_modified
+        return validators
+
+
+class HttpCache:
+    """Private on-disk HTTP cache for GET responses, stored in SQLite.
+
+    Responses are fresh for their ``Cache-Control: max-age`` (or ``Expires``) and are
+    revalidated with ``If-None-Match``/``If-Modified-Since`` afterwards; a 304 refreshes
+    the stored entry without transferring the body again. ``no-store`` responses and
+    ``Vary: *`` are never stored, other ``Vary`` headers are matched on lookup, and the
+    least recently used entries are evicted once the bodies exceed ``max_bytes``.
+    Several processes (e.g. sandbox workers) may share one file.
+    """
+
+    def __init__(self, path: Path, max_bytes: int = DEFAULT_MAX_BYTES, max_entry_bytes: Optional[int] = None) -> None:
+        self.path = path
+        self.max_bytes = max(1, max_bytes)
+        self.max_entry_bytes = max_entry_bytes if max_entry_bytes is not None else max(1, self.max_bytes // 4)
+        self.stats = CacheStats()
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+        with self._lock, self._conn:
+            # Readers in other processes do not block on a writer.
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS http_cache ("
+                " url TEXT PRIMARY KEY,"
+                " final_url TEXT NOT NULL,"
+                " status INTEGER NOT NULL,"
+                " reason TEXT NOT NULL,"
+                " headers TEXT NOT NULL,"
+                " vary TEXT NOT NULL,"
+                " body BLOB NOT NULL,"
+                " complete INTEGER NOT NULL,"
+                " size INTEGER NOT NULL,"
+                " expires_at REAL NOT NULL,"
+                " accessed_at REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS http_cache_lru ON http_cache (accessed_at)")
+
+    def lookup(self, url: str, request_headers: Mapping[str, str]) -> Optional[CachedEntry]:
+        """The stored response for ``url`` if its ``Vary`` headers match this request."""
+        try:
+            with self._lock, self._conn:
+                row = self._conn.execute(
+                    "SELECT final_url, status, reason, headers, vary, body, complete, expires_at"
+                    " FROM http_cache WHERE url = ?",
+                    (url,),
+                ).fetchone()
+                if row is not None:
+                    self._conn.execute("UPDATE http_cache SET accessed_at = ? WHERE url = ?", (time.time(), url))
+        except sqlite3.Error as exc:
+            logger.warning("HTTP cache read from %s failed: %s", self.path, exc)
+            row = None
+
+        if row is None:
+            return None
+        final_url, status, reason, headers, vary, body, complete, expires_at = row
+        entry = CachedEntry(
+            url,
+            final_url,
+            status,
+            reason,
+            [(name, value) for name, value in json.loads(headers)],
+            bytes(body),
+            bool(complete),
+            expires_at,
+            json.loads(vary),
+        )
+        if entry.vary != _vary_values(entry.vary, request_headers):
+            return None
+        return entry
+
+    def store(
+        self,
+        url: str,
+        request_headers: Mapping[str, str],
+        status: int,
+        reason: str,
+        headers: http.client.HTTPMessage,
+        body: bytes,
+        final_url: str,
+        complete: bool,
+        policy: Dict[str, Any],
+    ) -> bool:
+        """Store (or replace) the response for ``url``; returns False if it may not be cached."""
+        if not is_storable(status, headers, policy) or len(body) > self.max_entry_bytes:
+            self.forget(url)
+            return False
+        vary_names = [name.strip().lower() for name in ",".join(headers.get_all("Vary") or []).split(",") if name.strip()]
+        entry = CachedEntry(
+            url,
+            final_url,
+            status,
+            reason,
+            list(headers.items()),
+            body,
+            complete,
+            _expires_at(headers, policy),
+            _vary_values(dict.fromkeys(vary_names, ""), request_headers),
+        )
+        self._write(entry)
+        HTTP_CACHE_EVENTS.inc(event="store")
+        return True
+
+    def refresh(self, entry: CachedEntry, headers: http.client.HTTPMessage, policy: Dict[str, Any]) -> CachedEntry:
+        """Apply a 304's headers to a stored entry and restart its freshness lifetime."""
+        updated = {name.lower() for name in headers.keys()} - _PRESERVED_ON_REFRESH
+        merged = [(name, value) for name, value in entry.headers if name.lower() not in updated]
+        merged.extend((name, value) for name, value in headers.items() if name.lower() in updated)
+        entry.headers = merged
+        entry.expires_at = _expires_at(entry.message(), policy)
+        self._write(entry)
+        return entry
+
+    def forget(self, url: str) -> None:
+        try:
+            with self._lock, self._conn:
+                self._conn.execute("DELETE FROM http_cache WHERE url = ?", (url,))
+        except sqlite3.Error as exc:
+            logger.warning("HTTP cache invalidation in %s failed: %s", self.path, exc)
+
+    def clear(self) -> None:
+        try:
+            with self._lock, self._conn:
+                self._conn.execute("DELETE FROM http_cache")
+        except sqlite3.Error as exc:
+            logger.warning("HTTP cache invalidation in %s failed: %s", self.path, exc)
+
+    def size(self) -> int:
+        with self._lock:
+            return int(self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM http_cache").fetchone()[0])
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def _write(self, entry: CachedEntry) -> None:
+        now = time.time()
+        try:
+            with self._lock, self._conn:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO http_cache"
+                    " (url, final_url, status, reason, headers, vary, body, complete, size, expires_at, accessed_at)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        entry.url,
+                        entry.final_url,
+                        entry.status,
+                        entry.reason,
+                        json.dumps(entry.headers, ensure_ascii=False),
+                        json.dumps(entry.vary, sort_keys=True),
+                        sqlite3.Binary(entry.body),
+                        int(entry.complete),
+                        len(entry.body),
+                        entry.expires_at,
+                        now,
+                    ),
+                )
+                self._evict()
+        except sqlite3.Error as exc:
+            logger.warning("HTTP cache write to %s failed: %s", self.path, exc)
+
+    def _evict(self) -> None:
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM http_cache").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        victims: List[str] = []
+        for url, size in self._conn.execute("SELECT url, size FROM http_cache ORDER BY accessed_at"):
+            if total <= self.max_bytes:
+                break
+            victims.append(url)
+            total -= size
+        self._conn.executemany("DELETE FROM http_cache WHERE url = ?", [(url,) for url in victims])
+        self.stats.evictions += len(victims)
+        HTTP_CACHE_EVENTS.inc(len(victims), event="evict")
+
+
+def cache_directives(value: Optional[str]) -> Dict[str, Optional[str]]:
+    """Parse a ``Cache-Control`` value into lower-cased directives."""
+    directives: Dict[str, Optional[str]] = {}
+    for part in (value or "").split(","):
+        name, _, argument = part.strip().partition("=")
+        if name:
+            directives[name.strip().lower()] = argument.strip().strip('"') if argument else None
+    return directives
+
+
+def is_storable(status: int, headers: http.client.HTTPMessage, policy: Dict[str, Any]) -> bool:
+    if status != 200:
+        return False
+    if "no-store" in cache_directives(", ".join(headers.get_all("Cache-Control") or [])):
+        return False
+    if (headers.get("Vary") or "").strip() == "*":
+        return False
+    # Without validators an entry is only useful while it is fresh.
+    return bool(headers.get("ETag") or headers.get("Last-Modified")) or _freshness_lifetime(headers, policy) > 0
+
+
+def _freshness_lifetime(headers: http.client.HTTPMessage, policy: Dict[str, Any]) -> float:
+    directives = cache_directives(", ".join(headers.get_all("Cache-Control") or []))
+    if "no-cache" in directives:
+        return 0.0
+    max_age = directives.get("max-age")
+    if max_age is not None:
+        try:
+            return max(0.0, float(int(max_age)))
+        except ValueError:
+            return 0.0
+    if headers.get("Expires") is not None:
+        expires = _http_date(headers.get("Expires"))
+        if expires is None:
+            # An invalid Expires means "already expired".
+            return 0.0
+        return max(0.0, expires - (_http_date(headers.get("Date")) or time.time()))
+    return float(policy.get("default_max_age_seconds") or 0.0)
+
+
+def _expires_at(headers: http.client.HTTPMessage, policy: Dict[str, Any]) -> float:
+    try:
+        age = max(0, int(headers.get("Age") or 0))
+    except ValueError:
+        age = 0
+    return time.time() + _freshness_lifetime(headers, policy) - age
+
+
+def _http_date(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    parsed = email.utils.parsedate(value)
+    return float(calendar.timegm(parsed)) if parsed else None
+
+
+def _vary_values(names: Mapping[str, str], request_headers: Mapping[str, str]) -> Dict[str, str]:
+    lowered = {name.lower(): value for name, value in request_headers.items()}
+    # Bodies are stored decoded, so Accept-Encoding never selects a different entry.
+    return {
+        name: hashlib.sha256(lowered.get(name, "").encode("utf-8")).hexdigest()
+        for name in names
+        if name != "accept-encoding"
+    }
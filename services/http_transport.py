@@ -0,0 +1,642 @@
+import http.client
+import logging
+import os
+import socket
+import ssl
+import threading
+import time
+import urllib.parse
+import urllib.request
+import zlib
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Mapping, Optional, Tuple
+
+from services.cache import LRUCache
+from services.http_cache import (
+    DEFAULT_MAX_BYTES,
+    CachedEntry,
+    HttpCache,
+    active_http_cache_policy,
+    cache_directives,
+    is_storable,
+)
+from services.metrics import HTTP_CACHE_EVENTS, HTTP_CONNECTIONS
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TIMEOUT = 20.0
+CHUNK_SIZE = 64 * 1024
+# Cap on the bytes inflated from one compressed chunk, so a tiny gzip bomb cannot
+# expand into gigabytes before a caller's max_bytes check gets a chance to stop it.
+_MAX_INFLATE = 1024 * 1024
+# An unread remainder up to this size is drained so the connection can be reused.
+_MAX_DRAIN = 64 * 1024
+_REDIRECT_CODES = {301, 302, 303, 307, 308}
+# Errors that mean an idle keep-alive connection was closed by the server.
+_STALE_ERRORS = (ConnectionResetError, BrokenPipeError, http.client.BadStatusLine)
+
+PoolKey = Tuple[str, str, int, Optional[str]]
+
+
+class HttpTransportError(ConnectionError):
+    pass
+
+
+@dataclass
+class TransportStats:
+    requests: int = 0
+    connections_opened: int = 0
+    connections_reused: int = 0
+    dns_hits: int = 0
+    dns_misses: int = 0
+
+
+@dataclass
+class HttpResult:
+    """A fully read response; ``body`` is already gzip/deflate decoded."""
+
+    status: int
+    reason: str
+    headers: http.client.HTTPMessage
+    body: bytes
+    url: str
+    truncated: bool = False
+    from_cache: bool = False
+
+    @property
+    def charset(self) -> Optional[str]:
+        return self.headers.get_content_charset()
+
+    def text(self, default_charset: str = "utf-8") -> str:
+        return self.body.decode(self.charset or default_charset, errors="replace")
+
+
+class DnsCache:
+    """Bounded, TTL-limited cache of getaddrinfo results used when opening connections."""
+
+    def __init__(self, max_entries: int = 256, ttl_seconds: float = 300.0, stats: Optional[TransportStats] = None) -> None:
+        self._entries = LRUCache(max_entries=max_entries, ttl_seconds=ttl_seconds)
+        self.stats = stats or TransportStats()
+
+    def resolve(self, host: str, port: int) -> List[Tuple[Any, ...]]:
+        key = f"{host}:{port}"
+        infos = self._entries.get(key)
+        if infos is not None:
+            self.stats.dns_hits += 1
+            HTTP_CONNECTIONS.inc(event="dns_hit")
+            return infos
+        self.stats.dns_misses += 1
+        HTTP_CONNECTIONS.inc(event="dns_miss")
+        infos = socket.getaddrinfo(host, port, 0, socket.SOCK_STREAM)
+        self._entries.set(key, infos)
+        return infos
+
+    def forget(self, host: str, port: int) -> None:
+        self._entries.invalidate(f"{host}:{port}")
+
+    def create_connection(
+        self, address: Tuple[str, int], timeout: Any = None, source_address: Optional[Tuple[str, int]] = None
+    ) -> socket.socket:
+        """Drop-in for ``socket.create_connection`` that resolves through the cache."""
+        host, port = address
+        error: Optional[OSError] = None
+        for family, socktype, proto, _, sockaddr in self.resolve(host, port):
+            sock = socket.socket(family, socktype, proto)
+            try:
+                if isinstance(timeout, (int, float)):
+                    sock.settimeout(timeout)
+                if source_address:
+                    sock.bind(source_address)
+                sock.connect(sockaddr)
+                # Kept-alive connections must not wait on Nagle for the tail of a request.
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                return sock
+            except OSError as exc:
+                error = exc
+                sock.close()
+        # The host may have moved; resolve again next time.
+        self.forget(host, port)
+        raise error or OSError(f"getaddrinfo returned no addresses for {host}")
+
+
+class _Decoder:
+    def __init__(self, content_encoding: str) -> None:
+        encoding = content_encoding.strip().lower()
+        self.encoding = encoding
+        if encoding in {"gzip", "x-gzip"}:
+            self._inflater: Optional[Any] = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        elif encoding == "deflate":
+            self._inflater = zlib.decompressobj()
+        else:
+            self._inflater = None
+        self._started = False
+
+    def decode(self, data: bytes) -> Iterator[bytes]:
+        if self._inflater is None:
+            yield data
+            return
+        try:
+            chunk = self._inflater.decompress(data, _MAX_INFLATE)
+        except zlib.error:
+            if self.encoding != "deflate" or self._started:
+                raise
+            # Some servers send raw deflate streams without the zlib header.
+            self._inflater = zlib.decompressobj(-zlib.MAX_WBITS)
+            chunk = self._inflater.decompress(data, _MAX_INFLATE)
+        self._started = True
+        yield chunk
+        while self._inflater.unconsumed_tail:
+            yield self._inflater.decompress(self._inflater.unconsumed_tail, _MAX_INFLATE)
+
+    def flush(self) -> bytes:
+        return self._inflater.flush() if self._inflater is not None else b""
+
+
+class HttpResponse:
+    """A streamed response on a pooled connection; close it (or use ``with``) when done.
+
+    ``read`` and ``iter_chunks`` return decoded bytes. Fully consumed responses hand
+    their connection back to the pool; abandoned ones close it.
+    """
+
+    def __init__(
+        self,
+        transport: "HttpTransport",
+        key: PoolKey,
+        conn: http.client.HTTPConnection,
+        raw: http.client.HTTPResponse,
+        url: str,
+    ) -> None:
+        self.status = raw.status
+        self.reason = raw.reason
+        self.headers = raw.headers
+        self.url = url
+        self._transport = transport
+        self._key = key
+        self._conn: Optional[http.client.HTTPConnection] = conn
+        self._raw = raw
+        self._decoder = _Decoder(raw.headers.get("Content-Encoding", ""))
+        self._chunks = self._decoded_chunks()
+        self._buffer = b""
+        self.eof = False
+        self.from_cache = False
+        self._record: Optional[List[bytes]] = None
+        self._record_size = 0
+        self._record_limit = 0
+        self._on_recorded: Optional[Callable[[bytes, bool], None]] = None
+
+    @property
+    def charset(self) -> Optional[str]:
+        return self.headers.get_content_charset()
+
+    def read(self, amount: Optional[int] = None) -> bytes:
+        """Up to ``amount`` decoded bytes (everything when None); b"" at the end of the body."""
+        if amount is None:
+            data, self._buffer = self._buffer + b"".join(self._chunks), b""
+            return data
+        parts, size = [self._buffer], len(self._buffer)
+        while size < amount:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                break
+            parts.append(chunk)
+            size += len(chunk)
+        data = b"".join(parts)
+        self._buffer = data[amount:]
+        return data[:amount]
+
+    def iter_chunks(self) -> Iterator[bytes]:
+        """Decoded chunks as they arrive from the socket."""
+        if self._buffer:
+            data, self._buffer = self._buffer, b""
+            yield data
+        yield from self._chunks
+
+    def close(self) -> None:
+        conn, self._conn = self._conn, None
+        if conn is None:
+            return
+        if self._record is not None and self._on_recorded is not None:
+            record, self._record = self._record, None
+            self._on_recorded(b"".join(record), self.eof)
+        reusable = not self._raw.will_close
+        if reusable and not self._raw.isclosed():
+            remaining = self._raw.length
+            if remaining is not None and remaining <= _MAX_DRAIN:
+                try:
+                    self._raw.read()
+                except (OSError, http.client.HTTPException):
+                    reusable = False
+            else:
+                reusable = False
+        self._transport._release(self._key, conn, reusable and self._raw.isclosed())
+
+    def __enter__(self) -> "HttpResponse":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    def _record_body(self, limit: int, on_recorded: Callable[[bytes, bool], None]) -> None:
+        """Keep the decoded bytes read from now on (up to ``limit``) and pass them to ``on_recorded`` on close."""
+        self._record, self._record_limit, self._on_recorded = [], limit, on_recorded
+
+    def _keep(self, chunk: bytes) -> bytes:
+        if self._record is not None:
+            self._record_size += len(chunk)
+            if self._record_size > self._record_limit:
+                self._record = None
+            else:
+                self._record.append(chunk)
+        return chunk
+
+    def _decoded_chunks(self) -> Iterator[bytes]:
+        try:
+            while True:
+                data = self._raw.read1(CHUNK_SIZE)
+                if not data:
+                    break
+                for chunk in self._decoder.decode(data):
+                    if chunk:
+                        yield self._keep(chunk)
+            tail = self._decoder.flush()
+            if tail:
+                yield self._keep(tail)
+        except zlib.error as exc:
+            raise HttpTransportError(f"Could not decode {self._decoder.encoding} body from {self.url}: {exc}") from exc
+        except (OSError, http.client.HTTPException) as exc:
+            raise HttpTransportError(f"Connection to {self.url} failed while reading: {exc}") from exc
+        self.eof = True
+
+
+class CachedResponse(HttpResponse):
+    """A response served from the HttpCache (still fresh, or just revalidated with a 304).
+
+    When only part of the body was stored and the reader wants more, ``resume`` fetches
+    the body again and the response continues after the stored bytes.
+    """
+
+    def __init__(self, entry: CachedEntry, resume: Optional[Callable[[], HttpResponse]] = None) -> None:
+        # No connection behind this one, so none of HttpResponse's socket state applies.
+        self.status = entry.status
+        self.reason = entry.reason
+        self.headers = entry.message()
+        self.url = entry.final_url
+        self.eof = False
+        self.from_cache = True
+        self._conn = None
+        self._record = None
+        self._buffer = b""
+        self._resume = resume
+        self._resumed: Optional[HttpResponse] = None
+        self._chunks = self._stored_chunks(entry)
+
+    def close(self) -> None:
+        resumed, self._resumed = self._resumed, None
+        if resumed is not None:
+            resumed.close()
+
+    def _stored_chunks(self, entry: CachedEntry) -> Iterator[bytes]:
+        for start in range(0, len(entry.body), CHUNK_SIZE):
+            yield entry.body[start : start + CHUNK_SIZE]
+        if entry.complete or self._resume is None:
+            # A partially stored body must not look complete to the reader.
+            self.eof = entry.complete
+            return
+
+        resumed = self._resumed = self._resume()
+        for name in ("ETag", "Last-Modified"):
+            stored = entry.header(name)
+            if stored and resumed.headers.get(name) not in (None, stored):
+                raise HttpTransportError(f"{self.url} changed while its cached copy was being read")
+        skip = len(entry.body)
+        for chunk in resumed.iter_chunks():
+            if skip >= len(chunk):
+                skip -= len(chunk)
+                continue
+            yield chunk[skip:]
+            skip = 0
+        self.eof = resumed.eof
+
+
+class _HostPool:
+    def __init__(self, max_connections: int) -> None:
+        self.slots = threading.BoundedSemaphore(max_connections)
+        self.idle: List[Tuple[http.client.HTTPConnection, float]] = []
+        self.lock = threading.Lock()
+
+
+class HttpTransport:
+    """Keep-alive HTTP(S) client shared by the network plugins.
+
+    Connections are pooled per scheme/host/port (at most ``max_connections_per_host``
+    open at once, idle ones closed after ``idle_timeout_seconds``), host names are
+    resolved through a bounded ``DnsCache``, gzip/deflate bodies are decoded on the
+    fly, redirects are followed the way ``urllib`` follows them, and the standard
+    ``*_proxy`` environment variables are honoured.
+
+    With a ``cache_path``, GET requests made inside ``http_cache_scope`` (i.e. by
+    plugins whose manifest opts into ``http_cache``) go through an on-disk HttpCache.
+    """
+
+    def __init__(
+        self,
+        max_connections_per_host: int = 8,
+        idle_timeout_seconds: float = 60.0,
+        dns_cache_size: int = 256,
+        dns_ttl_seconds: float = 300.0,
+        max_redirects: int = 5,
+        cache_path: Optional[Path] = None,
+        cache_max_bytes: int = DEFAULT_MAX_BYTES,
+    ) -> None:
+        self.max_connections_per_host = max(1, max_connections_per_host)
+        self.idle_timeout_seconds = idle_timeout_seconds
+        self.max_redirects = max(0, max_redirects)
+        self.stats = TransportStats()
+        self.dns = DnsCache(dns_cache_size, dns_ttl_seconds, self.stats)
+        self._pools: Dict[PoolKey, _HostPool] = {}
+        self._lock = threading.Lock()
+        self._ssl_context = ssl.create_default_context()
+        self._proxies = urllib.request.getproxies()
+        self.cache = HttpCache(Path(cache_path), cache_max_bytes) if cache_path else None
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        headers: Optional[Dict[str, str]] = None,
+        body: Optional[bytes] = None,
+        timeout: float = DEFAULT_TIMEOUT,
+    ) -> HttpResponse:
+        """Send a request and return the streamed response (following redirects)."""
+        return self._open(method, url, headers, body, timeout)
+
+    def fetch(
+        self,
+        method: str,
+        url: str,
+        headers: Optional[Dict[str, str]] = None,
+        body: Optional[bytes] = None,
+        timeout: float = DEFAULT_TIMEOUT,
+        max_bytes: Optional[int] = None,
+    ) -> HttpResult:
+        """Like ``request`` but reads the (decoded) body, at most ``max_bytes`` of it."""
+        with self._open(method, url, headers, body, timeout, max_bytes) as response:
+            if max_bytes is None:
+                data, truncated = response.read(), False
+            else:
+                data = response.read(max_bytes + 1)
+                truncated = len(data) > max_bytes
+                data = data[:max_bytes]
+            return HttpResult(
+                response.status, response.reason, response.headers, data, response.url, truncated, response.from_cache
+            )
+
+    def close(self) -> None:
+        with self._lock:
+            pools, self._pools = self._pools, {}
+        for pool in pools.values():
+            with pool.lock:
+                idle, pool.idle = pool.idle, []
+            for conn, _ in idle:
+                conn.close()
+        if self.cache is not None:
+            self.cache.close()
+
+    def _open(
+        self,
+        method: str,
+        url: str,
+        headers: Optional[Dict[str, str]],
+        body: Optional[bytes],
+        timeout: float,
+        max_bytes: Optional[int] = None,
+    ) -> HttpResponse:
+        method = method.upper()
+        headers = dict(headers or {})
+        if _header(headers, "Accept-Encoding") is None:
+            headers["Accept-Encoding"] = "gzip, deflate"
+        policy = active_http_cache_policy() if method == "GET" and body is None else None
+        if self.cache is None or policy is None:
+            return self._follow(method, url, headers, body, timeout)
+        return self._cached(self.cache, url, headers, timeout, max_bytes, policy)
+
+    def _cached(
+        self,
+        cache: HttpCache,
+        url: str,
+        headers: Dict[str, str],
+        timeout: float,
+        max_bytes: Optional[int],
+        policy: Dict[str, Any],
+    ) -> HttpResponse:
+        directives = cache_directives(_header(headers, "Cache-Control"))
+        if "no-store" in directives:
+            return self._follow("GET", url, headers, None, timeout)
+
+        def fetch_and_store() -> HttpResponse:
+            response = self._follow("GET", url, headers, None, timeout)
+            self._store_on_close(cache, url, headers, response, policy)
+            return response
+
+        entry = cache.lookup(url, headers)
+        conditional = headers
+        # Streaming readers (max_bytes None) may stop early; if not, a partial body is resumed.
+        if entry is not None and (max_bytes is None or entry.covers(max_bytes)):
+            if entry.is_fresh() and "no-cache" not in directives:
+                cache.stats.hits += 1
+                HTTP_CACHE_EVENTS.inc(event="hit")
+                return CachedResponse(entry, fetch_and_store)
+            cache.stats.expirations += 1
+            conditional = dict(headers)
+            for name, value in entry.validators().items():
+                if _header(headers, name) is None:
+                    conditional[name] = value
+        else:
+            entry = None
+
+        response = self._follow("GET", url, conditional, None, timeout)
+        if entry is not None and response.status == 304:
+            response.close()
+            cache.stats.hits += 1
+            HTTP_CACHE_EVENTS.inc(event="revalidated")
+            return CachedResponse(cache.refresh(entry, response.headers, policy), fetch_and_store)
+
+        cache.stats.misses += 1
+        HTTP_CACHE_EVENTS.inc(event="miss")
+        if not self._store_on_close(cache, url, headers, response, policy) and entry is not None:
+            cache.forget(url)
+        return response
+
+    @staticmethod
+    def _store_on_close(
+        cache: HttpCache, url: str, headers: Dict[str, str], response: HttpResponse, policy: Dict[str, Any]
+    ) -> bool:
+        if not is_storable(response.status, response.headers, policy):
+            return False
+
+        def store(data: bytes, complete: bool) -> None:
+            cache.store(
+                url, headers, response.status, response.reason, response.headers, data, response.url, complete, policy
+            )
+
+        response._record_body(cache.max_entry_bytes, store)
+        return True
+
+    def _follow(
+        self, method: str, url: str, headers: Dict[str, str], body: Optional[bytes], timeout: float
+    ) -> HttpResponse:
+        for _ in range(self.max_redirects + 1):
+            response = self._send(method, url, headers, body, timeout)
+            location = response.headers.get("Location")
+            if response.status not in _REDIRECT_CODES or not location:
+                return response
+            if response.status in {307, 308} and method not in {"GET", "HEAD"}:
+                return response
+            response.close()
+            url = urllib.parse.urljoin(url, location)
+            if response.status in {301, 302, 303} and method not in {"GET", "HEAD"}:
+                method, body = "GET", None
+                headers = {
+                    name: value for name, value in headers.items() if name.lower() not in {"content-type", "content-length"}
+                }
+        raise HttpTransportError(f"Too many redirects (more than {self.max_redirects}) for {url}")
+
+    def _send(
+        self, method: str, url: str, headers: Dict[str, str], body: Optional[bytes], timeout: float
+    ) -> HttpResponse:
+        parts = urllib.parse.urlsplit(url)
+        if parts.scheme not in {"http", "https"} or not parts.hostname:
+            raise HttpTransportError(f"Unsupported URL: {url}")
+        port = parts.port or (443 if parts.scheme == "https" else 80)
+        proxy = self._proxy_for(parts.scheme, parts.hostname)
+        key: PoolKey = (parts.scheme, parts.hostname.lower(), port, proxy)
+        # Plain HTTP through a proxy sends the absolute URL; everything else sends the path.
+        target = url if proxy and parts.scheme == "http" else urllib.parse.urlunsplit(("", "", parts.path or "/", parts.query, ""))
+        self.stats.requests += 1
+
+        pool = self._pool(key)
+        if not pool.slots.acquire(timeout=timeout):
+            raise HttpTransportError(f"No free connection to {parts.hostname} within {timeout:g} seconds")
+        conn, reused = self._checkout(key, pool, timeout)
+        try:
+            try:
+                raw = self._exchange(conn, method, target, headers, body, timeout)
+            except _STALE_ERRORS:
+                if not reused:
+                    raise
+                # The server closed the idle connection; retry once on a fresh one.
+                conn.close()
+                conn = self._new_connection(key, timeout)
+                raw = self._exchange(conn, method, target, headers, body, timeout)
+        except (OSError, http.client.HTTPException) as exc:
+            conn.close()
+            pool.slots.release()
+            raise HttpTransportError(f"Request to {url} failed: {exc}") from exc
+        return HttpResponse(self, key, conn, raw, url)
+
+    @staticmethod
+    def _exchange(
+        conn: http.client.HTTPConnection,
+        method: str,
+        target: str,
+        headers: Dict[str, str],
+        body: Optional[bytes],
+        timeout: float,
+    ) -> http.client.HTTPResponse:
+        conn.timeout = timeout
+        if conn.sock is not None:
+            conn.sock.settimeout(timeout)
+        conn.request(method, target, body=body, headers=headers)
+        return conn.getresponse()
+
+    def _pool(self, key: PoolKey) -> _HostPool:
+        with self._lock:
+            pool = self._pools.get(key)
+            if pool is None:
+                pool = self._pools[key] = _HostPool(self.max_connections_per_host)
+            return pool
+
+    def _checkout(self, key: PoolKey, pool: _HostPool, timeout: float) -> Tuple[http.client.HTTPConnection, bool]:
+        now = time.monotonic()
+        with pool.lock:
+            while pool.idle:
+                conn, idle_since = pool.idle.pop()
+                if now - idle_since <= self.idle_timeout_seconds:
+                    self.stats.connections_reused += 1
+                    HTTP_CONNECTIONS.inc(event="reused")
+                    return conn, True
+                conn.close()
+        return self._new_connection(key, timeout), False
+
+    def _new_connection(self, key: PoolKey, timeout: float) -> http.client.HTTPConnection:
+        scheme, host, port, proxy = key
+        if proxy:
+            proxy_parts = urllib.parse.urlsplit(proxy if "://" in proxy else f"http://{proxy}")
+            connect_host, connect_port = proxy_parts.hostname or "", proxy_parts.port or 80
+        else:
+            connect_host, connect_port = host, port
+        if scheme == "https":
+            conn: http.client.HTTPConnection = http.client.HTTPSConnection(
+                connect_host, connect_port, timeout=timeout, context=self._ssl_context
+            )
+            if proxy:
+                conn.set_tunnel(host, port)
+        else:
+            conn = http.client.HTTPConnection(connect_host, connect_port, timeout=timeout)
+        # http.client opens its socket through this attribute; route it via the DNS cache.
+        conn._create_connection = self.dns.create_connection  # type: ignore[attr-defined]
+        self.stats.connections_opened += 1
+        HTTP_CONNECTIONS.inc(event="opened")
+        return conn
+
+    def _release(self, key: PoolKey, conn: http.client.HTTPConnection, reusable: bool) -> None:
+        pool = self._pool(key)
+        if reusable:
+            with pool.lock:
+                pool.idle.append((conn, time.monotonic()))
+        else:
+            conn.close()
+        pool.slots.release()
+
+    def _proxy_for(self, scheme: str, host: str) -> Optional[str]:
+        proxy = self._proxies.get(scheme)
+        if not proxy or urllib.request.proxy_bypass(host):
+            return None
+        return proxy
+
+
+def _header(headers: Mapping[str, str], name: str) -> Optional[str]:
+    name = name.lower()
+    for key, value in headers.items():
+        if key.lower() == name:
+            return value
+    return None
+
+
+_OPTIONS: Dict[str, Any] = {}
+_TRANSPORT: Optional[HttpTransport] = None
+_TRANSPORT_PID: Optional[int] = None
+_TRANSPORT_LOCK = threading.Lock()
+
+
+def configure_transport(**options: Any) -> None:
+    """Set the options of the process-wide transport (HttpTransport keyword arguments)."""
+    global _TRANSPORT
+    with _TRANSPORT_LOCK:
+        _OPTIONS.clear()
+        _OPTIONS.update(options)
+        previous, _TRANSPORT = _TRANSPORT, None
+    if previous is not None:
+        previous.close()
+
+
+def get_transport() -> HttpTransport:
+    """The transport shared by every plugin in this process (a fresh one after a fork)."""
+    global _TRANSPORT, _TRANSPORT_PID
+    with _TRANSPORT_LOCK:
+        if _TRANSPORT is None or _TRANSPORT_PID != os.getpid():
+            _TRANSPORT = HttpTransport(**_OPTIONS)
+            _TRANSPORT_PID = os.getpid()
+        return _TRANSPORT
@@ -0,0 +1,137 @@
+import copy
+import functools
+import json
+import logging
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from services.cache import CacheStats, LRUCache
+from services.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+_IMMUTABLE_TYPES = (str, bytes, int, float, bool, type(None), tuple, frozenset)
+_MISSING = object()
+
+_MEMOIZED: Dict[str, "MemoizedTool"] = {}
+_MEMOIZED_LOCK = threading.Lock()
+
+
+class MemoizedTool:
+    """Bounded LRU memoization around a pure plugin function.
+
+    Keys are the JSON-encoded keyword arguments; arguments listed in ``file_args`` also
+    contribute the file's size and modification time, so an unchanged file is served
+    from the cache and an edited one is recomputed. Exceptions are never cached and
+    calls whose arguments are not JSON serializable bypass the cache.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        func: Callable[..., Any],
+        max_entries: int = 256,
+        ttl_seconds: Optional[float] = None,
+        file_args: Sequence[str] = (),
+    ) -> None:
+        self.name = name
+        self.func = func
+        self.file_args = tuple(file_args)
+        self.cache = LRUCache(max_entries=max_entries, ttl_seconds=ttl_seconds)
+        # updated=() keeps the wrapped object's attributes (e.g. a LazyTool's state) off this wrapper.
+        functools.update_wrapper(self, func, updated=())
+
+    @property
+    def stats(self) -> CacheStats:
+        return self.cache.stats
+
+    def __call__(self, **kwargs: Any) -> Any:
+        key = self._key(kwargs)
+        if key is None:
+            return self.func(**kwargs)
+
+        cached = self.cache.get(key, _MISSING)
+        if cached is not _MISSING:
+            logger.debug("Memoized result for %s", self.name)
+            return _copy(cached)
+
+        result = self.func(**kwargs)
+        self.cache.set(key, result)
+        return _copy(result)
+
+    def invalidate(self) -> None:
+        self.cache.invalidate()
+
+    def _key(self, kwargs: Dict[str, Any]) -> Optional[str]:
+        fingerprints = {name: _file_fingerprint(kwargs.get(name)) for name in self.file_args}
+        try:
+            return json.dumps([kwargs, fingerprints], sort_keys=True, ensure_ascii=False)
+        except (TypeError, ValueError):
+            return None
+
+
+def memoize_tool(name: str, func: Callable[..., Any], cache_config: Dict[str, Any]) -> MemoizedTool:
+    tool = MemoizedTool(
+        name,
+        func,
+        max_entries=cache_config.get("max_entries", 256),
+        ttl_seconds=cache_config.get("ttl_seconds"),
+        file_args=cache_config.get("file_args", ()),
+    )
+    with _MEMOIZED_LOCK:
+        _MEMOIZED[name] = tool
+    return tool
+
+
+def forget_memoized_tool(name: str) -> None:
+    """Drop a tool's memoized results, e.g. when its plugin was reloaded or removed."""
+    with _MEMOIZED_LOCK:
+        tool = _MEMOIZED.pop(name, None)
+    if tool is not None:
+        tool.invalidate()
+
+
+def memoized_tools() -> Dict[str, MemoizedTool]:
+    with _MEMOIZED_LOCK:
+        return dict(_MEMOIZED)
+
+
+def _collect_stats() -> List[Tuple[Tuple[str, ...], float]]:
+    samples: List[Tuple[Tuple[str, ...], float]] = []
+    for name, tool in sorted(memoized_tools().items()):
+        stats = tool.stats
+        samples.extend(
+            [
+                ((name, "hits"), stats.hits),
+                ((name, "misses"), stats.misses),
+                ((name, "evictions"), stats.evictions),
+                ((name, "hit_ratio"), stats.hit_ratio),
+                ((name, "entries"), len(tool.cache)),
+            ]
+        )
+    return samples
+
+
+REGISTRY.gauge_callback(
+    "pipegent_cache_tools", "Result memoization statistics per pure plugin.", ("tool", "stat"), _collect_stats
+)
+
+
+def _file_fingerprint(value: Any) -> Optional[List[int]]:
+    if not isinstance(value, str) or not value.strip():
+        return None
+    path = Path(value).expanduser()
+    if not path.is_absolute():
+        path = PROJECT_ROOT / path
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def _copy(value: Any) -> Any:
+    # Callers may mutate dict/list results; never hand out the cached instance itself.
+    return value if isinstance(value, _IMMUTABLE_TYPES) else copy.deepcopy(value)
@@ -0,0 +1,337 @@
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [
+                {"labels": dict(zip(self.labelnames, key)), "value": value}
+                for key, value in sorted(self._values.items())
+            ]
+
+
+class Histogram:
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        # label values -> [bucket counts..., sum, count]
+        self._values: Dict[LabelValues, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            state = self._values.setdefault(key, [0.0] * (len(self.buckets) + 2))
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[index] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, state in sorted(self._values.items()):
+                for bound, count in zip(self.buckets, state):
+                    labels = _format_labels(self.labelnames, key, f'le="{_format_value(bound)}"')
+                    lines.append(f"{self.name}_bucket{labels} {_format_value(count)}")
+                labels = _format_labels(self.labelnames, key)
+                lines.append(f"{self.name}_sum{labels} {_format_value(state[-2])}")
+                lines.append(f"{self.name}_count{labels} {_format_value(state[-1])}")
+        return lines
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [
+                {
+                    "labels": dict(zip(self.labelnames, key)),
+                    "count": int(state[-1]),
+                    "sum": state[-2],
+                    "mean": state[-2] / state[-1] if state[-1] else 0.0,
+                    "buckets": {
+                        _format_value(bound): int(count) for bound, count in zip(self.buckets, state)
+                    },
+                }
+                for key, state in sorted(self._values.items())
+            ]
+
+
+# Collectors return (label values, value) pairs sampled at render time.
+GaugeCallback = Callable[[], List[Tuple[LabelValues, float]]]
+
+
+class MetricsRegistry:
+    def __init__(self) -> None:
+        self._metrics: Dict[str, Any] = {}
+        self._gauges: Dict[str, Tuple[str, Tuple[str, ...], GaugeCallback]] = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(name, lambda: Counter(name, documentation, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self._register(name, lambda: Histogram(name, documentation, labelnames, buckets))
+
+    def gauge_callback(
+        self, name: str, documentation: str, labelnames: Sequence[str], callback: GaugeCallback
+    ) -> None:
+        with self._lock:
+            self._gauges[name] = (documentation, tuple(labelnames), callback)
+
+    def render_prometheus(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+            gauges = list(self._gauges.items())
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        for name, (documentation, labelnames, callback) in gauges:
+            lines.append(f"# HELP {name} {documentation}")
+            lines.append(f"# TYPE {name} gauge")
+            for key, value in _sample(name, callback):
+                lines.append(f"{name}{_format_labels(labelnames, key)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            metrics = dict(self._metrics)
+            gauges = dict(self._gauges)
+        data: Dict[str, Any] = {name: metric.snapshot() for name, metric in metrics.items()}
+        for name, (_, labelnames, callback) in gauges.items():
+            data[name] = [
+                {"labels": dict(zip(labelnames, key)), "value": value}
+                for key, value in _sample(name, callback)
+            ]
+        data["timestamp"] = time.time()
+        return data
+
+    def _register(self, name: str, factory: Callable[[], Any]) -> Any:
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = factory()
+            return self._metrics[name]
+
+
+def _sample(name: str, callback: GaugeCallback) -> List[Tuple[LabelValues, float]]:
+    try:
+        return list(callback())
+    except Exception:
+        logger.exception("Metrics collector %s failed", name)
+        return []
+
+
+REGISTRY = MetricsRegistry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "pipegent_stage_duration_seconds",
+    "Wall-clock time spent per pipeline stage (planner, executor, summary, ...).",
+    ("stage",),
+)
+TOOL_SECONDS = REGISTRY.histogram(
+    "pipegent_tool_duration_seconds", "Wall-clock time spent inside each plugin.", ("tool",)
+)
+LLM_TOKENS = REGISTRY.counter(
+    "pipegent_llm_tokens_total", "Tokens reported by OpenAI responses.", ("stage", "kind")
+)
+ERRORS = REGISTRY.counter("pipegent_errors_total", "Errors raised per stage.", ("stage",))
+TOOL_ERRORS = REGISTRY.counter("pipegent_tool_errors_total", "Errors raised per plugin.", ("tool",))
+TOOL_QUEUE_SECONDS = REGISTRY.histogram(
+    "pipegent_tool_queue_wait_seconds",
+    "Time tool calls waited for a concurrency slot or rate-limit token.",
+    ("tool",),
+)
+HTTP_CONNECTIONS = REGISTRY.counter(
+    "pipegent_http_connections_total",
+    "Shared HTTP transport events: connections opened or reused, DNS cache hits and misses.",
+    ("event",),
+)
+HTTP_CACHE_EVENTS = REGISTRY.counter(
+    "pipegent_http_cache_total",
+    "HTTP cache lookups (fresh hit, revalidated, miss) plus stores and evictions.",
+    ("event",),
+)
+SANDBOX_EVENTS = REGISTRY.counter(
+    "pipegent_sandbox_events_total", "Sandbox worker spawns, timeouts, crashes, kills and recycles.", ("event",)
+)
+CONTEXT_TOKENS_SAVED = REGISTRY.counter(
+    "pipegent_context_tokens_saved_total", "Planner prompt tokens saved by context compaction."
+)
+
+
+@contextmanager
+def time_stage(stage: str) -> Iterator[None]:
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        ERRORS.inc(stage=stage)
+        raise
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - started, stage=stage)
+
+
+@contextmanager
+def time_tool(tool: str) -> Iterator[None]:
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        TOOL_ERRORS.inc(tool=tool)
+        raise
+    finally:
+        TOOL_SECONDS.observe(time.perf_counter() - started, tool=tool)
+
+
+def record_usage(stage: str, response: Any) -> None:
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        return
+    for kind in ("prompt_tokens", "completion_tokens"):
+        value = getattr(usage, kind, None)
+        if isinstance(value, (int, float)):
+            LLM_TOKENS.inc(value, stage=stage, kind=kind.replace("_tokens", ""))
+
+
+def register_cache(name: str, cache: Any) -> None:
+    """Expose a cache's hit/miss counters (anything with a ``stats`` CacheStats attribute)."""
+    def collect() -> List[Tuple[LabelValues, float]]:
+        stats = cache.stats
+        return [
+            ((name, "hits"), stats.hits),
+            ((name, "misses"), stats.misses),
+            ((name, "evictions"), stats.evictions),
+            ((name, "context_keyed"), stats.context_keyed),
+            ((name, "hit_ratio"), stats.hit_ratio),
+        ]
+
+    REGISTRY.gauge_callback(
+        f"pipegent_cache_{name}",
+        f"Statistics for the {name} cache.",
+        ("cache", "stat"),
+        collect,
+    )
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry: MetricsRegistry = REGISTRY
+
+    def do_GET(self) -> None:  # noqa: N802 - http.server API
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = self.registry.render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        logger.debug("metrics endpoint: " + format, *args)
+
+
+def start_metrics_server(
+    host: str = "127.0.0.1", port: int = 9464, registry: MetricsRegistry = REGISTRY
+) -> ThreadingHTTPServer:
+    handler = type("MetricsHandler", (_MetricsHandler,), {"registry": registry})
+    server = ThreadingHTTPServer((host, port), handler)
+    thread = threading.Thread(target=server.serve_forever, name="pipegent-metrics", daemon=True)
+    thread.start()
+    logger.info("Metrics endpoint listening on http://%s:%s/metrics", host, server.server_port)
+    return server
+
+
+def start_json_dump(
+    path: Path, interval: float = 60.0, registry: MetricsRegistry = REGISTRY
+) -> threading.Event:
+    """Periodically write a JSON snapshot to ``path``; set the returned event to stop."""
+    stop = threading.Event()
+
+    def run() -> None:
+        while not stop.wait(max(1.0, interval)):
+            dump_json(path, registry)
+        dump_json(path, registry)
+
+    threading.Thread(target=run, name="pipegent-metrics-dump", daemon=True).start()
+    return stop
+
+
+def dump_json(path: Path, registry: MetricsRegistry = REGISTRY) -> None:
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(path.suffix + ".tmp")
+        tmp_path.write_text(json.dumps(registry.snapshot(), indent=2), encoding="utf-8")
+        tmp_path.replace(path)
+    except OSError:
+        logger.exception("Failed to write metrics snapshot to %s", path)
@@ -0,0 +1,150 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever the shape of cached entries (or manifest validation) changes.
+INDEX_VERSION = 6
+
+
+def file_fingerprint(*paths: Path) -> List[List[int]]:
+    """Size and mtime of each path; any change invalidates the cached entry."""
+    fingerprint: List[List[int]] = []
+    for path in paths:
+        stat = path.stat()
+        fingerprint.append([stat.st_size, stat.st_mtime_ns])
+    return fingerprint
+
+
+def content_digest(*paths: Path) -> str:
+    """SHA-256 over the contents of each path, for edits that keep size and mtime."""
+    digest = hashlib.sha256()
+    for path in paths:
+        data = path.read_bytes()
+        digest.update(len(data).to_bytes(8, "big"))
+        digest.update(data)
+    return digest.hexdigest()
+
+
+class PluginIndex:
+    """On-disk cache of validated plugin manifests, keyed by plugin directory.
+
+    Entries are reused while the size and mtime of ``manifest.json`` and ``function.py``
+    are unchanged and their contents still hash to the stored digest, so startup needs
+    neither JSON validation nor any plugin import. Size and mtime are compared first;
+    the files are only read when those match, which catches same-size edits made within
+    the filesystem's mtime granularity.
+    A missing or unreadable index file simply means every plugin is indexed afresh.
+    """
+
+    def __init__(self, path: Optional[Path]) -> None:
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._dirty = False
+        if path is not None:
+            self._entries = self._read(path)
+
+    def lookup(
+        self, plugin_dir: Path, fingerprint: List[List[int]], paths: Sequence[Path]
+    ) -> Optional[Dict[str, Any]]:
+        cached = self._entries.get(str(plugin_dir.resolve()))
+        if cached is None or cached.get("fingerprint") != fingerprint or not self._same_content(cached, paths):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return cached.get("entry")
+
+    def store(
+        self, plugin_dir: Path, fingerprint: List[List[int]], paths: Sequence[Path], entry: Dict[str, Any]
+    ) -> None:
+        try:
+            digest = content_digest(*paths)
+        except OSError:
+            return
+        self._entries[str(plugin_dir.resolve())] = {"fingerprint": fingerprint, "digest": digest, "entry": entry}
+        self._dirty = True
+
+    @staticmethod
+    def _same_content(cached: Dict[str, Any], paths: Sequence[Path]) -> bool:
+        try:
+            return cached.get("digest") == content_digest(*paths)
+        except OSError:
+            return False
+
+    def save(self) -> None:
+        if self.path is None or not self._dirty:
+            return
+        payload = {"version": INDEX_VERSION, "plugins": self._entries}
+        try:
+            _write_json(self.path, payload)
+        except OSError:
+            logger.warning("Could not write plugin index %s", self.path, exc_info=True)
+            return
+        self._dirty = False
+
+    @staticmethod
+    def _read(path: Path) -> Dict[str, Dict[str, Any]]:
+        try:
+            payload = json.loads(path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError):
+            logger.warning("Ignoring unreadable plugin index %s", path)
+            return {}
+        if not isinstance(payload, dict) or payload.get("version") != INDEX_VERSION:
+            return {}
+        plugins = payload.get("plugins")
+        return plugins if isinstance(plugins, dict) else {}
+
+
+class PluginUsage:
+    """Persistent per-tool counts of the runs that actually called each tool.
+
+    Used to predict which lazily imported plugins are worth prewarming at startup.
+    Concurrent processes may overwrite each other's increments; the counts are only
+    a heuristic.
+    """
+
+    def __init__(self, path: Optional[Path]) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+
+    def counts(self) -> Dict[str, int]:
+        if self.path is None:
+            return {}
+        try:
+            payload = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {}
+        if not isinstance(payload, dict):
+            return {}
+        return {str(name): int(count) for name, count in payload.items() if isinstance(count, int)}
+
+    def most_used(self, limit: int) -> List[str]:
+        ranked = sorted(self.counts().items(), key=lambda item: (-item[1], item[0]))
+        return [name for name, count in ranked[: max(0, limit)] if count > 0]
+
+    def record(self, tool_name: str) -> None:
+        if self.path is None:
+            return
+        with self._lock:
+            counts = self.counts()
+            counts[tool_name] = counts.get(tool_name, 0) + 1
+            try:
+                _write_json(self.path, counts)
+            except OSError:
+                logger.debug("Could not update plugin usage history %s", self.path, exc_info=True)
+
+
+def _write_json(path: Path, payload: Any) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    tmp_path.write_text(json.dumps(payload, sort_keys=True), encoding="utf-8")
+    tmp_path.replace(path)
@@ -1,11 +1,37 @@
+import ast
+import functools
+import hashlib
 import importlib.util
+import inspect
 import json
 import logging
+import sys
+import threading
+import time
 from pathlib import Path
-from typing import Any, Callable, Dict, List, Tuple
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from services.http_cache import HttpCacheScopedTool
+from services.memoize import forget_memoized_tool, memoize_tool
+from services.plugin_index import PluginIndex, PluginUsage, file_fingerprint
+from services.sandbox import EXECUTION_MODES, SandboxedTool, SandboxPool
 
 logger = logging.getLogger(__name__)
 
+_MISSING = object()
+_LOCAL_PACKAGES = {"plugins", "services", "agents", "prompts"}
+_PARAMETER_KINDS = {
+    kind.name: kind
+    for kind in (
+        inspect.Parameter.POSITIONAL_ONLY,
+        inspect.Parameter.POSITIONAL_OR_KEYWORD,
+        inspect.Parameter.VAR_POSITIONAL,
+        inspect.Parameter.KEYWORD_ONLY,
+        inspect.Parameter.VAR_KEYWORD,
+    )
+}
+
+
 class ManifestValidationError(ValueError):
     pass
 
@@ -37,6 +63,136 @@ def _validate_input_schema(schema: Any) -> Dict[str, Any]:
     return normalized
 
 
+def _validate_cache_section(cache: Any, properties: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    if cache is None:
+        return None
+    if not isinstance(cache, dict):
+        raise ManifestValidationError("cache must be a JSON object")
+
+    pure = cache.get("pure", False)
+    if not isinstance(pure, bool):
+        raise ManifestValidationError("cache.pure must be a boolean")
+
+    ttl_seconds = cache.get("ttl_seconds")
+    if ttl_seconds is not None and (
+        isinstance(ttl_seconds, bool) or not isinstance(ttl_seconds, (int, float)) or ttl_seconds <= 0
+    ):
+        raise ManifestValidationError("cache.ttl_seconds must be a positive number")
+
+    max_entries = cache.get("max_entries", 256)
+    if isinstance(max_entries, bool) or not isinstance(max_entries, int) or max_entries < 1:
+        raise ManifestValidationError("cache.max_entries must be a positive integer")
+
+    file_args = cache.get("file_args", [])
+    if not isinstance(file_args, list) or not all(isinstance(item, str) for item in file_args):
+        raise ManifestValidationError("cache.file_args must be an array of strings")
+    unknown = [item for item in file_args if item not in properties]
+    if unknown:
+        raise ManifestValidationError(f"cache.file_args references unknown inputs: {', '.join(unknown)}")
+
+    if not pure:
+        return None
+    return {"pure": True, "ttl_seconds": ttl_seconds, "max_entries": max_entries, "file_args": file_args}
+
+
+def _validate_execution_section(execution: Any) -> Optional[Dict[str, Any]]:
+    if execution is None:
+        return None
+    if not isinstance(execution, dict):
+        raise ManifestValidationError("execution must be a JSON object")
+
+    mode = execution.get("mode")
+    if mode is not None and mode not in EXECUTION_MODES:
+        raise ManifestValidationError(f"execution.mode must be one of: {', '.join(EXECUTION_MODES)}")
+
+    timeout_seconds = execution.get("timeout_seconds")
+    if timeout_seconds is not None and (
+        isinstance(timeout_seconds, bool) or not isinstance(timeout_seconds, (int, float)) or timeout_seconds <= 0
+    ):
+        raise ManifestValidationError("execution.timeout_seconds must be a positive number")
+
+    max_memory_mb = execution.get("max_memory_mb")
+    if max_memory_mb is not None and (
+        isinstance(max_memory_mb, bool) or not isinstance(max_memory_mb, int) or max_memory_mb < 1
+    ):
+        raise ManifestValidationError("execution.max_memory_mb must be a positive integer")
+
+    return {"mode": mode, "timeout_seconds": timeout_seconds, "max_memory_mb": max_memory_mb}
+
+
+def _validate_http_cache_section(http_cache: Any) -> Optional[Dict[str, Any]]:
+    if http_cache is None:
+        return None
+    if not isinstance(http_cache, dict):
+        raise ManifestValidationError("http_cache must be a JSON object")
+
+    enabled = http_cache.get("enabled", True)
+    if not isinstance(enabled, bool):
+        raise ManifestValidationError("http_cache.enabled must be a boolean")
+
+    default_max_age = http_cache.get("default_max_age_seconds", 0)
+    if isinstance(default_max_age, bool) or not isinstance(default_max_age, (int, float)) or default_max_age < 0:
+        raise ManifestValidationError("http_cache.default_max_age_seconds must be a non-negative number")
+
+    if not enabled:
+        return None
+    return {"default_max_age_seconds": default_max_age}
+
+
+def _validate_limit_policy(policy: Any, prefix: str) -> Dict[str, Any]:
+    if not isinstance(policy, dict):
+        raise ManifestValidationError(f"{prefix} must be a JSON object")
+
+    max_concurrency = policy.get("max_concurrency")
+    if max_concurrency is not None and (
+        isinstance(max_concurrency, bool) or not isinstance(max_concurrency, int) or max_concurrency < 1
+    ):
+        raise ManifestValidationError(f"{prefix}.max_concurrency must be a positive integer")
+
+    rate_per_second = policy.get("rate_per_second")
+    if rate_per_second is not None and (
+        isinstance(rate_per_second, bool) or not isinstance(rate_per_second, (int, float)) or rate_per_second <= 0
+    ):
+        raise ManifestValidationError(f"{prefix}.rate_per_second must be a positive number")
+
+    burst = policy.get("burst")
+    if burst is not None and (isinstance(burst, bool) or not isinstance(burst, int) or burst < 1):
+        raise ManifestValidationError(f"{prefix}.burst must be a positive integer")
+    if burst is not None and rate_per_second is None:
+        raise ManifestValidationError(f"{prefix}.burst requires rate_per_second")
+
+    return {"max_concurrency": max_concurrency, "rate_per_second": rate_per_second, "burst": burst}
+
+
+def _validate_limits_section(limits: Any, properties: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    if limits is None:
+        return None
+    normalized = _validate_limit_policy(limits, "limits")
+
+    per_host = limits.get("per_host")
+    host_arg = limits.get("host_arg")
+    host = limits.get("host")
+    # One input name, or several (e.g. "url" and a "urls" list); every host they name is limited.
+    host_args = [host_arg] if isinstance(host_arg, str) else host_arg
+    if host_args is not None and (
+        not isinstance(host_args, list)
+        or not host_args
+        or any(not isinstance(name, str) or name not in properties for name in host_args)
+    ):
+        raise ManifestValidationError("limits.host_arg must name one or more of the tool's inputs")
+    if host is not None and (not isinstance(host, str) or not host.strip()):
+        raise ManifestValidationError("limits.host must be a non-empty string")
+    if per_host is not None:
+        if host_args is None and host is None:
+            raise ManifestValidationError("limits.per_host requires host_arg or host")
+        per_host = _validate_limit_policy(per_host, "limits.per_host")
+
+    normalized.update(
+        {"per_host": per_host, "host_args": host_args, "host": host.strip().lower() if host else None}
+    )
+    return normalized
+
+
 def _validate_manifest(manifest: Any) -> Dict[str, Any]:
     if not isinstance(manifest, dict):
         raise ManifestValidationError("Manifest root must be a JSON object")
@@ -54,60 +210,125 @@ def _validate_manifest(manifest: Any) -> Dict[str, Any]:
         raise ManifestValidationError("'execution_function' must be a non-empty string")
 
     input_schema = _validate_input_schema(manifest.get("input_schema"))
+    cache = _validate_cache_section(manifest.get("cache"), input_schema["properties"])
+    execution = _validate_execution_section(manifest.get("execution"))
+    limits = _validate_limits_section(manifest.get("limits"), input_schema["properties"])
+    http_cache = _validate_http_cache_section(manifest.get("http_cache"))
 
     return {
         "name": name.strip(),
         "description": description.strip(),
         "execution_function": function_name.strip(),
         "input_schema": input_schema,
+        "cache": cache,
+        "execution": execution,
+        "limits": limits,
+        "http_cache": http_cache,
     }
 
 
-def load_plugins(plugins_dir: Path) -> Tuple[Dict[str, Callable], List[Dict[str, Any]]]:
-    tools: Dict[str, Callable] = {}
-    manifests: List[Dict[str, Any]] = []
+class PluginImportError(RuntimeError):
+    pass
 
-    if not plugins_dir.exists():
-        return tools, manifests
 
-    for plugin_dir in sorted(p for p in plugins_dir.iterdir() if p.is_dir()):
-        module_path = plugin_dir / "function.py"
-        manifest_path = plugin_dir / "manifest.json"
-        if not module_path.exists() or not manifest_path.exists():
-            logger.warning(
-                "Plugin '%s' skipped: missing function.py or manifest.json", plugin_dir.name
-            )
-            continue
+class LazyTool:
+    """Stands in for a plugin function and imports its module on the first call.
 
-        try:
-            manifest_data = json.loads(manifest_path.read_text(encoding="utf-8"))
-            manifest = _validate_manifest(manifest_data)
-        except (json.JSONDecodeError, ManifestValidationError) as exc:
-            logger.warning("Plugin '%s' skipped: %s", plugin_dir.name, exc)
-            continue
+    The signature is rebuilt from the function's source without importing it, so
+    callers such as the executor can still inspect parameters (e.g. ``session``).
+    """
 
-        spec = importlib.util.spec_from_file_location(
-            f"plugins.{plugin_dir.name}.function", module_path
+    def __init__(
+        self,
+        name: str,
+        module_path: Path,
+        module_name: str,
+        function_name: str,
+        parameters: List[List[str]],
+        usage: Optional[PluginUsage] = None,
+        dependencies: Iterable[str] = (),
+    ) -> None:
+        self.tool_name = name
+        self.module_path = module_path
+        self.module_name = module_name
+        self.function_name = function_name
+        self.usage = usage
+        self.dependencies = list(dependencies)
+        self.__name__ = function_name
+        self.__qualname__ = function_name
+        self.__module__ = module_name
+        self.__doc__ = None
+        self.__signature__ = inspect.Signature(
+            [inspect.Parameter(param_name, _PARAMETER_KINDS[kind]) for param_name, kind in parameters]
         )
-        if spec is None or spec.loader is None:
-            logger.warning("Plugin '%s' skipped: could not create import spec", plugin_dir.name)
-            continue
+        self._function: Optional[Callable[..., Any]] = None
+        self._called = False
+        self._lock = threading.Lock()
+        # Set by PluginCatalog so a plugin that fails to import is dropped from the tool set.
+        self.on_import_error: Optional[Callable[["LazyTool"], None]] = None
 
-        module = importlib.util.module_from_spec(spec)
-        try:
-            spec.loader.exec_module(module)  # type: ignore[call-arg]
-        except Exception as exc:
-            logger.exception("Plugin '%s' skipped: failed to load module (%s)", plugin_dir.name, exc)
-            continue
+    @property
+    def loaded(self) -> bool:
+        return self._function is not None
 
-        func = getattr(module, manifest["execution_function"], None)
-        if not callable(func):
-            logger.warning(
-                "Plugin '%s' skipped: execution function '%s' is invalid",
-                plugin_dir.name,
-                manifest["execution_function"],
-            )
+    def load(self) -> Callable[..., Any]:
+        function = self._function
+        if function is not None:
+            return function
+        with self._lock:
+            if self._function is None:
+                function = _import_function(self.module_path, self.module_name, self.function_name)
+                if function is not None:
+                    self._function = function
+                    self.__signature__ = inspect.signature(function)
+                    logger.debug("Imported plugin '%s' on first use.", self.tool_name)
+            function = self._function
+        if function is None:
+            if self.on_import_error is not None:
+                self.on_import_error(self)
+            raise PluginImportError(f"Plugin '{self.tool_name}' could not be imported.")
+        return function
+
+    def prewarm(self) -> None:
+        """Import the module and the third-party packages it imports inside its functions."""
+        self.load()
+        for dependency in self.dependencies:
+            try:
+                importlib.import_module(dependency)
+            except Exception:
+                logger.debug("Prewarm of %s for '%s' failed.", dependency, self.tool_name, exc_info=True)
+
+    def __call__(self, *args: Any, **kwargs: Any) -> Any:
+        function = self.load()
+        if not self._called:
+            self._called = True
+            if self.usage is not None:
+                self.usage.record(self.tool_name)
+        return function(*args, **kwargs)
+
+
+def load_plugins(
+    plugins_dir: Path,
+    lazy: bool = False,
+    index: Optional[PluginIndex] = None,
+    usage: Optional[PluginUsage] = None,
+    sandbox: Optional[SandboxPool] = None,
+) -> Tuple[Dict[str, Callable], List[Dict[str, Any]]]:
+    """Load every plugin under ``plugins_dir``.
+
+    With ``lazy`` the plugin modules are not imported here: each tool is a LazyTool
+    that imports on first call (async plugins are still imported eagerly). ``index``
+    caches validated manifests on disk between runs. With a ``sandbox``, plugins whose
+    execution mode is ``process`` run in its worker processes.
+    """
+    tools: Dict[str, Callable] = {}
+    manifests: List[Dict[str, Any]] = []
+
+    for plugin_dir in _plugin_dirs(plugins_dir):
+        loaded = _load_plugin(plugin_dir, lazy, index, usage)
+        if loaded is None:
             continue
+        manifest, func = loaded
 
         if manifest["name"] in tools:
             logger.warning(
@@ -117,13 +338,433 @@ def load_plugins(plugins_dir: Path) -> Tuple[Dict[str, Callable], List[Dict[str,
             )
             continue
 
-        tools[manifest["name"]] = func
-        manifests.append(
-            {
-                "name": manifest["name"],
-                "description": manifest["description"],
-                "input_schema": manifest["input_schema"],
-            }
-        )
+        tools[manifest["name"]] = _wrap_tool(plugin_dir, manifest, func, sandbox)
+        manifests.append(_tool_spec(manifest))
 
+    if index is not None:
+        index.save()
     return tools, manifests
+
+
+class PluginCatalog:
+    """The plugins of several plugin roots, reloadable one plugin directory at a time.
+
+    ``changed_dirs`` compares the manifest/function fingerprints seen at load time with
+    the files on disk; ``reload`` re-imports only those directories and keeps the
+    already loaded (and possibly already imported) tools of every other plugin.
+    A lazy plugin that fails to import on first use is dropped until its files change,
+    and the remaining tools are handed to ``on_unload`` like a reload.
+    """
+
+    def __init__(
+        self,
+        plugin_roots: Sequence[Path],
+        lazy: bool = False,
+        index: Optional[PluginIndex] = None,
+        usage: Optional[PluginUsage] = None,
+        sandbox: Optional[SandboxPool] = None,
+    ) -> None:
+        self.plugin_roots = list(plugin_roots)
+        self.lazy = lazy
+        self.index = index
+        self.usage = usage
+        self.sandbox = sandbox
+        self._plugins: Dict[Path, Tuple[str, Callable[..., Any], Dict[str, Any]]] = {}
+        self._limits: Dict[Path, Optional[Dict[str, Any]]] = {}
+        self._fingerprints: Dict[Path, Optional[List[List[int]]]] = {}
+        self._lock = threading.Lock()
+        self.on_unload: Optional[
+            Callable[[Dict[str, Callable[..., Any]], List[Dict[str, Any]], List[str]], None]
+        ] = None
+
+    def load(self) -> Tuple[Dict[str, Callable[..., Any]], List[Dict[str, Any]]]:
+        with self._lock:
+            self._plugins.clear()
+            self._limits.clear()
+            self._fingerprints = self._scan()
+            for plugin_dir in self._fingerprints:
+                self._load_dir(plugin_dir)
+            if self.index is not None:
+                self.index.save()
+            return self._assemble(strict=True)
+
+    def snapshot(self) -> Tuple[Dict[str, Callable[..., Any]], List[Dict[str, Any]]]:
+        with self._lock:
+            return self._assemble(strict=False)
+
+    def tool_limits(self) -> Dict[str, Dict[str, Any]]:
+        """The manifest ``limits`` section of every loaded tool that declares one."""
+        with self._lock:
+            tools, _ = self._assemble(strict=False)
+            limits: Dict[str, Dict[str, Any]] = {}
+            for plugin_dir, (name, func, _) in self._plugins.items():
+                tool_limits = self._limits.get(plugin_dir)
+                if tool_limits and tools.get(name) is func:
+                    limits[name] = tool_limits
+            return limits
+
+    def changed_dirs(self) -> List[Path]:
+        current = self._scan()
+        with self._lock:
+            known = self._fingerprints
+        return sorted(
+            plugin_dir
+            for plugin_dir in set(current) | set(known)
+            if current.get(plugin_dir, _MISSING) != known.get(plugin_dir, _MISSING)
+        )
+
+    def reload(self, plugin_dirs: Iterable[Path]) -> List[str]:
+        """Reload the given plugin directories; returns the tool names added, changed or removed."""
+        affected: List[str] = []
+        with self._lock:
+            for plugin_dir in plugin_dirs:
+                previous = self._plugins.pop(plugin_dir, None)
+                self._limits.pop(plugin_dir, None)
+                if previous is not None:
+                    affected.append(previous[0])
+                    forget_memoized_tool(previous[0])
+                # Fingerprint before loading so an edit made mid-load shows up on the next scan.
+                fingerprint = _plugin_fingerprint(plugin_dir)
+                if plugin_dir.is_dir():
+                    self._fingerprints[plugin_dir] = fingerprint
+                else:
+                    self._fingerprints.pop(plugin_dir, None)
+                if fingerprint is None:
+                    if previous is not None:
+                        logger.info("Plugin '%s' unloaded: '%s' is gone or incomplete.", previous[0], plugin_dir.name)
+                    continue
+                name = self._load_dir(plugin_dir)
+                if name is not None and name not in affected:
+                    affected.append(name)
+            if self.index is not None:
+                self.index.save()
+        return affected
+
+    def _scan(self) -> Dict[Path, Optional[List[List[int]]]]:
+        return {
+            plugin_dir: _plugin_fingerprint(plugin_dir)
+            for root in self.plugin_roots
+            for plugin_dir in _plugin_dirs(root)
+        }
+
+    def _load_dir(self, plugin_dir: Path) -> Optional[str]:
+        loaded = _load_plugin(plugin_dir, self.lazy, self.index, self.usage)
+        if loaded is None:
+            return None
+        manifest, func = loaded
+        if isinstance(func, LazyTool):
+            func.on_import_error = functools.partial(self._import_failed, plugin_dir)
+        self._limits[plugin_dir] = manifest.get("limits")
+        self._plugins[plugin_dir] = (
+            manifest["name"],
+            _wrap_tool(plugin_dir, manifest, func, self.sandbox),
+            _tool_spec(manifest),
+        )
+        return manifest["name"]
+
+    def _import_failed(self, plugin_dir: Path, lazy: LazyTool) -> None:
+        with self._lock:
+            entry = self._plugins.get(plugin_dir)
+            if entry is None or _lazy_target(entry[1]) is not lazy:
+                return
+            # The fingerprint is kept, so the watcher brings the plugin back once it is fixed.
+            del self._plugins[plugin_dir]
+            self._limits.pop(plugin_dir, None)
+            forget_memoized_tool(entry[0])
+            tools, specs = self._assemble(strict=False)
+        logger.warning("Plugin '%s' failed to import; dropped it from the tool set.", entry[0])
+        if self.on_unload is not None:
+            self.on_unload(tools, specs, [entry[0]])
+
+    def _assemble(self, strict: bool) -> Tuple[Dict[str, Callable[..., Any]], List[Dict[str, Any]]]:
+        tools: Dict[str, Callable[..., Any]] = {}
+        specs: List[Dict[str, Any]] = []
+        sources: Dict[str, Path] = {}
+        for root in self.plugin_roots:
+            for plugin_dir in sorted(path for path in self._plugins if path.parent == root):
+                name, func, spec = self._plugins[plugin_dir]
+                if name in tools:
+                    if strict and sources[name].parent != root:
+                        raise RuntimeError(f"Duplicate plugin name detected: {name}")
+                    logger.warning("Duplicate plugin name '%s' detected; skipping '%s'", name, plugin_dir.name)
+                    continue
+                tools[name] = func
+                sources[name] = plugin_dir
+                specs.append(spec)
+        return tools, specs
+
+
+def load_lazy_tools(tools: Iterable[Callable[..., Any]]) -> int:
+    """Import every not-yet-imported LazyTool (e.g. before forking); returns how many were imported."""
+    imported = 0
+    for func in tools:
+        lazy = _lazy_target(func)
+        if lazy is None or lazy.loaded:
+            continue
+        try:
+            lazy.load()
+        except PluginImportError:
+            continue
+        imported += 1
+    return imported
+
+
+def prewarm_tools(tools: Dict[str, Callable[..., Any]], names: List[str]) -> Optional[threading.Thread]:
+    """Import the given lazy plugins (and their heavy dependencies) on a background thread.
+
+    Sandboxed plugins are instead imported by every sandbox worker when it starts.
+    """
+    for name in names:
+        sandboxed = _sandboxed_target(tools[name]) if name in tools else None
+        if sandboxed is not None:
+            sandboxed.preload()
+    pending = [
+        lazy
+        for lazy in (_lazy_target(tools[name]) for name in names if name in tools)
+        if lazy is not None and not lazy.loaded
+    ]
+    if not pending:
+        return None
+
+    def run() -> None:
+        started = time.perf_counter()
+        for lazy in pending:
+            try:
+                lazy.prewarm()
+            except PluginImportError:
+                continue
+        logger.info(
+            "Prewarmed %s plugin(s) in %.0f ms: %s",
+            len(pending),
+            (time.perf_counter() - started) * 1000,
+            ", ".join(lazy.tool_name for lazy in pending),
+        )
+
+    thread = threading.Thread(target=run, name="pipegent-prewarm", daemon=True)
+    thread.start()
+    return thread
+
+
+def _lazy_target(func: Callable[..., Any]) -> Optional[LazyTool]:
+    # Memoized and HTTP-cache-scoped plugins wrap the LazyTool.
+    target = inspect.unwrap(func)
+    return target if isinstance(target, LazyTool) else None
+
+
+def _sandboxed_target(func: Callable[..., Any]) -> Optional[SandboxedTool]:
+    target = inspect.unwrap(func)
+    return target if isinstance(target, SandboxedTool) else None
+
+
+def _plugin_dirs(plugins_dir: Path) -> List[Path]:
+    if not plugins_dir.exists():
+        return []
+    return sorted(path for path in plugins_dir.iterdir() if path.is_dir())
+
+
+def _plugin_fingerprint(plugin_dir: Path) -> Optional[List[List[int]]]:
+    try:
+        return file_fingerprint(plugin_dir / "manifest.json", plugin_dir / "function.py")
+    except OSError:
+        return None
+
+
+def _load_plugin(
+    plugin_dir: Path, lazy: bool, index: Optional[PluginIndex], usage: Optional[PluginUsage]
+) -> Optional[Tuple[Dict[str, Any], Callable[..., Any]]]:
+    module_path = plugin_dir / "function.py"
+    manifest_path = plugin_dir / "manifest.json"
+    if not module_path.exists() or not manifest_path.exists():
+        logger.warning(
+            "Plugin '%s' skipped: missing function.py or manifest.json", plugin_dir.name
+        )
+        return None
+
+    entry = _plugin_entry(plugin_dir, module_path, manifest_path, index)
+    if "error" in entry:
+        logger.warning("Plugin '%s' skipped: %s", plugin_dir.name, entry["error"])
+        return None
+    manifest = entry["manifest"]
+    function_info = entry.get("function")
+    module_name = f"plugins.{plugin_dir.name}.function"
+
+    if lazy and function_info is not None and not function_info["is_async"]:
+        return manifest, LazyTool(
+            manifest["name"],
+            module_path,
+            module_name,
+            manifest["execution_function"],
+            function_info["parameters"],
+            usage,
+            entry.get("dependencies", ()),
+        )
+
+    func = _import_function(module_path, module_name, manifest["execution_function"])
+    if func is None:
+        return None
+    return manifest, func
+
+
+def _wrap_tool(
+    plugin_dir: Path, manifest: Dict[str, Any], func: Callable[..., Any], sandbox: Optional[SandboxPool] = None
+) -> Callable[..., Any]:
+    # Memoization wraps the sandbox, so cache hits never pay for a round trip to a worker.
+    func = _sandbox_tool(plugin_dir, manifest, func, sandbox)
+    http_cache = manifest.get("http_cache")
+    if http_cache is not None and not isinstance(func, SandboxedTool):
+        # Sandboxed tools enter the HTTP cache scope inside their worker instead.
+        if inspect.iscoroutinefunction(func):
+            logger.warning("Plugin '%s': http_cache is ignored for async functions", plugin_dir.name)
+        else:
+            func = HttpCacheScopedTool(func, http_cache)
+    if manifest["cache"] is None:
+        return func
+    if inspect.iscoroutinefunction(func):
+        logger.warning("Plugin '%s': cache.pure is ignored for async functions", plugin_dir.name)
+        return func
+    return memoize_tool(manifest["name"], func, manifest["cache"])
+
+
+def _sandbox_tool(
+    plugin_dir: Path, manifest: Dict[str, Any], func: Callable[..., Any], sandbox: Optional[SandboxPool]
+) -> Callable[..., Any]:
+    if sandbox is None:
+        return func
+    execution = manifest.get("execution") or {}
+    # Pure plugins are typically cheap enough that the IPC round trip would dominate.
+    default_mode = "inline" if manifest["cache"] is not None else sandbox.default_mode
+    if (execution.get("mode") or default_mode) != "process":
+        return func
+    signature = inspect.signature(func)
+    if inspect.iscoroutinefunction(func) or "session" in signature.parameters:
+        logger.info("Plugin '%s' runs inline: async and session-aware plugins cannot be sandboxed.", plugin_dir.name)
+        return func
+    lazy = func if isinstance(func, LazyTool) else None
+    return SandboxedTool(
+        manifest["name"],
+        sandbox,
+        plugin_dir / "function.py",
+        f"plugins.{plugin_dir.name}.function",
+        manifest["execution_function"],
+        signature,
+        timeout_seconds=execution.get("timeout_seconds"),
+        max_memory_mb=execution.get("max_memory_mb"),
+        usage=lazy.usage if lazy is not None else None,
+        dependencies=lazy.dependencies if lazy is not None else (),
+        http_cache=manifest.get("http_cache"),
+    )
+
+
+def _tool_spec(manifest: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "name": manifest["name"],
+        "description": manifest["description"],
+        "input_schema": manifest["input_schema"],
+    }
+
+
+def _plugin_entry(
+    plugin_dir: Path, module_path: Path, manifest_path: Path, index: Optional[PluginIndex]
+) -> Dict[str, Any]:
+    fingerprint = file_fingerprint(manifest_path, module_path)
+    if index is not None:
+        cached = index.lookup(plugin_dir, fingerprint, (manifest_path, module_path))
+        if cached is not None:
+            return cached
+
+    try:
+        manifest_data = json.loads(manifest_path.read_text(encoding="utf-8"))
+        manifest = _validate_manifest(manifest_data)
+    except (json.JSONDecodeError, ManifestValidationError) as exc:
+        entry: Dict[str, Any] = {"error": str(exc)}
+    else:
+        tree = _parse_module(module_path)
+        entry = {
+            "manifest": manifest,
+            "function": _describe_function(tree, manifest["execution_function"]),
+            "dependencies": _third_party_imports(tree),
+        }
+
+    if index is not None:
+        index.store(plugin_dir, fingerprint, (manifest_path, module_path), entry)
+    return entry
+
+
+def _parse_module(module_path: Path) -> Optional[ast.Module]:
+    try:
+        return ast.parse(module_path.read_text(encoding="utf-8"), filename=str(module_path))
+    except (OSError, SyntaxError, ValueError):
+        return None
+
+
+def _describe_function(tree: Optional[ast.Module], function_name: str) -> Optional[Dict[str, Any]]:
+    """Find a top-level ``def function_name`` without importing the module.
+
+    Returns None when the function is not a plain top-level definition (or the file
+    does not parse); such plugins are imported eagerly so errors still surface at load.
+    """
+    if tree is None:
+        return None
+
+    for node in tree.body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)) and node.name == function_name:
+            args = node.args
+            parameters = [[arg.arg, "POSITIONAL_ONLY"] for arg in args.posonlyargs]
+            parameters += [[arg.arg, "POSITIONAL_OR_KEYWORD"] for arg in args.args]
+            if args.vararg is not None:
+                parameters.append([args.vararg.arg, "VAR_POSITIONAL"])
+            parameters += [[arg.arg, "KEYWORD_ONLY"] for arg in args.kwonlyargs]
+            if args.kwarg is not None:
+                parameters.append([args.kwarg.arg, "VAR_KEYWORD"])
+            return {"is_async": isinstance(node, ast.AsyncFunctionDef), "parameters": parameters}
+    return None
+
+
+def _third_party_imports(tree: Optional[ast.Module]) -> List[str]:
+    """Non-stdlib packages imported anywhere in the module, including inside functions."""
+    if tree is None:
+        return []
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names.update(alias.name.split(".")[0] for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            names.add(node.module.split(".")[0])
+    return sorted(
+        name for name in names if name not in sys.stdlib_module_names and name not in _LOCAL_PACKAGES
+    )
+
+
+def _import_function(module_path: Path, module_name: str, function_name: str) -> Optional[Callable[..., Any]]:
+    plugin_name = module_path.parent.name
+    spec = importlib.util.spec_from_file_location(module_name, module_path)
+    if spec is None or spec.loader is None:
+        logger.warning("Plugin '%s' skipped: could not create import spec", plugin_name)
+        return None
+
+    module = importlib.util.module_from_spec(spec)
+    try:
+        spec.loader.exec_module(module)  # type: ignore[call-arg]
+    except Exception as exc:
+        logger.exception("Plugin '%s' skipped: failed to load module (%s)", plugin_name, exc)
+        return None
+
+    func = getattr(module, function_name, None)
+    if not callable(func):
+        logger.warning(
+            "Plugin '%s' skipped: execution function '%s' is invalid",
+            plugin_name,
+            function_name,
+        )
+        return None
+    return func
+
+
+def fingerprint_tool_specs(tool_specs: List[Dict[str, Any]]) -> str:
+    """Stable hash of the loaded tool set, used to invalidate caches when plugins change."""
+    canonical = json.dumps(
+        sorted(tool_specs, key=lambda spec: str(spec.get("name", ""))),
+        sort_keys=True,
+        ensure_ascii=True,
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
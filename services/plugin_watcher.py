@@ -0,0 +1,56 @@
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+from services.plugin_loader import PluginCatalog
+
+logger = logging.getLogger(__name__)
+
+ReloadCallback = Callable[[Dict[str, Callable[..., Any]], List[Dict[str, Any]], List[str]], None]
+
+
+class PluginWatcher:
+    """Polls a PluginCatalog's directories and reloads plugins whose files changed.
+
+    Only the changed plugin directories are re-imported; the complete new tool table
+    and specs are then handed to ``on_reload`` together with the affected tool names.
+    Polling (rather than inotify) keeps this dependency-free and works on any platform.
+    """
+
+    def __init__(self, catalog: PluginCatalog, on_reload: ReloadCallback, interval: float = 2.0) -> None:
+        self.catalog = catalog
+        self.on_reload = on_reload
+        self.interval = max(0.1, interval)
+        self.reloads = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def check(self) -> List[str]:
+        """Reload anything that changed since the last check; returns the affected tool names."""
+        changed = self.catalog.changed_dirs()
+        if not changed:
+            return []
+        logger.info("Plugin change detected in: %s", ", ".join(path.name for path in changed))
+        affected = self.catalog.reload(changed)
+        tools, tool_specs = self.catalog.snapshot()
+        self.on_reload(tools, tool_specs, affected)
+        self.reloads += 1
+        return affected
+
+    def start(self) -> "PluginWatcher":
+        if self._thread is not None:
+            return self
+
+        def run() -> None:
+            while not self._stop.wait(self.interval):
+                try:
+                    self.check()
+                except Exception:
+                    logger.exception("Plugin reload failed; keeping the current tool set.")
+
+        self._thread = threading.Thread(target=run, name="pipegent-plugin-watcher", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
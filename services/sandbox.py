@@ -0,0 +1,466 @@
+import atexit
+import importlib
+import importlib.util
+import inspect
+import logging
+import multiprocessing
+import os
+import pickle
+import signal
+import threading
+import traceback
+from contextlib import contextmanager
+from multiprocessing.connection import Connection
+from multiprocessing.shared_memory import SharedMemory
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from services.http_cache import http_cache_scope
+from services.metrics import SANDBOX_EVENTS
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - Windows
+    resource = None  # type: ignore[assignment]
+
+logger = logging.getLogger(__name__)
+
+EXECUTION_MODES = ("inline", "process")
+
+
+class SandboxError(RuntimeError):
+    """A plugin could not finish inside its sandbox worker."""
+
+
+class ToolTimeoutError(SandboxError):
+    pass
+
+
+class ToolExecutionError(SandboxError):
+    pass
+
+
+class _Worker:
+    def __init__(self, process: Any, conn: Connection) -> None:
+        self.process = process
+        self.conn = conn
+        self.tasks = 0
+
+    def stop(self, kill: bool = False) -> None:
+        if kill:
+            _kill_process_group(self.process)
+        else:
+            try:
+                self.conn.send(None)
+            except (OSError, ValueError):
+                pass
+        self.conn.close()
+        if kill:
+            self.process.join(timeout=1)
+
+
+class SandboxPool:
+    """Pre-warmed worker processes that run plugin functions under per-call limits.
+
+    Each call is sent to an idle worker with its wall-clock timeout and address-space
+    limit. A worker that overruns its timeout (or dies) is killed together with any
+    processes it started and replaced right away; healthy workers are recycled after
+    ``max_tasks_per_worker`` calls. Pickled results larger than ``shm_threshold_bytes``
+    come back through a shared memory block instead of the pipe.
+
+    Workers are started lazily and belong to the process that started them, so a pool
+    created before a pre-fork simply starts fresh workers in every child.
+    """
+
+    def __init__(
+        self,
+        workers: int = 4,
+        default_mode: str = "process",
+        default_timeout_seconds: float = 60.0,
+        default_max_memory_mb: int = 2048,
+        shm_threshold_bytes: int = 1024 * 1024,
+        max_tasks_per_worker: int = 500,
+        preload_modules: Sequence[str] = (),
+        initializer: Optional[Callable[[], Any]] = None,
+    ) -> None:
+        if default_mode not in EXECUTION_MODES:
+            raise ValueError(f"Unknown sandbox mode '{default_mode}'; expected one of: {', '.join(EXECUTION_MODES)}")
+        self.workers = max(1, workers)
+        self.default_mode = default_mode
+        self.default_timeout_seconds = default_timeout_seconds
+        self.default_max_memory_mb = max(0, default_max_memory_mb)
+        self.shm_threshold_bytes = max(0, shm_threshold_bytes)
+        self.max_tasks_per_worker = max(0, max_tasks_per_worker)
+        self.preload_modules = list(preload_modules)
+        # Runs first in every worker, e.g. to apply settings the plugins read (must be picklable).
+        self.initializer = initializer
+        self._preload_plugins: List[Tuple[str, str, List[str]]] = []
+        self._condition = threading.Condition()
+        self._idle: List[_Worker] = []
+        self._started = 0
+        self._pid = os.getpid()
+        self._context: Any = None
+        self._atexit_registered = False
+
+    def preload(self, module_path: Path, module_name: str, dependencies: Iterable[str] = ()) -> None:
+        """Import this plugin (and its dependencies) in every worker started from now on."""
+        entry = (str(module_path), module_name, list(dependencies))
+        if entry not in self._preload_plugins:
+            self._preload_plugins.append(entry)
+
+    def start(self) -> "SandboxPool":
+        """Start all workers now instead of on first use."""
+        with self._condition:
+            self._check_pid()
+            missing = self.workers - self._started
+            self._started += missing
+        for _ in range(missing):
+            self._release(self._spawn_or_release(), healthy=True)
+        return self
+
+    def run(
+        self,
+        module_path: Path,
+        module_name: str,
+        function_name: str,
+        kwargs: Dict[str, Any],
+        timeout_seconds: Optional[float] = None,
+        max_memory_mb: Optional[int] = None,
+        tool_name: Optional[str] = None,
+        http_cache: Optional[Dict[str, Any]] = None,
+    ) -> Any:
+        tool_name = tool_name or function_name
+        timeout = timeout_seconds if timeout_seconds is not None else self.default_timeout_seconds
+        memory_mb = max_memory_mb if max_memory_mb is not None else self.default_max_memory_mb
+        task = (str(module_path), module_name, function_name, kwargs, memory_mb, self.shm_threshold_bytes, http_cache)
+
+        worker = self._acquire()
+        healthy = False
+        try:
+            try:
+                worker.conn.send(task)
+            except (pickle.PicklingError, TypeError, AttributeError) as exc:
+                # Pickling happens before anything is written, so the worker is still usable.
+                healthy = True
+                raise ToolExecutionError(f"Arguments for '{tool_name}' cannot be sent to a sandbox worker: {exc}") from exc
+            except (OSError, ValueError) as exc:
+                raise ToolExecutionError(f"Sandbox worker for '{tool_name}' is gone: {exc}") from exc
+
+            if not worker.conn.poll(timeout):
+                SANDBOX_EVENTS.inc(event="timeout")
+                raise ToolTimeoutError(f"Tool '{tool_name}' timed out after {timeout:g} seconds.")
+            try:
+                kind, payload = worker.conn.recv()
+            except (EOFError, OSError) as exc:
+                SANDBOX_EVENTS.inc(event="crash")
+                worker.process.join(timeout=1)
+                raise ToolExecutionError(
+                    f"Sandbox worker running '{tool_name}' exited unexpectedly (exit code {worker.process.exitcode})."
+                ) from exc
+
+            worker.tasks += 1
+            if kind == "error":
+                error = _unpack_error(payload)
+                # A MemoryError can leave the worker's heap fragmented near its limit.
+                healthy = not isinstance(error, MemoryError)
+                raise error
+            healthy = True
+            return self._unpack_result(kind, payload)
+        finally:
+            self._release(worker, healthy)
+
+    def shutdown(self) -> None:
+        with self._condition:
+            idle, self._idle = self._idle, []
+            if self._pid == os.getpid():
+                self._started -= len(idle)
+        for worker in idle:
+            worker.stop()
+
+    def _acquire(self) -> _Worker:
+        with self._condition:
+            self._check_pid()
+            while not self._idle and self._started >= self.workers:
+                self._condition.wait()
+            if self._idle:
+                return self._idle.pop()
+            self._started += 1
+        return self._spawn_or_release()
+
+    def _release(self, worker: _Worker, healthy: bool) -> None:
+        if healthy and (self.max_tasks_per_worker == 0 or worker.tasks < self.max_tasks_per_worker):
+            with self._condition:
+                if self._pid == os.getpid():
+                    self._idle.append(worker)
+                    self._condition.notify()
+                    return
+            worker.stop()
+            return
+
+        worker.stop(kill=not healthy)
+        SANDBOX_EVENTS.inc(event="recycle" if healthy else "kill")
+        # Replace the worker right away so the pool stays warm.
+        try:
+            replacement = self._spawn()
+        except Exception:
+            logger.exception("Could not start a replacement sandbox worker.")
+            with self._condition:
+                self._started -= 1
+                self._condition.notify()
+            return
+        self._release(replacement, healthy=True)
+
+    def _spawn_or_release(self) -> _Worker:
+        try:
+            return self._spawn()
+        except Exception:
+            with self._condition:
+                self._started -= 1
+                self._condition.notify()
+            raise
+
+    def _spawn(self) -> _Worker:
+        if self._context is None:
+            self._context = _start_context(self.preload_modules)
+        if not self._atexit_registered:
+            self._atexit_registered = True
+            atexit.register(self.shutdown)
+        parent_conn, child_conn = self._context.Pipe()
+        process = self._context.Process(
+            target=_worker_main,
+            args=(child_conn, self.initializer, self.preload_modules, list(self._preload_plugins)),
+            name="pipegent-sandbox",
+            daemon=True,
+        )
+        process.start()
+        child_conn.close()
+        SANDBOX_EVENTS.inc(event="spawn")
+        logger.debug("Started sandbox worker %s.", process.pid)
+        return _Worker(process, parent_conn)
+
+    def _check_pid(self) -> None:
+        # Workers (and their pipes) belong to the process that started them.
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._idle = []
+            self._started = 0
+            self._context = None
+            self._atexit_registered = False
+
+    @staticmethod
+    def _unpack_result(kind: str, payload: Any) -> Any:
+        if kind == "shm":
+            name, size = payload
+            block = SharedMemory(name=name)
+            try:
+                data = bytes(block.buf[:size])
+            finally:
+                block.close()
+                block.unlink()
+            SANDBOX_EVENTS.inc(event="shared_memory")
+            return pickle.loads(data)
+        return pickle.loads(payload)
+
+
+class SandboxedTool:
+    """Plugin callable that runs the plugin function in a SandboxPool worker.
+
+    The plugin module is never imported in the calling process; the signature comes
+    from the eagerly imported function or the lazy stand-in.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        pool: SandboxPool,
+        module_path: Path,
+        module_name: str,
+        function_name: str,
+        signature: inspect.Signature,
+        timeout_seconds: Optional[float] = None,
+        max_memory_mb: Optional[int] = None,
+        usage: Any = None,
+        dependencies: Iterable[str] = (),
+        http_cache: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        self.tool_name = name
+        self.pool = pool
+        self.module_path = module_path
+        self.module_name = module_name
+        self.function_name = function_name
+        self.timeout_seconds = timeout_seconds
+        self.max_memory_mb = max_memory_mb
+        self.usage = usage
+        self.dependencies = list(dependencies)
+        self.http_cache = http_cache
+        self.__name__ = function_name
+        self.__qualname__ = function_name
+        self.__module__ = module_name
+        self.__doc__ = None
+        self.__signature__ = signature
+        self._called = False
+
+    def preload(self) -> None:
+        self.pool.preload(self.module_path, self.module_name, self.dependencies)
+
+    def __call__(self, **kwargs: Any) -> Any:
+        if not self._called:
+            self._called = True
+            if self.usage is not None:
+                self.usage.record(self.tool_name)
+        return self.pool.run(
+            self.module_path,
+            self.module_name,
+            self.function_name,
+            kwargs,
+            timeout_seconds=self.timeout_seconds,
+            max_memory_mb=self.max_memory_mb,
+            tool_name=self.tool_name,
+            http_cache=self.http_cache,
+        )
+
+
+def _start_context(preload_modules: Sequence[str]) -> Any:
+    if "forkserver" not in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("spawn")
+    context = multiprocessing.get_context("forkserver")
+    # Workers fork from a server that already imported the entry point, this module and
+    # the configured heavy libraries, so a replacement worker starts in milliseconds.
+    context.set_forkserver_preload(["__main__", __name__, *preload_modules])
+    return context
+
+
+def _kill_process_group(process: Any) -> None:
+    if hasattr(os, "killpg") and process.pid is not None:
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+            return
+        except OSError:
+            pass
+    process.kill()
+
+
+def _worker_main(
+    conn: Connection,
+    initializer: Optional[Callable[[], Any]],
+    preload_modules: List[str],
+    preload_plugins: List[Tuple[str, str, List[str]]],
+) -> None:
+    if hasattr(os, "setpgrp"):
+        # Own process group, so a timeout also kills anything the plugin started.
+        os.setpgrp()
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    if initializer is not None:
+        initializer()
+    for name in preload_modules:
+        _try_import(name)
+    modules: Dict[str, Tuple[int, Any]] = {}
+    for module_path, module_name, dependencies in preload_plugins:
+        try:
+            _plugin_module(modules, module_path, module_name)
+        except Exception:
+            continue
+        for dependency in dependencies:
+            _try_import(dependency)
+
+    while True:
+        try:
+            task = conn.recv()
+        except (EOFError, OSError):
+            return
+        if task is None:
+            return
+        conn.send(_run_task(modules, *task))
+
+
+def _run_task(
+    modules: Dict[str, Tuple[int, Any]],
+    module_path: str,
+    module_name: str,
+    function_name: str,
+    kwargs: Dict[str, Any],
+    max_memory_mb: int,
+    shm_threshold_bytes: int,
+    http_cache: Optional[Dict[str, Any]],
+) -> Tuple[str, Any]:
+    try:
+        module = _plugin_module(modules, module_path, module_name)
+        func = getattr(module, function_name)
+    except (Exception, SystemExit) as exc:
+        # Surfaces as a SandboxError, so a plugin that stopped importing fails only its own step.
+        return "error", _pack_error(ToolExecutionError(f"Could not import {module_name}: {exc}"))
+    try:
+        with _memory_limit(max_memory_mb), http_cache_scope(http_cache):
+            result = func(**kwargs)
+        payload = pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL)
+    except (Exception, SystemExit) as exc:
+        return "error", _pack_error(exc)
+
+    if shm_threshold_bytes and len(payload) > shm_threshold_bytes:
+        block = SharedMemory(create=True, size=len(payload))
+        block.buf[: len(payload)] = payload
+        block.close()
+        # The parent unlinks the block once it has copied the result out.
+        return "shm", (block.name, len(payload))
+    return "ok", payload
+
+
+def _plugin_module(modules: Dict[str, Tuple[int, Any]], module_path: str, module_name: str) -> Any:
+    # Keyed by mtime so hot-reloaded plugins are re-imported in long-lived workers.
+    mtime = os.stat(module_path).st_mtime_ns
+    cached = modules.get(module_path)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    spec = importlib.util.spec_from_file_location(module_name, module_path)
+    if spec is None or spec.loader is None:
+        raise ImportError(f"Could not create an import spec for {module_path}")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    modules[module_path] = (mtime, module)
+    return module
+
+
+def _try_import(name: str) -> None:
+    try:
+        importlib.import_module(name)
+    except Exception:
+        pass
+
+
+@contextmanager
+def _memory_limit(max_memory_mb: int) -> Iterator[None]:
+    if resource is None or not max_memory_mb:
+        yield
+        return
+    soft, hard = resource.getrlimit(resource.RLIMIT_AS)
+    limit = max_memory_mb * 1024 * 1024
+    if hard != resource.RLIM_INFINITY:
+        limit = min(limit, hard)
+    resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+    try:
+        yield
+    finally:
+        resource.setrlimit(resource.RLIMIT_AS, (soft, hard))
+
+
+def _pack_error(exc: BaseException) -> Tuple[str, str, Optional[bytes], str]:
+    detail = "".join(traceback.format_exception(type(exc), exc, exc.__traceback__))
+    try:
+        data: Optional[bytes] = pickle.dumps(exc)
+    except Exception:
+        # e.g. exception classes defined inside the plugin module itself.
+        data = None
+    return type(exc).__name__, str(exc), data, detail
+
+
+def _unpack_error(payload: Tuple[str, str, Optional[bytes], str]) -> BaseException:
+    type_name, message, data, detail = payload
+    logger.debug("Sandboxed plugin raised:\n%s", detail)
+    if data is not None:
+        try:
+            error = pickle.loads(data)
+        except Exception:
+            error = None
+        if isinstance(error, Exception):
+            return error
+    return ToolExecutionError(f"{type_name}: {message}")
@@ -0,0 +1,355 @@
+import logging
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, Optional
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows has no pre-forked workers sharing sessions_dir
+    fcntl = None  # type: ignore[assignment]
+
+logger = logging.getLogger(__name__)
+
+_SESSION_ID_PATTERN = re.compile(r"[A-Za-z0-9_-]{1,64}")
+
+
+class InvalidSessionIdError(ValueError):
+    pass
+
+
+class SessionNotFoundError(LookupError):
+    pass
+
+
+@dataclass(frozen=True)
+class SessionContext:
+    """Per-session locations handed to the planner and to plugins that accept ``session``."""
+
+    session_id: str
+    temp_dir: Path
+    context_file: Path
+
+    @classmethod
+    def create(cls, root_dir: Path, session_id: str) -> "SessionContext":
+        temp_dir = root_dir / session_id
+        return cls(session_id=session_id, temp_dir=temp_dir, context_file=temp_dir / "context_history.jsonl")
+
+
+@dataclass
+class _ActiveSession:
+    context: SessionContext
+    agent: Any
+    lock: threading.Lock
+    last_used: float
+    in_use: int = 0
+    # Shared flock on the session directory while this process holds the session.
+    dir_lock: Optional[int] = None
+
+
+AgentFactory = Callable[[SessionContext], Any]
+
+
+class SessionManager:
+    """Keeps a bounded set of live per-session agents.
+
+    Only sessions made by ``create_session`` (whose directory exists under ``root_dir``)
+    are served. Agents are built lazily by ``agent_factory``. Sessions idle for longer than
+    ``idle_seconds`` (or beyond ``max_active`` live sessions, least recently used first)
+    are evicted: their context log is flushed and the agent dropped, while the session
+    directory stays on disk so the next request rebuilds the agent from its log. Session
+    directories unused for ``retention_seconds`` are deleted by the janitor.
+    Live sessions hold a shared ``flock`` on their directory and the janitor only deletes
+    directories it can lock exclusively, so pre-forked workers sharing ``root_dir`` never
+    purge a session another worker is loading or serving.
+    Requests within one session are serialized; different sessions run concurrently.
+    """
+
+    def __init__(
+        self,
+        agent_factory: AgentFactory,
+        root_dir: Path,
+        max_active: int = 256,
+        idle_seconds: float = 600.0,
+        retention_seconds: float = 7 * 24 * 3600.0,
+    ) -> None:
+        self.agent_factory = agent_factory
+        self.root_dir = root_dir
+        self.max_active = max(1, max_active)
+        self.idle_seconds = max(0.0, idle_seconds)
+        self.retention_seconds = max(0.0, retention_seconds)
+        self._sessions: "OrderedDict[str, _ActiveSession]" = OrderedDict()
+        self._build_locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._janitor: Optional[threading.Thread] = None
+        self.evictions = 0
+        self.purged = 0
+        self.requests_handled = 0
+        self.root_dir.mkdir(parents=True, exist_ok=True)
+
+    def create_session(self) -> str:
+        session_id = uuid.uuid4().hex
+        (self.root_dir / session_id).mkdir(parents=True)
+        return session_id
+
+    def handle_request(self, session_id: str, user_request: str) -> str:
+        with self.session(session_id) as agent:
+            reply = agent.handle_request(user_request)
+        with self._lock:
+            self.requests_handled += 1
+        return reply
+
+    @contextmanager
+    def session(self, session_id: str) -> Iterator[Any]:
+        """Check out a session's agent for exclusive use."""
+        active = self._acquire(session_id)
+        try:
+            with active.lock:
+                yield active.agent
+        finally:
+            with self._lock:
+                active.in_use -= 1
+                active.last_used = time.monotonic()
+            _touch(active.context)
+            self._enforce_capacity()
+
+    def exists(self, session_id: str) -> bool:
+        self._validate(session_id)
+        with self._lock:
+            if session_id in self._sessions:
+                return True
+        return (self.root_dir / session_id).is_dir()
+
+    def delete(self, session_id: str) -> bool:
+        self._validate(session_id)
+        with self._lock:
+            active = self._sessions.pop(session_id, None)
+        if active is not None:
+            with active.lock:
+                self._close(active)
+        session_dir = self.root_dir / session_id
+        existed = active is not None or session_dir.is_dir()
+        shutil.rmtree(session_dir, ignore_errors=True)
+        return existed
+
+    def evict_idle(self) -> int:
+        if not self.idle_seconds:
+            return 0
+        cutoff = time.monotonic() - self.idle_seconds
+        with self._lock:
+            expired = [
+                session_id
+                for session_id, active in self._sessions.items()
+                if not active.in_use and active.last_used < cutoff
+            ]
+        return sum(1 for session_id in expired if self._evict(session_id))
+
+    def purge_expired(self) -> int:
+        """Delete the directories of sessions that are not live and went unused for ``retention_seconds``."""
+        if not self.retention_seconds or not self.root_dir.is_dir():
+            return 0
+        cutoff = time.time() - self.retention_seconds
+        purged = 0
+        for session_dir in self.root_dir.iterdir():
+            if not _SESSION_ID_PATTERN.fullmatch(session_dir.name) or not session_dir.is_dir():
+                continue
+            with self._lock:
+                if session_dir.name in self._sessions or session_dir.name in self._build_locks:
+                    continue
+                # Busy means the session is live (or being loaded) in another worker.
+                dir_lock = _lock_directory(session_dir, exclusive=True)
+                if dir_lock is None:
+                    continue
+                try:
+                    if session_dir.stat().st_mtime >= cutoff:
+                        _unlock_directory(dir_lock)
+                        continue
+                    # Renamed while locked so no process can rebuild a half-deleted session.
+                    expired_dir = session_dir.with_name(f".expired-{session_dir.name}")
+                    session_dir.rename(expired_dir)
+                except OSError:
+                    _unlock_directory(dir_lock)
+                    continue
+                self.purged += 1
+            shutil.rmtree(expired_dir, ignore_errors=True)
+            _unlock_directory(dir_lock)
+            purged += 1
+        return purged
+
+    def active_count(self) -> int:
+        with self._lock:
+            return len(self._sessions)
+
+    def start_janitor(self, interval: float = 30.0) -> None:
+        if self._janitor is not None:
+            return
+
+        def run() -> None:
+            while not self._stop.wait(max(1.0, interval)):
+                evicted = self.evict_idle()
+                if evicted:
+                    logger.info("Evicted %s idle session(s).", evicted)
+                purged = self.purge_expired()
+                if purged:
+                    logger.info("Deleted %s expired session(s).", purged)
+
+        self._janitor = threading.Thread(target=run, name="pipegent-sessions", daemon=True)
+        self._janitor.start()
+
+    def close(self) -> None:
+        self._stop.set()
+        with self._lock:
+            sessions = list(self._sessions.values())
+            self._sessions.clear()
+        for active in sessions:
+            with active.lock:
+                self._close(active)
+
+    def _acquire(self, session_id: str) -> _ActiveSession:
+        self._validate(session_id)
+        with self._lock:
+            active = self._checkout(session_id)
+            if active is not None:
+                return active
+            build_lock = self._build_locks.setdefault(session_id, threading.Lock())
+
+        # Build outside the manager lock so loading one session's log never blocks the others.
+        with build_lock:
+            with self._lock:
+                active = self._checkout(session_id)
+                if active is not None:
+                    return active
+
+            context = SessionContext.create(self.root_dir, session_id)
+            dir_lock = _lock_directory(context.temp_dir, exclusive=False)
+            if dir_lock is None or not _still_at(dir_lock, context.temp_dir):
+                # Missing, or purged by another worker while we waited for the lock.
+                _unlock_directory(dir_lock)
+                with self._lock:
+                    self._build_locks.pop(session_id, None)
+                raise SessionNotFoundError(f"Unknown session: {session_id}")
+            try:
+                _clear_artifacts(context)
+                agent = self.agent_factory(context)
+            except BaseException:
+                _unlock_directory(dir_lock)
+                with self._lock:
+                    self._build_locks.pop(session_id, None)
+                raise
+
+            with self._lock:
+                active = _ActiveSession(
+                    context=context,
+                    agent=agent,
+                    lock=threading.Lock(),
+                    last_used=time.monotonic(),
+                    in_use=1,
+                    dir_lock=dir_lock,
+                )
+                self._sessions[session_id] = active
+                self._build_locks.pop(session_id, None)
+        return active
+
+    def _checkout(self, session_id: str) -> Optional[_ActiveSession]:
+        active = self._sessions.get(session_id)
+        if active is not None:
+            self._sessions.move_to_end(session_id)
+            active.in_use += 1
+        return active
+
+    def _enforce_capacity(self) -> None:
+        with self._lock:
+            overflow = len(self._sessions) - self.max_active
+            candidates = [
+                session_id for session_id, active in self._sessions.items() if not active.in_use
+            ][: max(0, overflow)]
+        for session_id in candidates:
+            self._evict(session_id)
+
+    def _evict(self, session_id: str) -> bool:
+        with self._lock:
+            active = self._sessions.get(session_id)
+            if active is None or active.in_use:
+                return False
+            del self._sessions[session_id]
+            self.evictions += 1
+        with active.lock:
+            self._close(active)
+        logger.debug("Evicted session %s to disk.", session_id)
+        return True
+
+    def _close(self, active: _ActiveSession) -> None:
+        _close_agent(active.agent)
+        _clear_artifacts(active.context)
+        _unlock_directory(active.dir_lock)
+        active.dir_lock = None
+
+    @staticmethod
+    def _validate(session_id: str) -> None:
+        if not isinstance(session_id, str) or not _SESSION_ID_PATTERN.fullmatch(session_id):
+            raise InvalidSessionIdError(f"Invalid session id: {session_id!r}")
+
+
+def _close_agent(agent: Any) -> None:
+    context_log = getattr(agent, "context_log", None)
+    if context_log is not None:
+        context_log.flush()
+    artifacts = getattr(agent, "artifacts", None)
+    if artifacts is not None:
+        artifacts.clear()
+
+
+def _touch(context: SessionContext) -> None:
+    # The directory mtime is the session's last use for retention, shared by every pre-forked worker.
+    try:
+        os.utime(context.temp_dir)
+    except OSError:
+        pass
+
+
+def _lock_directory(path: Path, exclusive: bool) -> Optional[int]:
+    """``flock`` a session directory: shared locks wait, exclusive ones give up when busy.
+
+    Returns the locked descriptor, or None if the directory is missing or busy. Without
+    ``fcntl`` only the existence check remains (a single process has nothing to race).
+    """
+    if fcntl is None:
+        return -1 if path.is_dir() else None
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return None
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB if exclusive else fcntl.LOCK_SH)
+    except OSError:
+        os.close(fd)
+        return None
+    return fd
+
+
+def _unlock_directory(fd: Optional[int]) -> None:
+    # Closing the descriptor releases the flock.
+    if fd is not None and fd >= 0:
+        os.close(fd)
+
+
+def _still_at(fd: int, path: Path) -> bool:
+    if fd < 0:
+        return True
+    try:
+        return os.path.samestat(os.fstat(fd), os.stat(path))
+    except OSError:
+        return False
+
+
+def _clear_artifacts(context: SessionContext) -> None:
+    shutil.rmtree(context.temp_dir / "artifacts", ignore_errors=True)
+
@@ -0,0 +1,37 @@
+from functools import lru_cache
+from typing import Any, Dict, Iterable
+
+try:  # Optional: exact counts when tiktoken is installed.
+    import tiktoken
+except ImportError:  # pragma: no cover - depends on environment
+    tiktoken = None
+
+# Rough per-message overhead of the chat format (role markers, separators).
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+@lru_cache(maxsize=8)
+def _encoding(model: str) -> Any:
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+
+
+def estimate_tokens(text: str, model: str = "gpt-4o-mini") -> int:
+    if not text:
+        return 0
+    encoding = _encoding(model)
+    if encoding is not None:
+        return len(encoding.encode(text))
+    # ~4 characters per token is the usual rule of thumb for English text and JSON.
+    return max(1, (len(text) + 3) // 4)
+
+
+def estimate_message_tokens(messages: Iterable[Dict[str, str]], model: str = "gpt-4o-mini") -> int:
+    return sum(
+        estimate_tokens(str(message.get("content", "")), model) + MESSAGE_OVERHEAD_TOKENS
+        for message in messages
+    )
@@ -0,0 +1,347 @@
+import asyncio
+import logging
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from services.metrics import REGISTRY, TOOL_QUEUE_SECONDS, LabelValues
+
+logger = logging.getLogger(__name__)
+
+_POLICY_KEYS = ("max_concurrency", "rate_per_second", "burst")
+# Idle per-host gates are pruned once this many hosts have been seen.
+_MAX_HOST_GATES = 1024
+
+
+class ToolQueueTimeout(TimeoutError):
+    """A call waited longer than the scheduler's queue timeout for its slot."""
+
+
+class _AsyncWaiter:
+    """A coroutine queued in a FairGate; granted from whichever thread frees the slot."""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop) -> None:
+        self.loop = loop
+        self.future: "asyncio.Future[None]" = loop.create_future()
+        self.granted = False
+        self.timer_pending = False
+
+
+class FairGate:
+    """Concurrency limit plus token bucket, granted round-robin across sessions.
+
+    Waiters queue per session; whenever a slot and a token are available the head
+    of the session served longest ago goes next, so one session fanning out twenty
+    calls cannot starve another session's single call. Either limit may be None.
+    Threads wait with ``acquire`` and coroutines with ``acquire_async``, in one queue.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_concurrency: Optional[int] = None,
+        rate_per_second: Optional[float] = None,
+        burst: Optional[int] = None,
+    ) -> None:
+        self.name = name
+        self.policy = (max_concurrency, rate_per_second, burst)
+        self.max_concurrency = max_concurrency
+        self.rate_per_second = rate_per_second
+        self.burst = float(burst or max(1, int(rate_per_second or 1)))
+        self.active = 0
+        self._tokens = self.burst
+        self._refilled = time.monotonic()
+        self._queues: "OrderedDict[str, Deque[object]]" = OrderedDict()
+        self._condition = threading.Condition()
+
+    @property
+    def queued(self) -> int:
+        with self._condition:
+            return sum(len(queue) for queue in self._queues.values())
+
+    def acquire(self, session_key: str = "", timeout: Optional[float] = None) -> None:
+        ticket = object()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            self._queues.setdefault(session_key, deque()).append(ticket)
+            try:
+                while True:
+                    delay = None
+                    if self._head() == (session_key, ticket):
+                        delay = self._grant_delay()
+                        if delay == 0.0:
+                            self._grant(session_key)
+                            self._wake()
+                            return
+                    if deadline is not None:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            raise ToolQueueTimeout(f"waited more than {timeout:.1f}s for {self.name}")
+                        delay = remaining if delay is None else min(delay, remaining)
+                    self._condition.wait(delay)
+            except BaseException:
+                self._withdraw(session_key, ticket)
+                raise
+
+    async def acquire_async(self, session_key: str = "", timeout: Optional[float] = None) -> None:
+        """Like ``acquire`` without holding a thread while queued; cancelling the wait gives the slot back."""
+        waiter = _AsyncWaiter(asyncio.get_running_loop())
+        with self._condition:
+            self._queues.setdefault(session_key, deque()).append(waiter)
+            self._wake()
+            if waiter.granted:
+                return
+        try:
+            await asyncio.wait_for(waiter.future, timeout)
+        except BaseException as exc:
+            with self._condition:
+                # The grant may have landed after the wait was given up.
+                if waiter.granted:
+                    self.active -= 1
+                    self._wake()
+                else:
+                    self._withdraw(session_key, waiter)
+            if isinstance(exc, asyncio.TimeoutError):
+                raise ToolQueueTimeout(f"waited more than {timeout:.1f}s for {self.name}") from None
+            raise
+
+    def _withdraw(self, session_key: str, ticket: object) -> None:
+        queue = self._queues.get(session_key)
+        if queue is not None and ticket in queue:
+            queue.remove(ticket)
+            if not queue:
+                del self._queues[session_key]
+        self._wake()
+
+    def release(self) -> None:
+        with self._condition:
+            self.active -= 1
+            self._wake()
+
+    def _head(self) -> Optional[Tuple[str, object]]:
+        for session_key, queue in self._queues.items():
+            return session_key, queue[0]
+        return None
+
+    def _wake(self) -> None:
+        """After any change: wake waiting threads and grant (or time) queued coroutines at the head."""
+        self._condition.notify_all()
+        while True:
+            head = self._head()
+            if head is None or not isinstance(head[1], _AsyncWaiter):
+                return
+            session_key, waiter = head
+            delay = self._grant_delay()
+            if delay is None:
+                return
+            if delay > 0.0:
+                if not waiter.timer_pending:
+                    waiter.timer_pending = True
+                    waiter.loop.call_soon_threadsafe(waiter.loop.call_later, delay, self._retry, waiter)
+                return
+            self._grant(session_key)
+            waiter.granted = True
+            waiter.loop.call_soon_threadsafe(_resolve, waiter.future)
+
+    def _retry(self, waiter: _AsyncWaiter) -> None:
+        with self._condition:
+            waiter.timer_pending = False
+            self._wake()
+
+    def _grant_delay(self) -> Optional[float]:
+        """0 when the head may run now, seconds until the next token, or None (wait for a release)."""
+        if self.max_concurrency is not None and self.active >= self.max_concurrency:
+            return None
+        if self.rate_per_second is None:
+            return 0.0
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._refilled) * self.rate_per_second)
+        self._refilled = now
+        if self._tokens >= 1.0:
+            return 0.0
+        return (1.0 - self._tokens) / self.rate_per_second
+
+    def _grant(self, session_key: str) -> None:
+        queue = self._queues[session_key]
+        queue.popleft()
+        if queue:
+            self._queues.move_to_end(session_key)
+        else:
+            del self._queues[session_key]
+        self.active += 1
+        if self.rate_per_second is not None:
+            self._tokens -= 1.0
+
+
+def _resolve(future: "asyncio.Future[None]") -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+class ToolLease:
+    def __init__(self, gates: List[FairGate]) -> None:
+        self._gates = gates
+
+    def release(self) -> None:
+        for gate in reversed(self._gates):
+            gate.release()
+        self._gates = []
+
+    def __enter__(self) -> "ToolLease":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.release()
+
+
+class ToolScheduler:
+    """Applies the manifest ``limits`` of each tool before it is invoked.
+
+    Every limited tool has its own FairGate; ``per_host`` limits add a gate per
+    destination host (taken from the ``host_arg`` inputs or the fixed ``host``), shared
+    by every tool that declares the same per-host policy. A call naming several hosts
+    (e.g. a list of URLs) holds one slot on each of them. Calls acquire the tool gate
+    first and the host gates second, in host order so two calls never wait on each
+    other, and the time spent waiting is recorded in ``pipegent_tool_queue_wait_seconds``.
+    A call still queued after ``queue_timeout`` seconds raises ToolQueueTimeout.
+    """
+
+    def __init__(
+        self, limits: Optional[Dict[str, Dict[str, Any]]] = None, queue_timeout: Optional[float] = None
+    ) -> None:
+        self.queue_timeout = queue_timeout if queue_timeout and queue_timeout > 0 else None
+        self._limits: Dict[str, Dict[str, Any]] = {}
+        self._tool_gates: Dict[str, FairGate] = {}
+        self._host_gates: Dict[Tuple[str, Tuple[Any, ...]], FairGate] = {}
+        self._lock = threading.Lock()
+        self.configure(limits or {})
+        REGISTRY.gauge_callback(
+            "pipegent_tool_queue_depth",
+            "Tool calls waiting for a concurrency slot or rate token, per gate.",
+            ("gate",),
+            self._queue_depths,
+        )
+
+    def configure(self, limits: Dict[str, Dict[str, Any]]) -> None:
+        """Adopt new limits (e.g. after a plugin reload); gates whose policy is unchanged are kept."""
+        with self._lock:
+            self._limits = {name: tool_limits for name, tool_limits in limits.items() if tool_limits}
+            gates: Dict[str, FairGate] = {}
+            for name, tool_limits in self._limits.items():
+                policy = _policy(tool_limits)
+                if not any(value is not None for value in policy):
+                    continue
+                existing = self._tool_gates.get(name)
+                if existing is not None and existing.policy == policy:
+                    gates[name] = existing
+                else:
+                    gates[name] = FairGate(name, *policy)
+            self._tool_gates = gates
+
+    def acquire(self, tool_name: str, args: Dict[str, Any], session_key: str = "") -> Optional[ToolLease]:
+        """Block until the call may run; returns a lease to release afterwards (None when unlimited)."""
+        gates = self._gates_for(tool_name, args)
+        if not gates:
+            return None
+
+        started = time.perf_counter()
+        acquired: List[FairGate] = []
+        try:
+            for gate in gates:
+                gate.acquire(session_key, self._remaining(started))
+                acquired.append(gate)
+        except BaseException:
+            ToolLease(acquired).release()
+            raise
+        return self._granted(tool_name, gates, started)
+
+    async def acquire_async(
+        self, tool_name: str, args: Dict[str, Any], session_key: str = ""
+    ) -> Optional[ToolLease]:
+        """``acquire`` for coroutines: waits on the event loop instead of a thread."""
+        gates = self._gates_for(tool_name, args)
+        if not gates:
+            return None
+
+        started = time.perf_counter()
+        acquired: List[FairGate] = []
+        try:
+            for gate in gates:
+                await gate.acquire_async(session_key, self._remaining(started))
+                acquired.append(gate)
+        except BaseException:
+            ToolLease(acquired).release()
+            raise
+        return self._granted(tool_name, gates, started)
+
+    def _gates_for(self, tool_name: str, args: Dict[str, Any]) -> List[FairGate]:
+        with self._lock:
+            tool_limits = self._limits.get(tool_name)
+            if tool_limits is None:
+                return []
+            gates = [self._tool_gates[tool_name]] if tool_name in self._tool_gates else []
+            gates.extend(self._host_gates_for(tool_limits, args))
+            return gates
+
+    def _remaining(self, started: float) -> Optional[float]:
+        if self.queue_timeout is None:
+            return None
+        return max(0.0, self.queue_timeout - (time.perf_counter() - started))
+
+    def _granted(self, tool_name: str, gates: List[FairGate], started: float) -> ToolLease:
+        waited = time.perf_counter() - started
+        TOOL_QUEUE_SECONDS.observe(waited, tool=tool_name)
+        if waited >= 1.0:
+            logger.info("Tool %s waited %.2fs for %s", tool_name, waited, ", ".join(gate.name for gate in gates))
+        return ToolLease(gates)
+
+    def _host_gates_for(self, tool_limits: Dict[str, Any], args: Dict[str, Any]) -> List[FairGate]:
+        per_host = tool_limits.get("per_host")
+        if not per_host:
+            return []
+        if tool_limits.get("host"):
+            hosts = {tool_limits["host"]}
+        else:
+            hosts = set()
+            for name in tool_limits.get("host_args") or []:
+                value = args.get(name)
+                for item in value if isinstance(value, (list, tuple)) else [value]:
+                    host = _host_of(item)
+                    if host:
+                        hosts.add(host)
+        policy = _policy(per_host)
+        gates: List[FairGate] = []
+        for host in sorted(hosts):
+            key = (host, policy)
+            gate = self._host_gates.get(key)
+            if gate is None:
+                if len(self._host_gates) >= _MAX_HOST_GATES:
+                    self._host_gates = {
+                        gate_key: existing
+                        for gate_key, existing in self._host_gates.items()
+                        if existing.active or existing.queued
+                    }
+                gate = self._host_gates[key] = FairGate(f"host:{host}", *policy)
+            gates.append(gate)
+        return gates
+
+    def _queue_depths(self) -> List[Tuple[LabelValues, float]]:
+        with self._lock:
+            gates = list(self._tool_gates.values()) + list(self._host_gates.values())
+        return [((gate.name,), float(gate.queued)) for gate in gates]
+
+
+def _policy(limits: Dict[str, Any]) -> Tuple[Any, ...]:
+    return tuple(limits.get(key) for key in _POLICY_KEYS)
+
+
+def _host_of(value: Any) -> Optional[str]:
+    if not isinstance(value, str) or not value.strip():
+        return None
+    value = value.strip()
+    if "://" in value:
+        return (urlsplit(value).hostname or "").lower() or None
+    # Bare host names such as an SMTP server.
+    return value.split(":")[0].lower()